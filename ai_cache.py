@@ -0,0 +1,191 @@
+# ai_cache.py
+"""
+Gemini 전략 응답 캐시 (content-addressed)
+- key = sha256(fact_report, operation_mode, operation_qty, target_line, capa_target_pct, model)
+- 1단계: 프로세스 메모리 LRU (OrderedDict)
+- 2단계: SQLite 파일 (TTL 만료 + 전체 크기 상한, 오래 안 쓴 항목부터 삭제)
+- 값은 JSON 문자열로 보관 → 조회할 때마다 새 dict (호출 측이 moves를 수정해도 캐시는 안전)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "gemini_strategy.sqlite3")
+DEFAULT_TTL_SEC = 24 * 3600
+DEFAULT_MEMORY_ITEMS = 256
+DEFAULT_DISK_MAX_BYTES = 32 * 1024 * 1024
+
+
+def strategy_cache_key(
+    fact_report: str,
+    operation_mode: str,
+    operation_qty: int,
+    target_line: str,
+    capa_target_pct: int,
+    model: str,
+) -> str:
+    payload = json.dumps(
+        [fact_report, operation_mode, int(operation_qty), target_line, int(capa_target_pct), model],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StrategyCache:
+    """메모리 LRU + SQLite(TTL/크기 상한) 2단 캐시. 스레드 안전 (Streamlit 세션 스레드 공용)"""
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        ttl_sec: int = DEFAULT_TTL_SEC,
+        memory_items: int = DEFAULT_MEMORY_ITEMS,
+        disk_max_bytes: int = DEFAULT_DISK_MAX_BYTES,
+    ):
+        self.path = path
+        self.ttl_sec = int(ttl_sec)
+        self.memory_items = int(memory_items)
+        self.disk_max_bytes = int(disk_max_bytes)
+
+        self._lock = threading.Lock()
+        # key -> (저장 시각, JSON 문자열)
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if path:
+            try:
+                d = os.path.dirname(path)
+                if d:
+                    os.makedirs(d, exist_ok=True)
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS strategy_cache ("
+                    " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                    " created_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_strategy_cache_accessed ON strategy_cache(accessed_at)")
+                self._conn.commit()
+            except Exception:
+                # 디스크 캐시를 못 쓰는 환경(읽기 전용 등)이면 메모리 캐시만 사용
+                self._conn = None
+
+    # -------------------------------
+    # 메모리 LRU
+    # -------------------------------
+    def _mem_get(self, key: str, now: float) -> Optional[str]:
+        hit = self._mem.get(key)
+        if hit is None:
+            return None
+        created_at, value = hit
+        if now - created_at > self.ttl_sec:
+            del self._mem[key]
+            return None
+        self._mem.move_to_end(key)
+        return value
+
+    def _mem_put(self, key: str, value: str, created_at: float) -> None:
+        self._mem[key] = (created_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.memory_items:
+            self._mem.popitem(last=False)
+
+    # -------------------------------
+    # SQLite
+    # -------------------------------
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT value, created_at FROM strategy_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if now - created_at > self.ttl_sec:
+            self._conn.execute("DELETE FROM strategy_cache WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        self._conn.execute("UPDATE strategy_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return value, created_at
+
+    def _disk_put(self, key: str, value: str, now: float) -> None:
+        if self._conn is None:
+            return
+        size = len(value.encode("utf-8"))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO strategy_cache(key, value, created_at, accessed_at, size) VALUES (?, ?, ?, ?, ?)",
+            (key, value, now, now, size),
+        )
+        self._evict(now)
+        self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        # TTL 만료분 삭제 → 그래도 크기 상한을 넘으면 오래 안 쓴 항목부터 삭제
+        self._conn.execute("DELETE FROM strategy_cache WHERE created_at < ?", (now - self.ttl_sec,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM strategy_cache").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+        over = total - self.disk_max_bytes
+        victims = []
+        for k, size in self._conn.execute("SELECT key, size FROM strategy_cache ORDER BY accessed_at ASC"):
+            victims.append((k,))
+            over -= size
+            if over <= 0:
+                break
+        self._conn.executemany("DELETE FROM strategy_cache WHERE key = ?", victims)
+
+    # -------------------------------
+    # 공개 API
+    # -------------------------------
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            value = self._mem_get(key, now)
+            if value is None:
+                try:
+                    hit = self._disk_get(key, now)
+                except Exception:
+                    hit = None
+                if hit is None:
+                    return None
+                value, created_at = hit
+                self._mem_put(key, value, created_at)
+        return json.loads(value)
+
+    def put(self, key: str, strategy: Dict[str, Any]) -> None:
+        now = time.time()
+        value = json.dumps(strategy, ensure_ascii=False)
+        with self._lock:
+            self._mem_put(key, value, now)
+            try:
+                self._disk_put(key, value, now)
+            except Exception:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM strategy_cache")
+                self._conn.commit()
+
+
+_DEFAULT_CACHE: Optional[StrategyCache] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_strategy_cache() -> StrategyCache:
+    """프로세스 공용 기본 캐시 (경로는 GEMINI_CACHE_PATH 환경변수로 변경, 빈 값이면 메모리만)"""
+    global _DEFAULT_CACHE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CACHE is None:
+            path = os.environ.get("GEMINI_CACHE_PATH", DEFAULT_CACHE_PATH) or None
+            _DEFAULT_CACHE = StrategyCache(path=path)
+        return _DEFAULT_CACHE
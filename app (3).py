@@ -1,17 +1,32 @@
 import streamlit as st
 import pandas as pd
 from supabase import create_client, Client
-import google.generativeai as genai
-from datetime import datetime, timedelta
+from datetime import datetime
 from zoneinfo import ZoneInfo
 import plotly.graph_objects as go
 import re
 import base64
+import hashlib
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 # 분리된 모듈에서 함수 임포트 (legacy/hybrid 수정 없음)
-from legacy import fetch_db_data_legacy, query_gemini_ai_legacy
-from hybrid import ask_professional_scheduler
+from legacy import fetch_db_data_legacy, stream_gemini_ai_legacy
+from hybrid import ask_professional_scheduler, configure_genai, normalize_plan_df
+from snapshot_store import DEFAULT_SNAPSHOT_PATH, SnapshotStore
+from fake_supabase import FakeSupabase, fake_from_env
+from plan_loader import (
+    PLAN_TABLE,
+    Lazy,
+    PlanChunkCache,
+    add_name_clean,
+    fetch_table_paged,
+    load_production_plan,
+    plan_window,
+)
+from plan_registry import PlanSnapshotRegistry
+from service import route_question, split_report_sections
 
 # ==================== 환경 설정 ====================
 st.set_page_config(page_title="orcHatStra", page_icon="🎯", layout="wide")
@@ -408,11 +423,31 @@ except Exception:
 
 @st.cache_resource
 def init_supabase():
+    # SUPABASE_FIXTURES_DIR가 있으면 로컬 픽스처를 적재한 가짜 클라이언트 (벤치마크/프로파일링용)
+    fake = fake_from_env()
+    if fake is not None:
+        return fake
     return create_client(URL, KEY)
 
 
 supabase: Client = init_supabase()
-genai.configure(api_key=GENAI_KEY)
+
+
+@st.cache_resource
+def init_snapshot():
+    # 로컬 스냅샷 (워터마크 증분 동기화). 디스크를 못 쓰는 환경이면 Supabase 직접 조회
+    if isinstance(supabase, FakeSupabase):
+        return None  # 가짜 클라이언트는 이미 메모리 (스냅샷 불필요)
+    try:
+        return SnapshotStore(path=os.environ.get("SUPABASE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH), remote=supabase)
+    except Exception:
+        return None
+
+
+snapshot = init_snapshot()
+db = snapshot.client() if snapshot is not None else supabase
+# genai 전역 설정은 hybrid.configure_genai로만 (키/엔드포인트가 같으면 rerun마다 다시 설정하지 않음, 레거시 스트리밍도 이 설정 사용)
+configure_genai(GENAI_KEY)
 
 CAPA_LIMITS = {"조립1": 3300, "조립2": 3700, "조립3": 3600}
 TEST_MODE = False
@@ -420,57 +455,85 @@ TODAY = datetime.now(ZoneInfo("Asia/Seoul")).date() if not TEST_MODE else dateti
 
 
 # ==================== 데이터 로드 (기존 유지) ====================
-@st.cache_data(ttl=600)
-def fetch_data(target_date=None):
+def plan_data_version():
+    # 데이터 버전 = 행 내용이 바뀔 때만 오르는 저장소 버전 (스냅샷 동기화 / 가짜 클라이언트의 메모리 저장소)
+    # 원격 직접 조회라 전역 버전이 없으면 None → 조각 캐시는 TTL로 갱신, 스냅샷 id는 plan_snapshot_key의 내용 해시로 구분
+    if snapshot is not None:
+        return snapshot.version(PLAN_TABLE)
+    if isinstance(supabase, FakeSupabase):
+        return supabase.store.version(PLAN_TABLE)
+    return None
+
+
+def plan_snapshot_key(target_date, plan_df):
+    # 전역 데이터 버전이 없으면 조회한 구간의 내용 해시를 키에 포함 (내용이 같으면 같은 스냅샷 공유)
+    key = f"plan:{target_date}"
+    if plan_data_version() is None:
+        key += ":" + hashlib.sha1(pd.util.hash_pandas_object(plan_df, index=False).to_numpy().tobytes()).hexdigest()[:16]
+    return key
+
+
+@st.cache_resource
+def init_plan_cache():
+    # 세션 공용 일 단위 조각 캐시 (겹치는 ±10일 구간은 한 번만 로드)
+    return PlanChunkCache(db, prepare=add_name_clean, version_fn=plan_data_version)
+
+
+@st.cache_resource
+def init_plan_registry():
+    # 세션 공용 plan 스냅샷 (메시지에는 snapshot id만 보관)
+    return PlanSnapshotRegistry()
+
+
+def fetch_plan(target_date=None):
     try:
         if target_date:
-            dt = datetime.strptime(target_date, "%Y-%m-%d")
-            start_date = (dt - timedelta(days=10)).strftime("%Y-%m-%d")
-            end_date = (dt + timedelta(days=10)).strftime("%Y-%m-%d")
-            plan_res = (
-                supabase.table("production_plan_2026_01")
-                .select("*")
-                .gte("plan_date", start_date)
-                .lte("plan_date", end_date)
-                .execute()
-            )
-        else:
-            plan_res = supabase.table("production_plan_2026_01").select("*").execute()
-
-        plan_df = pd.DataFrame(plan_res.data) if plan_res.data else pd.DataFrame()
-        hist_res = supabase.table("production_investigation").select("*").execute()
-        hist_df = pd.DataFrame(hist_res.data) if hist_res.data else pd.DataFrame()
+            return normalize_plan_df(init_plan_cache().get_window(*plan_window(target_date)))
+        # 필요한 컬럼만, range 페이지 동시 요청 (행 상한에서 잘리지 않음)
+        plan_df, _ = load_production_plan(db)
+        return normalize_plan_df(add_name_clean(plan_df)) if not plan_df.empty else plan_df
+    except Exception as e:
+        st.error(f"데이터 로드 실패: {e}")
+        return pd.DataFrame()
 
-        if not plan_df.empty:
-            plan_df["name_clean"] = plan_df["product_name"].apply(lambda x: re.sub(r"\s+", "", str(x)).strip())
-            plt_map = plan_df.groupby("name_clean")["plt"].first().to_dict()
-            product_map = plan_df.groupby("name_clean")["line"].unique().to_dict()
-            for k in product_map:
-                if "T6" in str(k).upper():
-                    product_map[k] = ["조립1", "조립2", "조립3"]
-            return plan_df, hist_df, product_map, plt_map
 
-        return pd.DataFrame(), pd.DataFrame(), {}, {}
+@st.cache_data(ttl=600)
+def fetch_hist():
+    try:
+        hist_df, _ = fetch_table_paged(db, "production_investigation")
+        return hist_df
     except Exception as e:
         st.error(f"데이터 로드 실패: {e}")
-        return pd.DataFrame(), pd.DataFrame(), {}, {}
+        return pd.DataFrame()
 
 
-def extract_date(text):
-    if not text:
-        return None
-    patterns = [r"(\d{1,2})/(\d{1,2})", r"(\d{1,2})월\s*(\d{1,2})일", r"(202[56])-(\d{1,2})-(\d{1,2})"]
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            g = match.groups()
-            if len(g) == 2:
-                m, d = g
-                return f"2026-{int(m):02d}-{int(d):02d}"
-            else:
-                y, m, d = g
-                return f"{int(y):04d}-{int(m):02d}-{int(d):02d}"
-    return None
+@st.cache_data(ttl=600)
+def fetch_plan_maps(target_date=None):
+    plan_df = fetch_plan(target_date)
+    if plan_df.empty:
+        return {}, {}
+    plt_map = plan_df.groupby("name_clean")["plt"].first().to_dict()
+    product_map = plan_df.groupby("name_clean")["line"].unique().to_dict()
+    for k in product_map:
+        if "T6" in str(k).upper():
+            product_map[k] = ["조립1", "조립2", "조립3"]
+    return product_map, plt_map
+
+
+def fetch_data(target_date=None):
+    """
+    (plan_df, hist_df, product_map, plt_map)
+    - plan_df만 바로 로드, 나머지는 Lazy 핸들 (.get() 할 때 각자 캐시에서 로드)
+    """
+    plan_df = fetch_plan(target_date)
+    if plan_df.empty:
+        return pd.DataFrame(), pd.DataFrame(), {}, {}
+    return (
+        plan_df,
+        Lazy(fetch_hist),
+        Lazy(lambda: fetch_plan_maps(target_date)[0]),
+        Lazy(lambda: fetch_plan_maps(target_date)[1]),
+    )
 
 
 # ==================== (기존) HTML 렌더 도구들: legacy를 위해 "절대 변경 금지" ====================
@@ -614,11 +677,8 @@ def markdown_to_html(text):
     return "".join(result_html)
 
 
-def display_message(role, content):
-    """✅ legacy를 위해 기존 방식 유지(마크다운 표 → HTML 테이블 변환 포함)"""
-    if not content:
-        return
-
+def message_html(role, content):
+    """말풍선 HTML (마크다운 표 → HTML 테이블 변환 포함)"""
     if role == "user":
         avatar_html = f'<img src="data:image/png;base64,{user_avatar_base64}" alt="User Avatar">' if user_avatar_base64 else ""
     else:
@@ -626,13 +686,19 @@ def display_message(role, content):
 
     html_content = markdown_to_html(content)
 
-    html_output = f"""
+    return f"""
     <div class="message-row {role}">
         <div class="avatar {role}">{avatar_html}</div>
         <div class="message-bubble {role}">{html_content}</div>
     </div>
     """
-    st.markdown(html_output, unsafe_allow_html=True)
+
+
+def display_message(role, content):
+    """✅ legacy를 위해 기존 방식 유지(마크다운 표 → HTML 테이블 변환 포함)"""
+    if not content:
+        return
+    st.markdown(message_html(role, content), unsafe_allow_html=True)
 
 
 # ✅✅ hybrid 전용: "HTML을 그대로" 말풍선에 넣는 함수 (legacy 영향 없음)
@@ -669,19 +735,6 @@ def display_loading():
 
 
 # ==================== hybrid 전용: 섹션 분리/조치계획/Δ/상세탭 ====================
-def split_report_sections(report_md: str) -> dict:
-    if not report_md:
-        return {}
-    parts = re.split(r"\n##\s+", report_md.strip())
-    sections = {"__FULL__": report_md.strip()}
-    for p in parts[1:]:
-        lines = p.splitlines()
-        title = lines[0].strip()
-        body = "\n".join(lines[1:]).strip()
-        sections[title] = body
-    return sections
-
-
 def build_action_md(report_md: str) -> str:
     """채팅에 표시할 '최종 조치 계획' + (있으면) 'CAPA 이벤트'를 마크다운으로 구성"""
     sections = split_report_sections(report_md)
@@ -781,7 +834,7 @@ def build_delta_html(validated_moves: list | None) -> str:
     return "".join(html_parts)
 
 
-def render_hybrid_details_tabs(report_md: str, plan_df: pd.DataFrame | None = None):
+def render_hybrid_details_tabs(report_md: str, plan_df: pd.DataFrame | None = None, snapshot_expired: bool = False):
     """✅ hybrid 나머지 섹션은 탭으로 분리 (legacy에는 절대 적용 X)"""
     sections = split_report_sections(report_md)
 
@@ -804,7 +857,7 @@ def render_hybrid_details_tabs(report_md: str, plan_df: pd.DataFrame | None = No
 
         with t4:
             if isinstance(plan_df, pd.DataFrame) and (not plan_df.empty) and ("qty_1차" in plan_df.columns):
-                daily = plan_df.groupby(["plan_date", "line"])["qty_1차"].sum().reset_index()
+                daily = plan_df.groupby(["plan_date", "line"], observed=True)["qty_1차"].sum().reset_index()
                 daily.columns = ["plan_date", "line", "current_qty"]
 
                 chart_data = daily.pivot(index="plan_date", columns="line", values="current_qty").fillna(0)
@@ -831,6 +884,8 @@ def render_hybrid_details_tabs(report_md: str, plan_df: pd.DataFrame | None = No
 
                 st.plotly_chart(fig, use_container_width=True)
                 st.dataframe(daily, use_container_width=True)
+            elif snapshot_expired:
+                st.info("계획 데이터가 갱신되어 이 답변의 CAPA 그래프 스냅샷이 만료되었습니다. 다시 질문해 주세요.")
             else:
                 st.info("CAPA 그래프를 그릴 데이터가 없습니다.")
 
@@ -839,7 +894,8 @@ def render_hybrid_details_tabs(report_md: str, plan_df: pd.DataFrame | None = No
 if "messages" not in st.session_state:
     # 메시지 구조:
     # {role, engine, content}  (공통)
-    # hybrid는 추가로 {action_md, delta_html, validated_moves, report_md, plan_df(optional minimal)} 등 보유 가능
+    # hybrid는 추가로 {action_md, delta_html, validated_moves, report_md, plan_snapshot_id} 등 보유 가능
+    # (plan_df 자체는 세션 공용 스냅샷 저장소에 1벌만, 메시지에는 id만)
     st.session_state.messages = []
 if "is_loading" not in st.session_state:
     st.session_state.is_loading = False
@@ -871,7 +927,8 @@ for msg in st.session_state.messages:
         action_md = msg.get("action_md", "")
         delta_html = msg.get("delta_html", "")
         report_md = msg.get("report_md", "")
-        plan_df = msg.get("plan_df", None)
+        plan_sid = msg.get("plan_snapshot_id")
+        plan_df = init_plan_registry().get(plan_sid)
 
         # (1) 조치계획 (기존대로 markdown_to_html 경유)
         display_message("assistant", action_md or "## 🧾 최종 조치 계획\n(조치계획 없음)")
@@ -881,11 +938,13 @@ for msg in st.session_state.messages:
 
         # (3) 나머지는 탭/expander
         if report_md:
-            render_hybrid_details_tabs(report_md, plan_df=plan_df)
+            render_hybrid_details_tabs(report_md, plan_df=plan_df, snapshot_expired=bool(plan_sid) and plan_df is None)
 
-# 로딩 애니메이션
+# 로딩 애니메이션 (스트리밍이 시작되면 같은 자리에서 말풍선으로 교체)
+stream_slot = st.empty()
 if st.session_state.is_loading:
-    display_loading()
+    with stream_slot.container():
+        display_loading()
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -901,14 +960,8 @@ if prompt := st.chat_input("무엇을 도와드릴까요?"):
 if st.session_state.is_loading:
     user_messages = [m for m in st.session_state.messages if isinstance(m, dict) and m.get("role") == "user"]
     prompt = user_messages[-1]["content"] if user_messages else ""
-    target_date = extract_date(prompt)
-
-    is_adjustment_mode = bool(target_date) and (
-        any(line in prompt for line in ["조립1", "조립2", "조립3", "조립"])
-        or re.search(r"\d+%", prompt) is not None
-        or "CAPA" in prompt.upper()
-        or any(k in prompt for k in ["줄여", "늘려", "추가", "증량", "감량", "생산하고"])
-    )
+    engine, target_date = route_question(prompt)
+    is_adjustment_mode = engine == "hybrid"
 
     try:
         if is_adjustment_mode:
@@ -927,18 +980,37 @@ if st.session_state.is_loading:
                     }
                 )
             else:
-                result = ask_professional_scheduler(
-                    question=prompt,
-                    plan_df=plan_df,
-                    hist_df=hist_df,
-                    product_map=product_map,
-                    plt_map=plt_map,
-                    question_date=target_date,
-                    mode="hybrid",
-                    today=TODAY,
-                    capa_limits=CAPA_LIMITS,
-                    genai_key=GENAI_KEY,
-                )
+                # 같은 구간·같은 데이터 버전이면 세션 간 같은 스냅샷 공유
+                plan_sid = init_plan_registry().put(plan_snapshot_key(target_date, plan_df), plan_df, plan_data_version())
+
+                # 엔진은 별도 스레드에서, Gemini 스트리밍 조각은 큐로 받아 이 스레드에서 말풍선 갱신
+                token_q: queue.Queue = queue.Queue()
+                with ThreadPoolExecutor(max_workers=1) as ex:
+                    future = ex.submit(
+                        ask_professional_scheduler,
+                        question=prompt,
+                        plan_df=plan_df,
+                        hist_df=hist_df,
+                        product_map=product_map,
+                        plt_map=plt_map,
+                        question_date=target_date,
+                        mode="hybrid",
+                        today=TODAY,
+                        capa_limits=CAPA_LIMITS,
+                        genai_key=GENAI_KEY,
+                        on_ai_token=token_q.put,
+                    )
+                    streamed = ""
+                    while not future.done() or not token_q.empty():
+                        try:
+                            streamed += token_q.get(timeout=0.1)
+                        except queue.Empty:
+                            continue
+                        stream_slot.markdown(
+                            message_html("assistant", f"🤖 AI 전략 작성 중... ({len(streamed):,}자)\n\n{streamed[-400:]}"),
+                            unsafe_allow_html=True,
+                        )
+                    result = future.result()
 
                 # ✅ 반환 튜플 길이 대응(4 또는 5)
                 report, success, charts, status, validated_moves = "", False, None, "", None
@@ -970,17 +1042,21 @@ if st.session_state.is_loading:
                         "delta_html": delta_html,
                         "validated_moves": validated_moves,
                         "report_md": report,
-                        "plan_df": plan_df,  # CAPA 그래프 위해 유지 (무거우면 제거 가능)
+                        "plan_snapshot_id": plan_sid,  # CAPA 그래프용 (세션 공용 스냅샷 id)
                     }
                 )
 
         else:
             # ✅ legacy 경로: 기존 로직 그대로
-            db_result = fetch_db_data_legacy(prompt, supabase)
+            db_result = fetch_db_data_legacy(prompt, db)
             if "찾을 수 없습니다" in db_result or "오류" in db_result:
                 answer = db_result
             else:
-                answer = query_gemini_ai_legacy(prompt, db_result, GENAI_KEY)
+                # 토큰이 도착하는 대로 말풍선 갱신 (첫 토큰까지가 체감 대기시간)
+                answer = ""
+                for chunk in stream_gemini_ai_legacy(prompt, db_result, GENAI_KEY):
+                    answer += chunk
+                    stream_slot.markdown(message_html("assistant", answer), unsafe_allow_html=True)
 
             st.session_state.messages.append({"role": "assistant", "engine": "legacy", "content": answer})
 
@@ -0,0 +1,268 @@
+# batch.py
+"""
+질문 배치 실행기 (JSONL → 결과 JSONL / moves 표)
+- 입력: 한 줄에 질문 1개 {"question": "1/21 조립1 80%", "id"?, "engine"?, "mode"?, "today"?, "capa_limits"?}
+  (줄 전체가 JSON 문자열이어도 됨, 빈 줄/# 주석 줄은 건너뜀)
+- 라우팅은 app/서비스와 같은 규칙 (service.route_question): 조정 질문 → hybrid, 그 외 → legacy
+- 생산계획은 부모 프로세스에서 전체 질문 구간을 1번만 읽어 정규화 → 워커 프로세스가 같은 스냅샷을 공유
+- 출력: 질문별 결과 JSONL(--out), 이동 내역 표(--moves-out: .parquet/.csv/.jsonl), 처리량/지연 요약(stdout)
+
+실행: python batch.py questions.jsonl --out results.jsonl --moves-out moves.parquet --workers 4 --mode optimize
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import service
+from hybrid import normalize_plan_df
+from plan_loader import add_name_clean, load_production_plan, plan_window
+from service import (
+    default_today,
+    json_default,
+    open_data_client,
+    parse_today,
+    route_question,
+    service_config_from_env,
+    service_worker_init,
+    solve_hybrid,
+    solve_legacy,
+)
+
+
+DEFAULT_RESULTS_PATH = "batch_results.jsonl"
+
+
+def read_questions(path: str) -> List[Dict[str, Any]]:
+    """JSONL 질문 목록 (id가 없으면 줄 번호로 q{n})"""
+    records: List[Dict[str, Any]] = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            rec = json.loads(line)
+            if isinstance(rec, str):
+                rec = {"question": rec}
+            rec.setdefault("id", f"q{n}")
+            records.append(rec)
+    return records
+
+
+def plan_tasks(
+    records: List[Dict[str, Any]],
+    mode: str = "hybrid",
+    today=None,
+) -> List[Dict[str, Any]]:
+    """질문별 실행 단위: 엔진/질문 날짜/기준일 결정 (실행 전에 걸러지는 오류는 error에 기록)"""
+    tasks = []
+    for i, rec in enumerate(records):
+        question = str(rec.get("question") or "").strip()
+        engine, target_date = route_question(question)
+        if rec.get("engine") in ("hybrid", "legacy"):
+            engine = rec["engine"]
+        task = {
+            "index": i,
+            "id": rec.get("id"),
+            "question": question,
+            "engine": engine,
+            "question_date": target_date,
+            "mode": rec.get("mode") or mode,
+            "today": None,
+            "capa_limits": rec.get("capa_limits"),
+            "error": None,
+        }
+        try:
+            task["today"] = parse_today(rec.get("today")) or today or default_today()
+        except ValueError:
+            task["error"] = "today는 YYYY-MM-DD 형식이어야 합니다."
+        if not question:
+            task["error"] = "question이 비어 있습니다."
+        elif engine == "hybrid" and not target_date:
+            task["error"] = "생산계획 조정 질문에는 날짜가 필요합니다."
+        tasks.append(task)
+    return tasks
+
+
+def load_shared_plan(client: Any, tasks: List[Dict[str, Any]], window_days: int) -> Tuple[Optional[pd.DataFrame], float]:
+    """hybrid 질문들의 구간 합집합을 1번에 읽어 정규화. Returns: (plan_df 또는 None, 걸린 초)"""
+    dates = [t["question_date"] for t in tasks if t["engine"] == "hybrid" and not t["error"]]
+    if not dates:
+        return None, 0.0
+    t0 = time.perf_counter()
+    start_date = plan_window(min(dates), window_days)[0]
+    end_date = plan_window(max(dates), window_days)[1]
+    plan_df, _ = load_production_plan(client, start_date, end_date)
+    if not plan_df.empty:
+        plan_df = normalize_plan_df(add_name_clean(plan_df))
+    return plan_df, time.perf_counter() - t0
+
+
+def run_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """워커에서 질문 1건 실행 (예외는 결과의 error로)"""
+    out = {k: task[k] for k in ("index", "id", "question", "engine", "question_date")}
+    if task["error"]:
+        out.update(status="[ERROR] 입력 오류", success=False, error=task["error"], timings={})
+        return out
+    try:
+        if task["engine"] == "hybrid":
+            res = solve_hybrid(task["question"], task["question_date"], task["mode"], task["today"], task["capa_limits"])
+        else:
+            res = solve_legacy(task["question"])
+    except Exception as e:
+        out.update(status="[ERROR] 실행 실패", success=False, error=str(e), timings={})
+        return out
+    out.update(res)
+    out["error"] = None
+    return out
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    lat = sorted(values)
+    if not lat:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+    def pct(p: float) -> float:
+        return lat[min(len(lat) - 1, int(len(lat) * p))]
+
+    return {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "max": lat[-1]}
+
+
+def write_moves(results: List[Dict[str, Any]], path: str) -> int:
+    """이동 내역을 질문 id와 함께 평평한 표로 저장 (.parquet / .csv / 그 외 JSONL). Returns: 행 수"""
+    rows = [
+        {"id": r["id"], "question_date": r.get("question_date"), **m}
+        for r in results
+        for m in (r.get("moves") or [])
+    ]
+    df = pd.DataFrame(rows)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        df.to_parquet(path, index=False)
+    elif ext == ".csv":
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    else:
+        df.to_json(path, orient="records", lines=True, force_ascii=False)
+    return len(df)
+
+
+def run_batch(
+    records: List[Dict[str, Any]],
+    out_path: str = DEFAULT_RESULTS_PATH,
+    moves_path: Optional[str] = None,
+    config: Optional[Dict[str, Any]] = None,
+    max_workers: Optional[int] = None,
+    mode: str = "hybrid",
+    today=None,
+    with_report: bool = False,
+) -> Dict[str, Any]:
+    """
+    질문 배치 실행 → 결과 JSONL 작성 (끝나는 순서대로 기록, index로 입력 순서 복원 가능)
+    - max_workers: 프로세스 수 (1이면 현재 프로세스에서 순차 실행, None이면 CPU 수)
+    Returns: 요약 dict (questions, ok, errors, wall_sec, throughput_qps, latency_ms, ...)
+    """
+    config = config if config is not None else service_config_from_env()
+    tasks = plan_tasks(records, mode=mode, today=today)
+    client, _ = open_data_client(config)
+    plan_df, plan_sec = load_shared_plan(client, tasks, int(config["window_days"]))
+
+    results: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+    with open(out_path, "w", encoding="utf-8") as out:
+
+        def _emit(res: Dict[str, Any]) -> None:
+            if not with_report:
+                res.pop("report", None)
+                res.pop("sections", None)
+            out.write(json.dumps(res, ensure_ascii=False, default=json_default) + "\n")
+            results.append(res)
+
+        if max_workers != 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(
+                max_workers=max_workers, initializer=service_worker_init, initargs=(config, plan_df)
+            ) as pool:
+                for fut in as_completed([pool.submit(run_task, t) for t in tasks]):
+                    _emit(fut.result())
+        else:
+            service_worker_init(config, plan_df)
+            try:
+                for t in tasks:
+                    _emit(run_task(t))
+            finally:
+                service._WORKER = None
+    wall = time.perf_counter() - t0
+
+    moves_rows = write_moves(results, moves_path) if moves_path else None
+    ok = [r for r in results if not r.get("error")]
+    by_engine: Dict[str, Any] = {}
+    for engine in ("hybrid", "legacy"):
+        done = [r for r in ok if r["engine"] == engine]
+        if done:
+            by_engine[engine] = {
+                "count": len(done),
+                "success": sum(1 for r in done if r.get("success")),
+                "latency_ms": _percentiles([r["timings"]["worker_ms"] for r in done]),
+            }
+    return {
+        "questions": len(tasks),
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "workers": max_workers or os.cpu_count() or 1,
+        "plan_rows": 0 if plan_df is None else len(plan_df),
+        "plan_load_sec": round(plan_sec, 3),
+        "wall_sec": round(wall, 3),
+        "throughput_qps": round(len(results) / wall, 2) if wall > 0 else 0.0,
+        "by_engine": by_engine,
+        "moves_rows": moves_rows,
+    }
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    lines = [
+        f"질문 {summary['questions']}건: 완료 {summary['ok']} / 오류 {summary['errors']} (workers={summary['workers']})",
+        f"plan 스냅샷: {summary['plan_rows']:,}행, 로드 {summary['plan_load_sec']:.2f}s",
+        f"소요 {summary['wall_sec']:.2f}s, 처리량 {summary['throughput_qps']:.2f} q/s",
+    ]
+    for engine, s in summary["by_engine"].items():
+        lat = s["latency_ms"]
+        lines.append(
+            f"- {engine}: {s['count']}건 (성공 {s['success']}), "
+            f"지연 ms p50 {lat['p50']:.0f} / p95 {lat['p95']:.0f} / p99 {lat['p99']:.0f} / max {lat['max']:.0f}"
+        )
+    if summary.get("moves_rows") is not None:
+        lines.append(f"이동 내역: {summary['moves_rows']:,}행")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="질문 JSONL 배치 실행 (hybrid/legacy 자동 라우팅)")
+    ap.add_argument("questions", help="질문 JSONL 파일")
+    ap.add_argument("--out", default=DEFAULT_RESULTS_PATH, help="질문별 결과 JSONL")
+    ap.add_argument("--moves-out", default=None, help="이동 내역 표 (.parquet / .csv / .jsonl)")
+    ap.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: CPU 수, 1이면 순차)")
+    ap.add_argument("--mode", default="hybrid", choices=["hybrid", "optimize"], help="hybrid 엔진 모드 (질문별 mode가 우선)")
+    ap.add_argument("--today", default=None, help="기준일 YYYY-MM-DD (기본: 오늘, 질문별 today가 우선)")
+    ap.add_argument("--with-report", action="store_true", help="결과에 보고서 본문/섹션 포함")
+    args = ap.parse_args(argv)
+
+    summary = run_batch(
+        read_questions(args.questions),
+        out_path=args.out,
+        moves_path=args.moves_out,
+        max_workers=args.workers,
+        mode=args.mode,
+        today=parse_today(args.today),
+        with_report=args.with_report,
+    )
+    print(format_summary(summary))
+
+
+if __name__ == "__main__":
+    main()
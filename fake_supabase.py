@@ -0,0 +1,161 @@
+# fake_supabase.py
+"""
+메모리 가짜 Supabase 클라이언트 (로컬 벤치마크/프로파일링용, 네트워크 없음)
+- 픽스처 폴더의 {테이블명}.csv / {테이블명}.parquet 를 메모리 SQLite에 적재 (테이블별 필터 컬럼 인덱스)
+  production_plan_2026_01, daily_capa, daily_total_production, monthly_production,
+  final_issue, production_issue_analysis_8_11
+- 쿼리 빌더는 snapshot_store.LocalQuery 그대로: table().select(cols, count=).eq/neq/gt/gte/lt/lte/in_/like/ilike/or_
+  .order/.limit/.range → execute().data / .count
+- latency: execute()마다 인위 지연 (초 숫자 또는 gemini_standin 지연 분포 문자열, 예: "lognormal:-3,0.5")
+- max_rows: PostgREST 행 상한 재현 (limit/range가 더 커도 잘림, count="exact"는 전체 행 수)
+- app/서비스에서는 SUPABASE_FIXTURES_DIR(+ FAKE_SUPABASE_LATENCY)를 주면 실제 Supabase 대신 사용
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from gemini_standin import parse_latency
+from snapshot_store import LocalQuery, LocalResult, SnapshotStore
+
+
+FIXTURE_TABLES = (
+    "production_plan_2026_01",
+    "daily_capa",
+    "daily_total_production",
+    "monthly_production",
+    "final_issue",
+    "production_issue_analysis_8_11",
+)
+FIXTURE_EXTENSIONS = (".parquet", ".csv")
+
+# fetch_data / legacy.fetch_db_data_legacy가 거는 필터 기준 (컬럼이 있는 것만 생성)
+DEFAULT_INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    "production_plan_2026_01": [("plan_date",), ("line", "plan_date")],
+    "daily_capa": [("월",)],
+    "daily_total_production": [("월", "버전"), ("날짜", "버전")],
+    "monthly_production": [("월", "버전")],
+    "final_issue": [("date",), ("final_remark", "field_role")],
+    "production_issue_analysis_8_11": [("최종_이슈분류",)],
+}
+
+
+def read_fixture(path: str) -> pd.DataFrame:
+    if path.lower().endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, encoding="utf-8-sig")
+
+
+class FakeQuery(LocalQuery):
+    """LocalQuery + 인위 지연 / 행 상한 / 조회 통계 (원격 동기화 없음)"""
+
+    def __init__(self, fake: "FakeSupabase", table: str):
+        super().__init__(fake.store, table, sync=False)
+        self.fake = fake
+
+    def execute(self) -> LocalResult:
+        self.fake._sleep()
+        max_rows = self.fake.max_rows
+        if max_rows and (self._limit is None or self._limit > max_rows):
+            self._limit = max_rows
+        res = super().execute()
+        self.fake._record(self.table_name, len(res.data))
+        return res
+
+
+class FakeSupabase:
+    """supabase Client 대용: table(name)만 제공 (스레드 안전)"""
+
+    def __init__(
+        self,
+        tables: Optional[Dict[str, pd.DataFrame]] = None,
+        fixtures_dir: Optional[str] = None,
+        latency: Any = None,
+        max_rows: Optional[int] = None,
+        seed: Optional[int] = None,
+        indexes: Optional[Dict[str, Sequence[Tuple[str, ...]]]] = None,
+    ):
+        self.store = SnapshotStore(path=":memory:")
+        self.max_rows = int(max_rows) if max_rows else None
+        self.indexes = DEFAULT_INDEXES if indexes is None else indexes
+        if isinstance(latency, (int, float)):
+            latency = f"fixed:{latency}"
+        self._latency = parse_latency(latency)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        if fixtures_dir:
+            self.load_fixtures(fixtures_dir)
+        for name, df in (tables or {}).items():
+            self.load_table(name, df)
+
+    # -------------------------------
+    # 적재
+    # -------------------------------
+    def load_table(self, name: str, df: pd.DataFrame) -> None:
+        """테이블 전체 교체 + 인덱스 생성"""
+        self.store.load_frame(name, df)
+        for cols in self.indexes.get(name, ()):
+            self.store.create_index(name, cols)
+
+    def load_fixtures(self, fixtures_dir: str, names: Sequence[str] = FIXTURE_TABLES) -> List[str]:
+        """폴더에서 테이블별 픽스처 적재 (parquet 우선). Returns: 적재한 테이블명"""
+        loaded = []
+        for name in names:
+            for ext in FIXTURE_EXTENSIONS:
+                path = os.path.join(fixtures_dir, name + ext)
+                if os.path.exists(path):
+                    self.load_table(name, read_fixture(path))
+                    loaded.append(name)
+                    break
+        return loaded
+
+    # -------------------------------
+    # 조회
+    # -------------------------------
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def _sleep(self) -> None:
+        with self._lock:
+            delay = self._latency(self._rng)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _record(self, table: str, rows: int) -> None:
+        with self._lock:
+            st = self._stats.setdefault(table, {"queries": 0, "rows": 0})
+            st["queries"] += 1
+            st["rows"] += rows
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """테이블별 조회 횟수/반환 행 수"""
+        with self._lock:
+            return {k: dict(v) for k, v in self._stats.items()}
+
+
+def fake_from_config(fixtures_dir: Optional[str], latency: Any = None, max_rows: Any = None) -> Optional[FakeSupabase]:
+    """설정값(환경변수 문자열 그대로 가능)으로 가짜 클라이언트. fixtures_dir가 비어 있으면 None"""
+    if not fixtures_dir:
+        return None
+    return FakeSupabase(
+        fixtures_dir=fixtures_dir,
+        latency=latency or None,
+        max_rows=int(max_rows) if max_rows else None,
+    )
+
+
+def fake_from_env() -> Optional[FakeSupabase]:
+    """SUPABASE_FIXTURES_DIR가 있으면 가짜 클라이언트 (FAKE_SUPABASE_LATENCY, FAKE_SUPABASE_MAX_ROWS 선택)"""
+    return fake_from_config(
+        os.environ.get("SUPABASE_FIXTURES_DIR"),
+        latency=os.environ.get("FAKE_SUPABASE_LATENCY"),
+        max_rows=os.environ.get("FAKE_SUPABASE_MAX_ROWS"),
+    )
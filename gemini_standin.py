@@ -0,0 +1,366 @@
+# gemini_standin.py
+"""
+오프라인 Gemini 대역 서버 (부하/지연 테스트용, 외부 API 호출 없음)
+- Gemini REST 계약 그대로: POST /v1beta/models/{model}:generateContent
+                          POST /v1beta/models/{model}:streamGenerateContent?alt=sse  (legacy 스트리밍)
+                          POST /v1beta/models/{model}:streamGenerateContent          (SDK REST 전송: JSON 배열 스트림)
+- 엔진 쪽 선택: GEMINI_API_ENDPOINT=http://127.0.0.1:8089
+  (hybrid.step5는 google.generativeai REST 전송, legacy는 GEMINI_API_BASE가 이 주소를 사용)
+- 지연 분포: fixed:0.5 / uniform:0.2,1.5 / normal:0.8,0.2 / lognormal:-0.5,0.6 / exp:0.7 (초)
+- 오류 주입: error_rate(500), rate_limit_rate(429 + Retry-After)
+- 응답: canned(JSON 파일의 텍스트/응답 목록을 순환) 또는 규칙 생성(5단계 팩트 보고서를 읽어 moves JSON 작성)
+- seed가 같으면 n번째 요청의 지연/오류 주입이 같음 (요청 순서 기준)
+- GET /stats: 요청/주입 오류 횟수
+
+실행: python gemini_standin.py --port 8089 --latency lognormal:-0.5,0.6 --rate-limit-rate 0.05 --seed 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+DEFAULT_PORT = 8089
+DEFAULT_STREAM_CHUNK_CHARS = 40
+DEFAULT_RETRY_AFTER_SEC = 1
+
+LatencyFn = Callable[[random.Random], float]
+
+
+# ========================================================================
+# 지연 분포
+# ========================================================================
+def parse_latency(spec: Optional[str]) -> LatencyFn:
+    """'kind:a,b' → rng를 받아 지연(초)을 돌려주는 함수 (음수는 0으로)"""
+    if not spec:
+        return lambda rng: 0.0
+    kind, _, args = str(spec).partition(":")
+    vals = [float(x) for x in args.split(",") if x.strip()]
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        fn = lambda rng: vals[0]
+    elif kind == "uniform":
+        fn = lambda rng: rng.uniform(vals[0], vals[1])
+    elif kind == "normal":
+        fn = lambda rng: rng.gauss(vals[0], vals[1])
+    elif kind == "lognormal":
+        fn = lambda rng: rng.lognormvariate(vals[0], vals[1])
+    elif kind == "exp":
+        fn = lambda rng: rng.expovariate(1.0 / vals[0])
+    else:
+        raise ValueError(f"지원하지 않는 지연 분포: {spec} (fixed/uniform/normal/lognormal/exp)")
+    return lambda rng: max(0.0, fn(rng))
+
+
+# ========================================================================
+# 규칙 기반 moves (hybrid 5단계 프롬프트용)
+# ========================================================================
+_ITEM_RE = re.compile(
+    r"^\d+\.\s*(?P<name>.+?)\s*\|\s*현재:(?P<cur>[\d,]+)\s*\|\s*이동최대:(?P<max>[\d,]+)"
+    r"\s*\|\s*PLT:(?P<plt>\d+)\s*\|\s*여유:(?P<buf>-?\d+)일\s*\|\s*제약:(?P<con>.+)$",
+    re.M,
+)
+_CAPA_RE = re.compile(r"^- (?P<date>\d{4}-\d{2}-\d{2}) (?P<line>\S+): 잔여 (?P<rem>-?[\d,]+)개", re.M)
+_TARGET_RE = re.compile(r"- 대상: (?P<date>\d{4}-\d{2}-\d{2}) (?P<line>\S+)")
+_GOAL_RE = re.compile(r"- 목표: (?P<op>감축|증량) (?P<qty>[\d,]+)개")
+
+
+def _int(s: str) -> int:
+    return int(str(s).replace(",", ""))
+
+
+def _allowed_lines(constraint: str, target_line: str) -> List[str]:
+    if "모두 가능" in constraint:
+        return [l for l in ("조립1", "조립2", "조립3") if l != target_line]
+    if "조립1, 2만" in constraint:
+        return [l for l in ("조립1", "조립2") if l != target_line]
+    return []
+
+
+def rule_strategy(prompt: str) -> Optional[Dict[str, Any]]:
+    """
+    5단계 팩트 보고서 → {"strategy", "explanation", "moves"} (보고서가 아니면 None)
+    - 감축: 같은 날 허용 타라인(잔여 > 0) → 같은 라인 미래 날짜(여유일 이내) 순으로 PLT 배수만큼 배분
+    - 증량: 같은 라인 미래 날짜에서 당기기
+    """
+    target = _TARGET_RE.search(prompt)
+    goal = _GOAL_RE.search(prompt)
+    if not target or not goal:
+        return None
+    t_date, t_line = target.group("date"), target.group("line")
+    need = _int(goal.group("qty"))
+    reduce = goal.group("op") == "감축"
+    remaining = {(m.group("date"), m.group("line")): _int(m.group("rem")) for m in _CAPA_RE.finditer(prompt)}
+    d0 = datetime.strptime(t_date, "%Y-%m-%d").date()
+
+    def _days_after(d: str) -> int:
+        return (datetime.strptime(d, "%Y-%m-%d").date() - d0).days
+
+    future = sorted(d for (d, l) in remaining if l == t_line and _days_after(d) > 0)
+    moves: List[Dict[str, Any]] = []
+    for m in _ITEM_RE.finditer(prompt):
+        if need <= 0:
+            break
+        name, plt = m.group("name").strip(), max(1, _int(m.group("plt")))
+        movable = min(_int(m.group("max")), _int(m.group("cur")))
+        if reduce:
+            slots = [(t_date, l) for l in _allowed_lines(m.group("con"), t_line)]
+            slots += [(d, t_line) for d in future if _days_after(d) <= _int(m.group("buf"))]
+        else:
+            slots = [(d, t_line) for d in future]
+        for d, l in slots:
+            room = remaining.get((d, l), 0) if reduce else movable
+            qty = min(movable, need, room) // plt * plt
+            if qty <= 0:
+                continue
+            src, dst = (f"{t_date}_{t_line}", f"{d}_{l}") if reduce else (f"{d}_{l}", f"{t_date}_{t_line}")
+            moves.append({"item": name, "qty": qty, "plt": qty // plt, "from": src, "to": dst, "reason": "대역 서버 규칙 배분"})
+            if reduce:
+                remaining[(d, l)] = room - qty
+            movable -= qty
+            need -= qty
+            if need <= 0 or movable < plt:
+                break
+    return {
+        "strategy": "대역 서버 규칙 배분",
+        "explanation": "팩트 보고서의 잔여 CAPA/여유일 안에서 품목 순서대로 PLT 배수만큼 배분했습니다. (오프라인 대역 응답)",
+        "moves": moves,
+    }
+
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    parts = []
+    for content in body.get("contents") or []:
+        for part in content.get("parts") or []:
+            parts.append(str(part.get("text", "")))
+    return "\n".join(parts)
+
+
+# ========================================================================
+# 대역 서버 상태
+# ========================================================================
+class GeminiStandIn:
+    """요청별 지연/오류 주입과 응답 텍스트 결정 (스레드 안전)"""
+
+    def __init__(
+        self,
+        latency: Optional[str] = None,
+        chunk_latency: Optional[str] = None,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: int = DEFAULT_RETRY_AFTER_SEC,
+        canned: Optional[List[Any]] = None,
+        stream_chunk_chars: int = DEFAULT_STREAM_CHUNK_CHARS,
+        seed: Optional[int] = None,
+    ):
+        self.latency = parse_latency(latency)
+        self.chunk_latency = parse_latency(chunk_latency)
+        self.error_rate = float(error_rate)
+        self.rate_limit_rate = float(rate_limit_rate)
+        self.retry_after = int(retry_after)
+        self.canned = list(canned or [])
+        self.stream_chunk_chars = max(1, int(stream_chunk_chars))
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._counts = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "streams": 0}
+
+    def _next(self) -> Tuple[int, random.Random]:
+        with self._lock:
+            self._seq += 1
+            n = self._seq
+            self._counts["requests"] += 1
+        rng = random.Random(f"{self.seed}:{n}") if self.seed is not None else random.Random()
+        return n, rng
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def decide(self) -> Tuple[Optional[int], float, random.Random, int]:
+        """Returns: (주입할 오류 상태 코드 또는 None, 첫 응답까지 지연 초, 요청 rng, 요청 번호)"""
+        n, rng = self._next()
+        delay = self.latency(rng)
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            self._count("rate_limited")
+            return 429, delay, rng, n
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._count("errors")
+            return 500, delay, rng, n
+        self._count("ok")
+        return None, delay, rng, n
+
+    def reply_text(self, prompt: str, n: int) -> str:
+        if self.canned:
+            c = self.canned[(n - 1) % len(self.canned)]
+            return c if isinstance(c, str) else json.dumps(c, ensure_ascii=False)
+        strategy = rule_strategy(prompt)
+        if strategy is not None:
+            return "```json\n" + json.dumps(strategy, ensure_ascii=False, indent=2) + "\n```"
+        question = prompt.rsplit("[User Question]", 1)[-1].strip() if "[User Question]" in prompt else ""
+        context = prompt.split("[Context Data]", 1)[-1].split("[User Question]", 1)[0].strip()
+        return f"(오프라인 대역 응답) {question}\n\n{context[:1500]}"
+
+    def chunks(self, text: str) -> List[str]:
+        k = self.stream_chunk_chars
+        return [text[i : i + k] for i in range(0, len(text), k)] or [""]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counts, seq=self._seq)
+
+
+def _response_json(text: str, finish: bool = True) -> Dict[str, Any]:
+    cand: Dict[str, Any] = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finish:
+        cand["finishReason"] = "STOP"
+    return {
+        "candidates": [cand],
+        "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": len(text), "totalTokenCount": len(text)},
+        "modelVersion": "standin",
+    }
+
+
+def _error_json(code: int) -> Dict[str, Any]:
+    status = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL"}.get(code, "UNKNOWN")
+    return {"error": {"code": code, "message": f"stand-in injected {status}", "status": status}}
+
+
+# ========================================================================
+# HTTP
+# ========================================================================
+class _Handler(BaseHTTPRequestHandler):
+    standin: GeminiStandIn = None  # make_server에서 지정
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, code: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        if urlparse(self.path).path == "/stats":
+            self._send_json(200, self.standin.stats())
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "not found"}})
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        _, _, method = url.path.rpartition(":")
+        if not url.path.startswith("/v1beta/models/") or method not in ("generateContent", "streamGenerateContent"):
+            self._send_json(404, {"error": {"code": 404, "message": "not found"}})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"code": 400, "message": "invalid JSON"}})
+            return
+
+        s = self.standin
+        code, delay, rng, n = s.decide()
+        time.sleep(delay)
+        if code is not None:
+            headers = {"Retry-After": str(s.retry_after)} if code == 429 else None
+            self._send_json(code, _error_json(code), headers)
+            return
+
+        text = s.reply_text(_prompt_text(body), n)
+        if method == "generateContent":
+            self._send_json(200, _response_json(text))
+            return
+
+        # 스트리밍: alt=sse → "data: {...}\n\n", 그 외(SDK REST) → JSON 배열을 조각으로
+        s._count("streams")
+        sse = parse_qs(url.query).get("alt", [""])[0] == "sse"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8" if sse else "application/json; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = s.chunks(text)
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(s.chunk_latency(rng))
+            payload = json.dumps(_response_json(piece, finish=i == len(pieces) - 1), ensure_ascii=False)
+            if sse:
+                data = f"data: {payload}\r\n\r\n"
+            else:
+                data = ("[" if i == 0 else ",\r\n") + payload + ("]" if i == len(pieces) - 1 else "")
+            self._write_chunk(data.encode("utf-8"))
+        self._write_chunk(b"")
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def make_server(standin: GeminiStandIn, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type("GeminiStandInHandler", (_Handler,), {"standin": standin})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def load_canned(path: Optional[str]) -> Optional[List[Any]]:
+    """JSON 파일: 응답 1개(dict/str) 또는 응답 목록(list, 요청마다 순환)"""
+    if not path:
+        return None
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="오프라인 Gemini 대역 서버")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--latency", default=None, help="첫 응답까지 지연 분포 (예: lognormal:-0.5,0.6)")
+    ap.add_argument("--chunk-latency", default=None, help="스트리밍 조각 간 지연 분포 (예: fixed:0.03)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="500 주입 비율 (0~1)")
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 주입 비율 (0~1)")
+    ap.add_argument("--retry-after", type=int, default=DEFAULT_RETRY_AFTER_SEC, help="429 응답의 Retry-After(초)")
+    ap.add_argument("--canned", default=None, help="고정 응답 JSON 파일 (없으면 규칙 생성)")
+    ap.add_argument("--chunk-chars", type=int, default=DEFAULT_STREAM_CHUNK_CHARS, help="스트리밍 조각 크기(문자)")
+    ap.add_argument("--seed", type=int, default=None, help="지연/오류 주입 재현용 시드")
+    args = ap.parse_args(argv)
+
+    standin = GeminiStandIn(
+        latency=args.latency,
+        chunk_latency=args.chunk_latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        canned=load_canned(args.canned),
+        stream_chunk_chars=args.chunk_chars,
+        seed=args.seed,
+    )
+    server = make_server(standin, args.host, args.port)
+    print(f"gemini stand-in: http://{args.host}:{args.port} (GEMINI_API_ENDPOINT로 지정)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
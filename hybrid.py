@@ -10,35 +10,97 @@ hybrid.py
 ✅ FIX 2) generate_full_report()
 - 최종 조치 계획 출력 시, 동일 item/from/to는 합산해서 1줄로 표시
   → 같은 내용이 1PLT씩 여러 줄로 쪼개져 보이던 문제 개선(표시만 변경, 계산 로직 불변)
+
+✅ PERF 1) PlanIndex
+- plan_df를 질문당 1회만 인덱싱해서 step1/step3/step6/폴백의 (날짜, 라인) 필터를 O(1) 조회로 대체
+
+✅ PERF 2) build_slack_table()
+- 품목별 누적 납기 여유(cumsum/future_slack/last_due/buffer_days)를 groupby 1회로 전 품목 계산 → step2는 조회만
+
+✅ PERF 3) DueProfile / DueCumsumChecker
+- step6 누적 납기 검증을 품목별 여유 배열(c1 - c0) + 세그먼트 트리 O(log n) 조회로 대체
+- 같은 capa_status로 승인된 이전 이동(같은 품목)도 누적 반영해서 검증 (기존에는 이동 1건씩 독립 검증)
+
+✅ PERF 4) WorkCalendar
+- is_workday 변환/정렬을 스냅샷당 1회만 → 가동일 판정은 dict 조회, 다음/이전 N 가동일·horizon 자르기는 bisect
+
+✅ PERF 5) CapacityLedger
+- capa_status를 (날짜, 라인) 슬롯의 NumPy 배열 + undo journal로 관리
+- 폴백/잔업·특근 시뮬레이션은 deepcopy·step3 재계산 대신 checkpoint()/rollback()
+
+✅ PERF 6) mode="optimize"
+- AI→검증→폴백×2 대신 optimizer.MinCostFlow로 품목×목적지 배분을 한 번에 계산 (검증은 step6 그대로)
+
+✅ PERF 7) 폴백 수량 선택 (PLT 조합 DP)
+- 그리디 PLT 내림으로 목표에 못 미치면 optimizer.bounded_knapsack_fill로 후보별 PLT 수를 다시 골라 목표에 최대한 맞춤
+
+✅ PERF 8) level_horizon()
+- 한 달 평준화를 질문 N번(매번 조회 + Gemini) 대신 1회 호출로: 전 슬롯 공유 CAPA 장부 + 누적 납기 검증기 위에서 초과 슬롯을 날짜순 최적화
+
+✅ PERF 9) sweep_capa_targets()
+- 70/75/80/85/90%처럼 목표치만 바꿔 묻는 경우 1~4단계는 1회, 목표별 풀이는 프로세스 풀에서 병렬
+
+✅ PERF 10) 투기적 병렬 계획 (mode="hybrid")
+- Gemini 호출(스레드 풀)과 Python 계획(optimize_moves)을 동시에 → AI 지연 예산(ai_latency_budget) 초과/오류면 Python 계획으로 바로 진행
+- 둘 다 있으면 step6 승인량이 큰 쪽 채택 (같으면 AI), 늦게 온 AI 결과는 on_late_ai 콜백으로 전달
+- Python 계획 = optimize_moves / 기존 폴백 중 승인량이 큰 쪽, AI 풀은 GEMINI_MAX_INFLIGHT개 (꽉 차면 AI 생략)
+
+✅ PERF 11) normalize_plan_df() / PlanFacts
+- plan_df는 진입 시 1회 타입 정규화 (line/product_name category, 수량 int32, is_workday bool)
+- horizon_end / 품목별 last_due는 스냅샷당 1회 계산 → step3/step6/감축 폴백에서 plan_df 복사·to_numeric 반복 제거
+
+✅ PERF 12) SchedulerContext
+- 전역 TODAY/CAPA_LIMITS 제거 → 질문마다 불변 문맥(today, capa_limits, 정규화 plan_df, 인덱스/달력/납기 프로파일)을 만들어 인자로 전달
+- 동시 질문(스레드/세션)끼리 기준일·CAPA가 섞이지 않음, 락 없이 병렬 실행 가능
 """
 
 from __future__ import annotations
 
 import json
+import os
+import pickle
 import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Tuple, Optional
-from copy import deepcopy
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple, Optional
 
+import numpy as np
 import pandas as pd
 import google.generativeai as genai
 
+from ai_cache import StrategyCache, get_strategy_cache, strategy_cache_key
+from optimizer import MinCostFlow, bounded_knapsack_fill
+
 
 # ========================================================================
-# 전역 변수 (앱에서 넘겨준 today/capa_limits를 여기서 세팅)
+# 상수 (질문별 today/capa_limits는 전역이 아니라 SchedulerContext로 전달)
 # ========================================================================
-TODAY = None
-CAPA_LIMITS = None
-
-
 
 # 사람 같은 분산: T6 '같은날 타라인 이송'은 우선 1회, 최대 5PLT까지만 사용
 MAX_T6_SAMEDAY_SHIFT_PLTS = 5
 ENGINE_VERSION = "HUMANPLAN_V5"
-def initialize_globals(today, capa_limits):
-    global TODAY, CAPA_LIMITS
-    TODAY = today
-    CAPA_LIMITS = capa_limits
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+# 비워두면 공식 API. 오프라인 테스트는 GEMINI_API_ENDPOINT=http://127.0.0.1:8089 (gemini_standin.py, REST 전송)
+GEMINI_API_ENDPOINT = os.environ.get("GEMINI_API_ENDPOINT", "")
+# 하이브리드 모드: Gemini 응답을 기다리는 최대 시간(초). 넘으면 Python 계획을 먼저 반환
+AI_LATENCY_BUDGET_SEC = 20.0
+# Gemini 동시 호출 상한 (legacy.GEMINI_MAX_INFLIGHT와 동일) / 호출 1건의 HTTP 타임아웃(초): 멈춘 호출이 워커를 영구 점유하지 않도록
+GEMINI_MAX_INFLIGHT = 8
+GEMINI_REQUEST_TIMEOUT_SEC = 60.0
+_AI_POOL: Optional[ThreadPoolExecutor] = None
+_AI_POOL_LOCK = threading.Lock()
+_AI_INFLIGHT: Dict[Any, float] = {}  # 진행 중 future → 제출 시각
+_GENAI_LOCK = threading.Lock()
+_GENAI_CONFIGURED: Optional[Tuple[str, str]] = None
+_SWEEP_POOLS: Dict[Optional[int], ProcessPoolExecutor] = {}  # max_workers → 재사용 프로세스 풀 (sweep_capa_targets)
+_SWEEP_POOL_LOCK = threading.Lock()
+DEFAULT_TODAY = datetime(2026, 1, 5).date()
+DEFAULT_CAPA_LIMITS = {"조립1": 3300, "조립2": 3700, "조립3": 3600}
 
 
 # ========================================================================
@@ -72,36 +134,277 @@ def _coerce_is_workday(v: Any) -> bool:
         return False
 
 
-def is_workday_in_db(plan_df: pd.DataFrame, date_str: str) -> bool:
+class WorkCalendar:
+    """plan 스냅샷당 1회: is_workday를 미리 변환해 둔 가동일 달력
+    - workdays: 가동일(정렬 리스트) → 다음/이전 N 가동일, horizon 자르기는 bisect
+    - is_workday: 날짜별 플래그 dict (첫 행 기준) → O(1)
+    """
+
+    def __init__(self, plan_df: pd.DataFrame):
+        self.has_flags = (not plan_df.empty) and ("is_workday" in plan_df.columns)
+        self.flags: Dict[str, bool] = {}
+        self.workdays: List[str] = []
+        if not self.has_flags:
+            return
+
+        db_dates = plan_df[["plan_date", "is_workday"]].drop_duplicates()
+        coerced = db_dates["is_workday"].apply(_coerce_is_workday)
+        for d, w in zip(db_dates["plan_date"], coerced):
+            self.flags.setdefault(d, bool(w))
+        self.workdays = sorted(set(db_dates["plan_date"][coerced.astype(bool)]))
+
+    def is_workday(self, date_str: str) -> bool:
+        if not self.has_flags:
+            # is_workday가 없으면 "가동일 체크 불가"로 보고 True 처리(운영 정책에 따라 False로 바꿔도 됨)
+            return True
+        return self.flags.get(date_str, False)
+
+    def next_workdays(self, start_date_str: str, days_count: int, exclusive: bool = False, until: Optional[str] = None) -> List[str]:
+        """start 이후(exclusive면 start 제외) 가동일 최대 days_count개, until(포함)까지만"""
+        i = (bisect_right if exclusive else bisect_left)(self.workdays, start_date_str)
+        j = bisect_right(self.workdays, until) if until else len(self.workdays)
+        return self.workdays[i:max(i, min(j, i + days_count))]
+
+    def prev_workdays(self, start_date_str: str, days_count: int, after: Optional[str] = None) -> List[str]:
+        """start 이전(미포함)·after 초과 가동일 중 start에 가까운 days_count개 (오름차순)"""
+        j = bisect_left(self.workdays, start_date_str)
+        i = bisect_right(self.workdays, after) if after else 0
+        return self.workdays[max(i, j - days_count):j] if j > i else []
+
+
+def is_workday_in_db(calendar: WorkCalendar, date_str: str) -> bool:
     """특정 날짜가 가동일인지 확인 (is_workday 컬럼 사용)"""
-    if plan_df.empty or "is_workday" not in plan_df.columns:
-        # is_workday가 없으면 "가동일 체크 불가"로 보고 True 처리(운영 정책에 따라 False로 바꿔도 됨)
-        return True
+    return calendar.is_workday(date_str)
 
-    date_info = plan_df[plan_df["plan_date"] == date_str]
-    if date_info.empty:
-        return False
-    return _coerce_is_workday(date_info.iloc[0]["is_workday"])
-def get_workdays_from_db(plan_df: pd.DataFrame, start_date_str: str, direction="future", days_count=10) -> List[str]:
-    """DB의 is_workday 기반으로 가동일 리스트 반환"""
-    if plan_df.empty or "is_workday" not in plan_df.columns:
-        return []
 
-    db_dates = plan_df[["plan_date", "is_workday"]].drop_duplicates().sort_values("plan_date").copy()
-    db_dates["__workday"] = db_dates["is_workday"].apply(_coerce_is_workday)
+def get_workdays_from_db(
+    calendar: WorkCalendar, start_date_str: str, direction="future", days_count=10, today_str: Optional[str] = None
+) -> List[str]:
+    """DB의 is_workday 기반으로 가동일 리스트 반환 (과거 방향은 today_str 이후만)"""
+    if not calendar.has_flags:
+        return []
 
     if direction == "future":
-        available = db_dates[(db_dates["plan_date"] >= start_date_str) & (db_dates["__workday"] == True)]
-        return available["plan_date"].head(days_count).tolist()
-
-    # 과거: TODAY 이후만 (고정기간/정책에 맞게 조정 가능)
-    today_str = TODAY.strftime("%Y-%m-%d") if TODAY else "1900-01-01"
-    available = db_dates[
-        (db_dates["plan_date"] < start_date_str)
-        & (db_dates["plan_date"] > today_str)
-        & (db_dates["__workday"] == True)
-    ]
-    return available["plan_date"].tail(days_count).tolist()
+        return calendar.next_workdays(start_date_str, days_count)
+
+    # 과거: today 이후만 (고정기간/정책에 맞게 조정 가능)
+    return calendar.prev_workdays(start_date_str, days_count, after=today_str or "1900-01-01")
+
+
+# ========================================================================
+# plan 정규화: 로드 직후(또는 엔진 진입 시) 1회만 타입 변환/검증
+# ========================================================================
+
+PLAN_QTY_COLS = ("qty_0차", "qty_1차", "plt")
+PLAN_CATEGORY_COLS = ("line", "product_name")
+
+
+def _is_normalized_plan(plan_df: pd.DataFrame) -> bool:
+    for c in PLAN_CATEGORY_COLS:
+        if c in plan_df.columns and not isinstance(plan_df[c].dtype, pd.CategoricalDtype):
+            return False
+    for c in PLAN_QTY_COLS:
+        if c in plan_df.columns and plan_df[c].dtype != np.int32:
+            return False
+    if "is_workday" in plan_df.columns and plan_df["is_workday"].dtype != bool:
+        return False
+    return True
+
+
+def normalize_plan_df(plan_df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """
+    plan_df 컴팩트 정규화 (이미 정규화된 DataFrame이면 그대로 반환)
+    - plan_date: 'YYYY-MM-DD' 문자열 (같은 날짜는 str 객체 1개 공유 → 행마다 문자열 복사 없음)
+    - line/product_name: category
+    - qty_0차/qty_1차/plt: int32 (숫자가 아니거나 비어 있으면 0)
+    - is_workday: bool (_coerce_is_workday 기준)
+    """
+    if plan_df is None:
+        return pd.DataFrame()
+    if plan_df.empty or _is_normalized_plan(plan_df):
+        return plan_df
+
+    df = plan_df.copy()
+    if "plan_date" in df.columns:
+        dates = pd.Categorical(df["plan_date"].astype(str).str[:10])
+        df["plan_date"] = np.asarray(dates.categories, dtype=object)[dates.codes]
+    for c in PLAN_CATEGORY_COLS:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    for c in PLAN_QTY_COLS:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(np.int32)
+    if "is_workday" in df.columns:
+        df["is_workday"] = df["is_workday"].map(_coerce_is_workday).astype(bool)
+    return df.reset_index(drop=True)
+
+
+# ========================================================================
+# PlanIndex: plan_df를 1회만 스캔해서 (날짜, 라인) / (품목, 날짜, 라인) 조회를 O(1)로
+# ========================================================================
+
+class PlanIndex:
+    """plan 스냅샷 1개당 1회 생성하는 조회 인덱스.
+    - (date, line) -> qty_1차 합계 / 원본 행(records, 원래 순서 유지)
+    - (product, date, line) -> qty_1차 합계
+    """
+
+    def __init__(self, plan_df: pd.DataFrame):
+        self.totals: Dict[Tuple[str, str], int] = {}
+        self.rows: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self.item_qty: Dict[Tuple[str, str, str], int] = {}
+
+        if plan_df.empty or not {"plan_date", "line"}.issubset(set(plan_df.columns)):
+            return
+
+        for rec in plan_df.to_dict("records"):
+            self.rows.setdefault((rec["plan_date"], rec["line"]), []).append(rec)
+
+        if "qty_1차" not in plan_df.columns:
+            return
+
+        for (d, ln), v in plan_df.groupby(["plan_date", "line"], sort=False, observed=True)["qty_1차"].sum().items():
+            self.totals[(d, ln)] = int(v) if pd.notna(v) else 0
+
+        if "product_name" in plan_df.columns:
+            grouped = plan_df.groupby(["product_name", "plan_date", "line"], sort=False, observed=True)["qty_1차"].sum()
+            for (name, d, ln), v in grouped.items():
+                self.item_qty[(name, d, ln)] = int(v) if pd.notna(v) else 0
+
+    def line_total(self, date_str: str, line: str) -> int:
+        return self.totals.get((date_str, line), 0)
+
+    def line_rows(self, date_str: str, line: str) -> List[Dict[str, Any]]:
+        return self.rows.get((date_str, line), [])
+
+    def product_qty(self, product: str, date_str: str, line: str) -> int:
+        return self.item_qty.get((product, date_str, line), 0)
+
+
+# ========================================================================
+# CapacityLedger: (날짜, 라인)별 CAPA 잔여량 장부
+# - NumPy 배열(slot 단위) + undo journal → checkpoint()/rollback()은 건드린 이동 수만큼만 비용
+# - 폴백 시뮬레이션/잔업·특근 시뮬레이션에서 deepcopy(capa_status) 대체
+# ========================================================================
+
+class CapacityLedger:
+    """capa_status 대체. items()는 기존 dict 구조({date, line, current, remaining, max, usage_rate})로 보여줌"""
+
+    def __init__(self, initial_slots: int = 16):
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._max = np.zeros(initial_slots, dtype=np.int64)
+        self._current = np.zeros(initial_slots, dtype=np.int64)
+        self._remaining = np.zeros(initial_slots, dtype=np.int64)
+        self._usage = np.zeros(initial_slots, dtype=np.float64)
+        # (op, slot, delta): op = "remaining" | "max" | "slot"(delta 자리에 (key, current, max))
+        self._journal: List[Tuple[str, int, Any]] = []
+
+    def _grow(self) -> None:
+        n = len(self._max) * 2
+        for attr in ("_max", "_current", "_remaining", "_usage"):
+            arr = getattr(self, attr)
+            grown = np.zeros(n, dtype=arr.dtype)
+            grown[: len(arr)] = arr
+            setattr(self, attr, grown)
+
+    def _add_slot(self, key: Tuple[str, str], current: int, max_capa: int) -> int:
+        i = len(self._keys)
+        if i >= len(self._max):
+            self._grow()
+        self._slots[key] = i
+        self._keys.append(key)
+        self._max[i] = int(max_capa)
+        self._current[i] = int(current)
+        self._remaining[i] = int(max_capa) - int(current)
+        self._usage[i] = (current / max_capa * 100) if max_capa else 0
+        return i
+
+    def register(self, date_str: str, line: str, current: int, max_capa: int) -> None:
+        """슬롯 등록 (이미 있으면 무시)"""
+        key = (date_str, line)
+        if key in self._slots:
+            return
+        i = self._add_slot(key, current, max_capa)
+        self._journal.append(("slot", i, (key, int(current), int(max_capa))))
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._slots
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def keys(self) -> List[Tuple[str, str]]:
+        return list(self._keys)
+
+    def remaining(self, date_str: str, line: str) -> int:
+        return int(self._remaining[self._slots[(date_str, line)]])
+
+    def reserve(self, date_str: str, line: str, qty: int) -> None:
+        i = self._slots[(date_str, line)]
+        self._remaining[i] -= int(qty)
+        self._journal.append(("remaining", i, -int(qty)))
+
+    def release(self, date_str: str, line: str, qty: int) -> None:
+        i = self._slots[(date_str, line)]
+        self._remaining[i] += int(qty)
+        self._journal.append(("remaining", i, int(qty)))
+
+    def raise_capacity(self, date_str: str, line: str, inc: int) -> None:
+        """잔업/특근: 유효 CAPA(max/remaining) 증가"""
+        i = self._slots[(date_str, line)]
+        self._max[i] += int(inc)
+        self._remaining[i] += int(inc)
+        self._journal.append(("max", i, int(inc)))
+        self._journal.append(("remaining", i, int(inc)))
+
+    def checkpoint(self) -> int:
+        return len(self._journal)
+
+    def rollback(self, checkpoint: int) -> List[Tuple[str, int, Any]]:
+        """checkpoint 이후 변경을 되돌리고, 되돌린 journal 항목(원래 순서)을 반환 (redo용)"""
+        undone = self._journal[checkpoint:]
+        for op, i, delta in reversed(undone):
+            if op == "remaining":
+                self._remaining[i] -= delta
+            elif op == "max":
+                self._max[i] -= delta
+            else:
+                del self._slots[self._keys.pop()]
+        del self._journal[checkpoint:]
+        return undone
+
+    def redo(self, entries: List[Tuple[str, int, Any]]) -> None:
+        """rollback()이 반환한 항목을 다시 적용"""
+        for op, i, delta in entries:
+            if op == "remaining":
+                self._remaining[i] += delta
+            elif op == "max":
+                self._max[i] += delta
+            else:
+                key, current, max_capa = delta
+                i = self._add_slot(key, current, max_capa)
+            self._journal.append((op, i, delta))
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        out = []
+        for i, (d, ln) in enumerate(self._keys):
+            out.append(
+                (
+                    f"{d}_{ln}",
+                    {
+                        "date": d,
+                        "line": ln,
+                        "current": int(self._current[i]),
+                        "remaining": int(self._remaining[i]),
+                        "max": int(self._max[i]),
+                        "usage_rate": float(self._usage[i]),
+                    },
+                )
+            )
+        return out
+
+
 def _normalize_line_guess(question: str) -> Optional[str]:
     if "조립1" in question:
         return "조립1"
@@ -123,7 +426,7 @@ def _round_up_to_multiple(x: int, base: int) -> int:
     return ((x + base - 1) // base) * base
 
 def _suggest_capa_events_auto(
-    plan_df: pd.DataFrame,
+    calendar: WorkCalendar,
     question_date: str,
     target_line: str,
     shortfall_qty: int,
@@ -136,7 +439,7 @@ def _suggest_capa_events_auto(
     if shortfall_qty <= 0:
         return []
 
-    workdays = get_workdays_from_db(plan_df, start_date_str=question_date, direction="future", days_count=50)
+    workdays = get_workdays_from_db(calendar, start_date_str=question_date, direction="future", days_count=50)
     candidates = [d for d in workdays if d > question_date][: max_days]
     if not candidates:
         return []
@@ -158,7 +461,7 @@ def _suggest_capa_events_auto(
     return events
 
 def _apply_capa_events_to_status(
-    capa_status: Dict[str, Dict[str, Any]],
+    capa_status: CapacityLedger,
     events: List[Dict[str, Any]],
     capa_limits: Dict[str, int],
 ):
@@ -169,12 +472,9 @@ def _apply_capa_events_to_status(
         inc = int(ev.get("delta_capa", 0) or 0)
         if inc <= 0:
             continue
-        key = f"{d}_{ln}"
-        if key not in capa_status:
-            base = int(capa_limits.get(ln, 0) or 0)
-            capa_status[key] = {"max": base, "remaining": base}
-        capa_status[key]["max"] = int(capa_status[key].get("max", 0) or 0) + inc
-        capa_status[key]["remaining"] = int(capa_status[key].get("remaining", 0) or 0) + inc
+        if (d, ln) not in capa_status:
+            capa_status.register(d, ln, current=0, max_capa=int(capa_limits.get(ln, 0) or 0))
+        capa_status.raise_capacity(d, ln, inc)
 
 def _format_capa_events_md(events: List[Dict[str, Any]]) -> str:
     if not events:
@@ -184,6 +484,45 @@ def _format_capa_events_md(events: List[Dict[str, Any]]) -> str:
         out.append(f"- {ev['date']} {ev['line']}: **{ev['type']}**으로 유효 CAPA **+{int(ev['delta_capa']):,}개**")
     return "\n".join(out) + "\n\n"
 
+class PlanFacts:
+    """plan 스냅샷당 1회: 단계마다 plan_df를 복사해서 다시 구하던 파생 값 (복사 없이 컬럼 연산 1번)
+    - due_end: qty_0차 > 0인 마지막 날짜 (없으면 None)
+    - date_end: plan_date 최대값
+    - item_last_due: 품목별 qty_0차 > 0인 마지막 날짜
+    (품목별 일 단위 수요/생산 배열은 DueProfile)
+    """
+
+    def __init__(self, plan_df: pd.DataFrame):
+        self.due_end: Optional[str] = None
+        self.date_end: Optional[str] = None
+        self.item_last_due: Dict[str, str] = {}
+
+        plan_df = normalize_plan_df(plan_df)  # 이미 정규화돼 있으면 그대로 (plan_date = 'YYYY-MM-DD')
+        if plan_df.empty or "plan_date" not in plan_df.columns:
+            return
+
+        dates = plan_df["plan_date"]
+        self.date_end = str(dates.max())
+        if "qty_0차" not in plan_df.columns:
+            return
+
+        mask = (pd.to_numeric(plan_df["qty_0차"], errors="coerce").fillna(0) > 0).to_numpy()
+        if not mask.any():
+            return
+        due_dates = dates[mask]
+        self.due_end = str(due_dates.max())
+        if "product_name" in plan_df.columns:
+            by_item = due_dates.groupby(plan_df["product_name"][mask], observed=True).max()
+            self.item_last_due = {k: str(v) for k, v in by_item.items()}
+
+    def horizon_end(self) -> Optional[str]:
+        """미래 확장 상한: 마지막 납기일, 납기가 없으면 plan_date 최대값"""
+        return self.due_end or self.date_end
+
+    def last_due(self, item_name: str) -> Optional[str]:
+        return self.item_last_due.get(item_name)
+
+
 def _infer_target_line(question: str, plan_df: pd.DataFrame, question_date: str) -> Optional[str]:
     """질문에 라인 명시가 없으면, 품목 키워드/당일 최대 물량 라인으로 추론"""
     direct = _normalize_line_guess(question)
@@ -208,7 +547,7 @@ def _infer_target_line(question: str, plan_df: pd.DataFrame, question_date: str)
 
     # 그 외: 당일 qty_1차 합이 가장 큰 라인
     if "qty_1차" in date_data.columns:
-        line_qty = date_data.groupby("line")["qty_1차"].sum()
+        line_qty = date_data.groupby("line", observed=True)["qty_1차"].sum()
         if not line_qty.empty:
             return str(line_qty.idxmax())
 
@@ -219,17 +558,25 @@ def _infer_target_line(question: str, plan_df: pd.DataFrame, question_date: str)
 # 1~3단계: 데이터 수사
 # ========================================================================
 
-def step1_list_current_stock(plan_df: pd.DataFrame, target_date: str, target_line: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
-    current = plan_df[(plan_df["plan_date"] == target_date) & (plan_df["line"] == target_line)].copy()
-    if current.empty:
+def step1_list_current_stock(
+    plan_df: pd.DataFrame,
+    target_date: str,
+    target_line: str,
+    plan_index: Optional[PlanIndex] = None,
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    if plan_index is None:
+        plan_index = PlanIndex(plan_df)
+
+    current = plan_index.line_rows(target_date, target_line)
+    if not current:
         return None, "해당 날짜/라인에 생산 계획이 없습니다."
 
-    if "qty_1차" not in current.columns or "plt" not in current.columns:
+    if "qty_1차" not in plan_df.columns or "plt" not in plan_df.columns:
         return None, "plan_df에 qty_1차 또는 plt 컬럼이 없습니다."
 
-    total = int(current["qty_1차"].sum())
+    total = plan_index.line_total(target_date, target_line)
     items = []
-    for _, row in current.iterrows():
+    for row in current:
         q = int(row.get("qty_1차", 0) or 0)
         if q <= 0:
             continue
@@ -244,17 +591,65 @@ def step1_list_current_stock(plan_df: pd.DataFrame, target_date: str, target_lin
     return {"date": target_date, "line": target_line, "total": total, "items": items}, None
 
 
-def step2_calculate_cumulative_slack(plan_df: pd.DataFrame, stock_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+SLACK_NEEDED_COLS = {"product_name", "plan_date", "qty_0차", "qty_1차", "plt"}
+
+
+def build_slack_table(plan_df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """
+    품목×날짜 누적 납기 여유 테이블 (plan 스냅샷당 1회, groupby/cumsum 한 번으로 전 품목 계산)
+    - index: (product_name, plan_date)
+    - columns: cumsum_0차, cumsum_1차, future_slack, last_due, buffer_days
+    - 필요한 컬럼이 없으면 None
+    """
+    if not SLACK_NEEDED_COLS.issubset(set(plan_df.columns)):
+        return None
+
+    df = plan_df[["product_name", "plan_date", "qty_0차", "qty_1차"]].copy()
+    df["qty_0차"] = pd.to_numeric(df["qty_0차"], errors="coerce").fillna(0)
+    df["qty_1차"] = pd.to_numeric(df["qty_1차"], errors="coerce").fillna(0)
+
+    # 같은 날 여러 라인에 찍힌 품목은 일 단위로 합산한 뒤 누적
+    daily = df.groupby(["product_name", "plan_date"], sort=True, observed=True)[["qty_0차", "qty_1차"]].sum()
+    g = daily.groupby(level="product_name", sort=False, observed=True)
+
+    daily["cumsum_0차"] = g["qty_0차"].cumsum()
+    daily["cumsum_1차"] = g["qty_1차"].cumsum()
+    future_demand = g["qty_0차"].transform("sum") - daily["cumsum_0차"]
+    future_prod = g["qty_1차"].transform("sum") - daily["cumsum_1차"]
+    daily["future_slack"] = future_prod - future_demand
+
+    # last_due = qty_0차 > 0인 마지막 날짜, buffer_days = last_due - 해당 날짜
+    due = daily[daily["qty_0차"] > 0].reset_index().groupby("product_name", observed=True)["plan_date"].max()
+    # 납기 행(qty_0차 > 0)이 하나도 없으면 map 결과가 전부 NaN(float) → 문자열 dtype으로 고정해 .str 사용
+    last_due = pd.Series(daily.index.get_level_values("product_name").map(due), index=daily.index).astype("string")
+    dates = pd.Series(daily.index.get_level_values("plan_date"), index=daily.index)
+
+    last_due_dt = pd.to_datetime(last_due, errors="coerce")
+    date_dt = pd.to_datetime(dates, errors="coerce")
+    daily["last_due"] = last_due.astype(object).where(last_due.notna(), "미확인")
+    daily["buffer_days"] = (last_due_dt - date_dt).dt.days.fillna(999).astype(int)
+
+    return daily[["cumsum_0차", "cumsum_1차", "future_slack", "last_due", "buffer_days"]]
+
+
+def step2_calculate_cumulative_slack(
+    plan_df: pd.DataFrame,
+    stock_result: Dict[str, Any],
+    slack_table: Optional[pd.DataFrame] = None,
+) -> List[Dict[str, Any]]:
     """
     각 품목의 누적 납기 여유 계산
     - cumsum 기준: qty_0차 vs qty_1차
     - 이동가능 max_movable 산출
+    - 계산은 build_slack_table()에서 끝나 있고, 여기서는 (품목, 날짜) 조회만
     """
     items_with_slack = []
     target_date = stock_result["date"]
 
-    needed_cols = {"product_name", "plan_date", "qty_0차", "qty_1차", "plt"}
-    if not needed_cols.issubset(set(plan_df.columns)):
+    if slack_table is None:
+        slack_table = build_slack_table(plan_df)
+
+    if slack_table is None:
         # 최소한 돌아가게: 이동 가능성 판단을 conservative 하게 처리
         for item in stock_result["items"]:
             items_with_slack.append(
@@ -272,27 +667,21 @@ def step2_calculate_cumulative_slack(plan_df: pd.DataFrame, stock_result: Dict[s
             )
         return items_with_slack
 
-    for item in stock_result["items"]:
-        name = item["name"]
-        series = plan_df[plan_df["product_name"] == name].sort_values("plan_date").copy()
-        if series.empty:
-            continue
+    items = stock_result["items"]
+    if not items:
+        return items_with_slack
 
-        series["cumsum_0차"] = series["qty_0차"].cumsum()
-        series["cumsum_1차"] = series["qty_1차"].cumsum()
+    keys = pd.MultiIndex.from_tuples([(item["name"], target_date) for item in items])
+    looked = slack_table.reindex(keys).to_dict("records")
 
-        today_row = series[series["plan_date"] == target_date]
-        if today_row.empty:
+    for item, row in zip(items, looked):
+        if pd.isna(row["cumsum_0차"]):
             continue
-        today_row = today_row.iloc[0]
 
-        cumsum_target = int(today_row["cumsum_0차"])
-        cumsum_actual = int(today_row["cumsum_1차"])
+        cumsum_target = int(row["cumsum_0차"])
+        cumsum_actual = int(row["cumsum_1차"])
         max_movable_cumsum = cumsum_actual - cumsum_target
-
-        future_demand = int(series[series["plan_date"] > target_date]["qty_0차"].sum())
-        future_prod = int(series[series["plan_date"] > target_date]["qty_1차"].sum())
-        future_slack = future_prod - future_demand
+        future_slack = int(row["future_slack"])
 
         if max_movable_cumsum > 0:
             max_movable = max_movable_cumsum
@@ -302,27 +691,17 @@ def step2_calculate_cumulative_slack(plan_df: pd.DataFrame, stock_result: Dict[s
             else:
                 max_movable = max(0, int(item["qty_1차"]) + future_slack)
 
-        due_dates = series[series["qty_0차"] > 0]["plan_date"].tolist()
-        last_due = max(due_dates) if due_dates else "미확인"
-
-        if last_due != "미확인":
-            last_due_dt = _safe_date(last_due)
-            target_dt = _safe_date(target_date)
-            buffer_days = (last_due_dt - target_dt).days
-        else:
-            buffer_days = 999
-
         plt = int(item["plt"])
         items_with_slack.append(
             {
-                "name": name,
+                "name": item["name"],
                 "qty_1차": int(item["qty_1차"]),
                 "plt": plt,
                 "cumsum_target": cumsum_target,
                 "cumsum_actual": cumsum_actual,
                 "max_movable": int(max_movable),
-                "last_due": last_due,
-                "buffer_days": int(buffer_days),
+                "last_due": row["last_due"],
+                "buffer_days": int(row["buffer_days"]),
                 "movable": int(max_movable) >= plt,
             }
         )
@@ -335,45 +714,37 @@ def step3_analyze_destination_capacity(
     target_date: str,
     target_line: str,
     capa_limits: Dict[str, int],
-) -> Dict[str, Dict[str, Any]]:
+    plan_index: Optional[PlanIndex] = None,
+    calendar: Optional[WorkCalendar] = None,
+    plan_facts: Optional[PlanFacts] = None,
+    ctx: Optional[SchedulerContext] = None,
+) -> CapacityLedger:
     """
     CAPA 현황:
     - ✅ 같은날: 조립1/2/3 모두 (target_line 포함)
     - ✅ 동일라인 미래 가동일(최대 N개)  (단, 전체 납기/데이터 범위 밖으로는 확장하지 않음)
-    - ✅ (옵션) 동일라인 과거 가동일(소수)  (단, TODAY(질문일) 이전/당일은 금지)
+    - ✅ (옵션) 동일라인 과거 가동일(소수)  (단, today(질문일) 이전/당일은 금지)
     """
-    capa_status: Dict[str, Dict[str, Any]] = {}
+    capa_status = CapacityLedger()
+    if plan_index is None:
+        plan_index = ctx.plan_index if ctx else PlanIndex(plan_df)
+    if calendar is None:
+        calendar = ctx.calendar if ctx else WorkCalendar(plan_df)
+    if plan_facts is None:
+        plan_facts = ctx.plan_facts if ctx else PlanFacts(plan_df)
 
     # -------------------------------
     # (A) 데이터 기반 "미래 확장 상한" = 마지막 납기일(=qty_0차가 있는 마지막 날짜)
     #     - qty_0차가 없다면, plan_date 최대값을 상한으로 사용
     # -------------------------------
-    horizon_end = None
-    if (not plan_df.empty) and ("plan_date" in plan_df.columns):
-        if "qty_0차" in plan_df.columns:
-            tmp = plan_df.copy()
-            tmp["qty_0차"] = pd.to_numeric(tmp["qty_0차"], errors="coerce").fillna(0)
-            due_df = tmp[tmp["qty_0차"] > 0]
-            if not due_df.empty:
-                horizon_end = str(due_df["plan_date"].max())[:10]
-        if not horizon_end:
-            horizon_end = str(plan_df["plan_date"].max())[:10]
+    horizon_end = plan_facts.horizon_end()
 
     # -------------------------------
     # (B) 같은날 CAPA: 모든 라인 포함
     # -------------------------------
     for line in ["조립1", "조립2", "조립3"]:
-        cur = plan_df[(plan_df["plan_date"] == target_date) & (plan_df["line"] == line)]["qty_1차"].sum()
-        cur = int(cur) if pd.notna(cur) else 0
-        remaining = int(capa_limits[line] - cur)
-        capa_status[f"{target_date}_{line}"] = {
-            "date": target_date,
-            "line": line,
-            "current": cur,
-            "remaining": remaining,
-            "max": capa_limits[line],
-            "usage_rate": (cur / capa_limits[line] * 100) if capa_limits[line] else 0,
-        }
+        cur = plan_index.line_total(target_date, line)
+        capa_status.register(target_date, line, current=cur, max_capa=capa_limits[line])
 
     # -------------------------------
     # (C) 동일라인 미래 가동일 후보
@@ -383,13 +754,9 @@ def step3_analyze_destination_capacity(
     # -------------------------------
     max_future_workdays = 10
 
-    # DB is_workday 기준으로 horizon_end까지 가능한 미래 가동일을 넉넉히 모은 뒤
+    # DB is_workday 기준으로 target_date 다음 가동일부터 horizon_end까지,
     # max_future_workdays개까지만 사용
-    future_candidates = get_workdays_from_db(plan_df, target_date, direction="future", days_count=400)
-    future_candidates = [d for d in future_candidates if str(d)[:10] != target_date]
-    if horizon_end:
-        future_candidates = [d for d in future_candidates if str(d)[:10] <= horizon_end]
-    future_workdays = future_candidates[:max_future_workdays]
+    future_workdays = calendar.next_workdays(target_date, max_future_workdays, exclusive=True, until=horizon_end)
 
     # 보강: is_workday가 없거나 리스트가 빈 경우, 달력으로 탐색(그래도 horizon_end 바깥은 금지)
     if not future_workdays:
@@ -398,47 +765,31 @@ def step3_analyze_destination_capacity(
             d = (base + timedelta(days=i)).strftime("%Y-%m-%d")
             if horizon_end and d > horizon_end:
                 break
-            if is_workday_in_db(plan_df, d):
+            if is_workday_in_db(calendar, d):
                 future_workdays.append(d)
             if len(future_workdays) >= max_future_workdays:
                 break
 
     for d in future_workdays:
-        cur = plan_df[(plan_df["plan_date"] == d) & (plan_df["line"] == target_line)]["qty_1차"].sum()
-        cur = int(cur) if pd.notna(cur) else 0
-        remaining = int(capa_limits[target_line] - cur)
-        capa_status[f"{d}_{target_line}"] = {
-            "date": d,
-            "line": target_line,
-            "current": cur,
-            "remaining": remaining,
-            "max": capa_limits[target_line],
-            "usage_rate": (cur / capa_limits[target_line] * 100) if capa_limits[target_line] else 0,
-        }
+        cur = plan_index.line_total(d, target_line)
+        capa_status.register(d, target_line, current=cur, max_capa=capa_limits[target_line])
 
     # -------------------------------
     # (D) 동일라인 과거 가동일 후보 (선행 생산)
     #     - 너무 많이 당기는 것을 방지: 5개 가동일만
-    #     - get_workdays_from_db가 "TODAY 이후만" 보장 (plan_date > today_str)
+    #     - get_workdays_from_db가 "today 이후만" 보장 (plan_date > today_str)
     # -------------------------------
-    past_workdays = get_workdays_from_db(plan_df, target_date, direction="past", days_count=5)
+    past_workdays = get_workdays_from_db(
+        calendar, target_date, direction="past", days_count=5, today_str=ctx.today_str if ctx else None
+    )
 
     for d in past_workdays:
         # 안전: target_date보다 과거만
-        if str(d)[:10] >= target_date:
+        if d >= target_date:
             continue
 
-        cur = plan_df[(plan_df["plan_date"] == d) & (plan_df["line"] == target_line)]["qty_1차"].sum()
-        cur = int(cur) if pd.notna(cur) else 0
-        remaining = int(capa_limits[target_line] - cur)
-        capa_status[f"{d}_{target_line}"] = {
-            "date": d,
-            "line": target_line,
-            "current": cur,
-            "remaining": remaining,
-            "max": capa_limits[target_line],
-            "usage_rate": (cur / capa_limits[target_line] * 100) if capa_limits[target_line] else 0,
-        }
+        cur = plan_index.line_total(d, target_line)
+        capa_status.register(d, target_line, current=cur, max_capa=capa_limits[target_line])
 
     return capa_status
 # ========================================================================
@@ -491,7 +842,7 @@ def step4_prepare_constraint_info(items_with_slack: List[Dict[str, Any]], target
 
 def build_ai_fact_report(
     constraint_info: List[Dict[str, Any]],
-    capa_status: Dict[str, Dict[str, Any]],
+    capa_status: CapacityLedger,
     target_date: str,
     target_line: str,
     operation_mode: str,
@@ -532,6 +883,20 @@ def _extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def configure_genai(genai_key: str) -> None:
+    """genai 전역 설정 (프로세스 공용 SDK 상태) → 잠금 아래 (키, 엔드포인트)가 바뀔 때만 다시 설정"""
+    global _GENAI_CONFIGURED
+    conf = (genai_key or "", GEMINI_API_ENDPOINT)
+    with _GENAI_LOCK:
+        if _GENAI_CONFIGURED == conf:
+            return
+        if GEMINI_API_ENDPOINT:
+            genai.configure(api_key=genai_key, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+        else:
+            genai.configure(api_key=genai_key)
+        _GENAI_CONFIGURED = conf
+
+
 def step5_ask_ai_strategy(
     fact_report: str,
     operation_mode: str,
@@ -541,11 +906,23 @@ def step5_ask_ai_strategy(
     today_str: str,
     capa_target_pct: int,
     genai_key: str,
+    cache: Optional[StrategyCache] = None,
+    on_token: Optional[Callable[[str], None]] = None,
 ) -> Tuple[Optional[Dict[str, Any]], Optional[str], str]:
     """
     Returns: (ai_strategy or None, error or None, strategy_source)
+    - 같은 (fact_report, 모드, 수량, 라인, CAPA 목표, 모델) 조합은 캐시 응답 재사용 (cache 미지정 시 기본 캐시)
+    - on_token이 있으면 stream=True로 받아 텍스트 조각마다 on_token(조각) 호출 (캐시 적중 시에는 호출 없음)
     """
-    genai.configure(api_key=genai_key)
+    if cache is None:
+        cache = get_strategy_cache()
+    cache_key = strategy_cache_key(fact_report, operation_mode, operation_qty, target_line, capa_target_pct, GEMINI_MODEL)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached, None, "AI 하이브리드 전략 (Gemini 2.0 Flash, 캐시)"
+
+    # genai 전역 설정은 호출 스레드에서 1회만 (이미 같은 키면 no-op → 워커 스레드에서 SDK 전역 상태를 바꾸지 않음)
+    configure_genai(genai_key)
 
     if operation_mode == "reduce":
         operation_desc = "감축"
@@ -601,17 +978,291 @@ def step5_ask_ai_strategy(
 """
 
     try:
-        model = genai.GenerativeModel("gemini-2.0-flash-exp")
-        resp = model.generate_content(prompt)
-        raw = (resp.text or "").strip()
+        model = genai.GenerativeModel(GEMINI_MODEL)
+        if on_token is None:
+            resp = model.generate_content(prompt, request_options={"timeout": GEMINI_REQUEST_TIMEOUT_SEC})
+            raw = (resp.text or "").strip()
+        else:
+            chunks = []
+            for chunk in model.generate_content(prompt, stream=True, request_options={"timeout": GEMINI_REQUEST_TIMEOUT_SEC}):
+                try:
+                    text = chunk.text or ""
+                except ValueError:
+                    text = ""  # 안전 필터 등으로 텍스트가 없는 조각
+                if text:
+                    chunks.append(text)
+                    on_token(text)
+            raw = "".join(chunks).strip()
         parsed = _extract_json_from_text(raw)
         if not parsed:
             return None, "AI 응답에서 JSON 파싱 실패", "AI 실패"
+        cache.put(cache_key, parsed)
         return parsed, None, "AI 하이브리드 전략 (Gemini 2.0 Flash)"
     except Exception as e:
         return None, f"AI 오류: {str(e)}", "AI 실패"
 
 
+# ========================================================================
+# 6단계 보조: 누적 납기(cumsum1 >= cumsum0) 검증기
+# - 품목별 일 단위 생산/수요 → 여유 배열 m = c1 - c0 를 스냅샷당 1회 계산 (DueProfile)
+# - 검증 세션(DueCumsumChecker)은 품목별로 구간 최소 세그먼트 트리를 들고,
+#   승인된 이동을 누적 반영 → 같은 품목의 이전 이동까지 고려한 O(log n) 검증
+# ========================================================================
+
+class _MinAddSegTree:
+    """구간 덧셈 + 구간 최소 + '값 < thr 인 첫 위치' 조회 (lazy propagation)"""
+
+    def __init__(self, values: List[int]):
+        self.n = len(values)
+        size = 1
+        while size < max(self.n, 1):
+            size *= 2
+        self.size = size
+        self.mn = [float("inf")] * (2 * size)
+        self.lz = [0] * (2 * size)
+        for i, v in enumerate(values):
+            self.mn[size + i] = v
+        for i in range(size - 1, 0, -1):
+            self.mn[i] = min(self.mn[2 * i], self.mn[2 * i + 1])
+
+    def add(self, l: int, r: int, v: int, node: int = 1, nl: int = 0, nr: Optional[int] = None) -> None:
+        if nr is None:
+            nr = self.size
+        if r <= nl or nr <= l or l >= r:
+            return
+        if l <= nl and nr <= r:
+            self.mn[node] += v
+            self.lz[node] += v
+            return
+        mid = (nl + nr) // 2
+        self.add(l, r, v, 2 * node, nl, mid)
+        self.add(l, r, v, 2 * node + 1, mid, nr)
+        self.mn[node] = min(self.mn[2 * node], self.mn[2 * node + 1]) + self.lz[node]
+
+    def range_min(self, l: int, r: int, node: int = 1, nl: int = 0, nr: Optional[int] = None) -> float:
+        """[l, r) 구간 최소 (빈 구간이면 inf)"""
+        if nr is None:
+            nr = self.size
+        if r <= nl or nr <= l or l >= r:
+            return float("inf")
+        if l <= nl and nr <= r:
+            return self.mn[node]
+        mid = (nl + nr) // 2
+        return min(self.range_min(l, r, 2 * node, nl, mid), self.range_min(l, r, 2 * node + 1, mid, nr)) + self.lz[node]
+
+    def first_below(self, thr: float, node: int = 1, nl: int = 0, nr: Optional[int] = None, acc: int = 0) -> int:
+        """전체 구간에서 값 < thr 인 첫 인덱스 (없으면 -1)"""
+        if nr is None:
+            nr = self.size
+        if self.mn[node] + acc >= thr or nl >= self.n:
+            return -1
+        if nr - nl == 1:
+            return nl
+        acc += self.lz[node]
+        mid = (nl + nr) // 2
+        i = self.first_below(thr, 2 * node, nl, mid, acc)
+        if i != -1:
+            return i
+        return self.first_below(thr, 2 * node + 1, mid, nr, acc)
+
+
+class DueProfile:
+    """plan 스냅샷당 1회: 품목별 일 단위 qty_0차/qty_1차 (품목 배열은 처음 조회될 때 생성)"""
+
+    NEEDED_COLS = {"product_name", "plan_date", "qty_0차", "qty_1차"}
+
+    def __init__(self, plan_df: pd.DataFrame):
+        self._daily: Optional[pd.DataFrame] = None
+        self._products: set = set()
+        self._cache: Dict[str, Optional[Tuple[List[str], List[int], List[int]]]] = {}
+
+        plan_df = normalize_plan_df(plan_df)  # 이미 정규화돼 있으면 그대로 (plan_date = 'YYYY-MM-DD')
+        if plan_df.empty or not self.NEEDED_COLS.issubset(set(plan_df.columns)):
+            return
+
+        df = plan_df[["product_name", "plan_date", "qty_0차", "qty_1차"]].copy()
+        df["qty_0차"] = pd.to_numeric(df["qty_0차"], errors="coerce").fillna(0).astype(int)
+        df["qty_1차"] = pd.to_numeric(df["qty_1차"], errors="coerce").fillna(0).astype(int)
+        self._daily = df.groupby(["product_name", "plan_date"], sort=True, observed=True)[["qty_0차", "qty_1차"]].sum()
+        self._products = set(self._daily.index.get_level_values(0))
+
+    def get(self, item_name: str) -> Optional[Tuple[List[str], List[int], List[int]]]:
+        """(dates, 일별 qty_1차, 여유 m=c1-c0) / 품목이 없으면 None"""
+        if item_name in self._cache:
+            return self._cache[item_name]
+
+        out = None
+        if item_name in self._products:
+            sub = self._daily.loc[item_name]
+            dates = [str(d) for d in sub.index]
+            prod = sub["qty_1차"].tolist()
+            margin = (sub["qty_1차"].cumsum() - sub["qty_0차"].cumsum()).tolist()
+            out = (dates, prod, margin)
+        self._cache[item_name] = out
+        return out
+
+
+class DueCumsumChecker:
+    """검증 세션 1개(=capa_status 1개)에 대응하는 누적 납기 검증기. 승인된 이동은 apply()로 누적
+    - plan_index를 주면 (품목, 날짜, 라인) 칸별 잔량도 함께 추적 → 같은 칸에서 두 번 빼는 이동(같은날 타라인 포함)을 막음
+    """
+
+    def __init__(self, profile: DueProfile, plan_index: Optional[PlanIndex] = None):
+        self.profile = profile
+        self.plan_index = plan_index
+        self._trees: Dict[str, _MinAddSegTree] = {}
+        self._prod: Dict[str, Dict[str, int]] = {}
+        self._slot_delta: Dict[Tuple[str, str, str], int] = {}
+        self.t6_sameday_used = False  # T6 같은날 타라인 이송(세션 전체 1회) 사용 여부
+
+    def _load(self, item_name: str) -> Optional[Tuple[List[str], _MinAddSegTree, Dict[str, int]]]:
+        base = self.profile.get(item_name)
+        if base is None:
+            return None
+        dates, prod, margin = base
+        if item_name not in self._trees:
+            self._trees[item_name] = _MinAddSegTree(margin)
+            self._prod[item_name] = dict(zip(dates, prod))
+        return dates, self._trees[item_name], self._prod[item_name]
+
+    @staticmethod
+    def _shift(dates: List[str], tree: _MinAddSegTree, from_date: str, to_date: str, qty: int) -> None:
+        # from에서 빼고 to에 더하면, 여유 m은 [from, to) 구간에서 -qty (당기기면 [to, from)에서 +qty)
+        fi = bisect_left(dates, from_date)
+        ti = bisect_left(dates, to_date)
+        if fi < ti:
+            tree.add(fi, ti, -qty)
+        elif ti < fi:
+            tree.add(ti, fi, qty)
+
+    def source_remaining(self, item_name: str, date_str: str, line: str) -> Optional[int]:
+        """(품목, 날짜, 라인) 칸의 현재 잔량 = 계획 수량 + 승인된 이동 반영분 (plan_index가 없으면 None)"""
+        if self.plan_index is None:
+            return None
+        return self.plan_index.product_qty(item_name, date_str, line) + self._slot_delta.get((item_name, date_str, line), 0)
+
+    def check(
+        self,
+        item_name: str,
+        from_date: str,
+        to_date: str,
+        qty_move: int,
+        from_line: Optional[str] = None,
+        to_line: Optional[str] = None,
+    ) -> Tuple[bool, Optional[str]]:
+        """이동을 적용했을 때 품목별 누적 납기(cumsum1>=cumsum0)가 모든 날짜에서 유지되는지 검증
+        (from_line을 주면 출발 칸 잔량도 확인)"""
+        # 출발 칸 잔량: 같은날 타라인 이송은 날짜 합계가 그대로라 아래 일 단위 검증으로는 안 잡힘
+        if from_line and (from_date, from_line) != (to_date, to_line):
+            left = self.source_remaining(item_name, from_date, from_line)
+            if left is not None and left < int(qty_move):
+                return False, from_date
+
+        loaded = self._load(item_name)
+        if loaded is None:
+            return True, None
+        dates, tree, prod = loaded
+
+        # 음수 생산량은 불가
+        src_after = prod.get(from_date, 0) - int(qty_move) + (int(qty_move) if from_date == to_date else 0)
+        if src_after < 0:
+            return False, from_date
+
+        self._shift(dates, tree, from_date, to_date, int(qty_move))
+        bad = tree.first_below(0)
+        self._shift(dates, tree, from_date, to_date, -int(qty_move))
+        if bad == -1:
+            return True, None
+        return False, dates[bad]
+
+    def max_shift_qty(self, item_name: str, from_date: str, to_date: str, from_line: Optional[str] = None) -> Optional[int]:
+        """from→to로 옮겨도 누적 납기가 깨지지 않는 최대 수량 (품목/칸 정보가 없으면 None = 제한 없음)"""
+        slot_cap = self.source_remaining(item_name, from_date, from_line) if from_line else None
+
+        loaded = self._load(item_name)
+        if loaded is None:
+            return None if slot_cap is None else max(0, int(slot_cap))
+        dates, tree, prod = loaded
+        if tree.first_below(0) != -1:
+            return 0
+        if from_date == to_date:
+            cap = prod.get(from_date, 0)
+        else:
+            cap = prod.get(from_date, 0)
+            fi = bisect_left(dates, from_date)
+            ti = bisect_left(dates, to_date)
+            if fi < ti:
+                cap = min(cap, tree.range_min(fi, ti))
+        if slot_cap is not None:
+            cap = min(cap, slot_cap)
+        return max(0, int(cap))
+
+    def apply(
+        self,
+        item_name: str,
+        from_date: str,
+        to_date: str,
+        qty_move: int,
+        from_line: Optional[str] = None,
+        to_line: Optional[str] = None,
+    ) -> None:
+        if from_line:
+            key = (item_name, from_date, from_line)
+            self._slot_delta[key] = self._slot_delta.get(key, 0) - int(qty_move)
+        if to_line:
+            key = (item_name, to_date, to_line)
+            self._slot_delta[key] = self._slot_delta.get(key, 0) + int(qty_move)
+
+        loaded = self._load(item_name)
+        if loaded is None:
+            return
+        dates, tree, prod = loaded
+        self._shift(dates, tree, from_date, to_date, int(qty_move))
+        prod[from_date] = prod.get(from_date, 0) - int(qty_move)
+        prod[to_date] = prod.get(to_date, 0) + int(qty_move)
+
+
+# ========================================================================
+# SchedulerContext: 질문 1건의 불변 실행 문맥 (전역 TODAY/CAPA_LIMITS 대체)
+# - 엔진 진입 시 1회 생성해서 단계마다 ctx=로 전달 → 서로 다른 날짜/CAPA 질문을 스레드/프로세스 풀에서 동시에 돌려도 간섭 없음
+# - 필드는 읽기 전용으로 사용 (NamedTuple이라 재할당 불가, 프로세스 풀로 pickle 가능)
+# ========================================================================
+
+class SchedulerContext(NamedTuple):
+    today: Any
+    capa_limits: Dict[str, int]
+    plan_df: pd.DataFrame
+    plan_index: PlanIndex
+    calendar: WorkCalendar
+    plan_facts: PlanFacts
+    due_profile: DueProfile
+    slack_table: Optional[pd.DataFrame]
+
+    @property
+    def today_str(self) -> Optional[str]:
+        return self.today.strftime("%Y-%m-%d") if self.today else None
+
+    @classmethod
+    def build(
+        cls,
+        plan_df: Optional[pd.DataFrame],
+        today=None,
+        capa_limits: Optional[Dict[str, int]] = None,
+    ) -> "SchedulerContext":
+        """plan 정규화 + 스냅샷당 1회 구조(PlanIndex/WorkCalendar/PlanFacts/DueProfile/slack table) 생성"""
+        plan_df = normalize_plan_df(plan_df)
+        return cls(
+            today=today if today is not None else DEFAULT_TODAY,
+            capa_limits=dict(capa_limits if capa_limits is not None else DEFAULT_CAPA_LIMITS),
+            plan_df=plan_df,
+            plan_index=PlanIndex(plan_df),
+            calendar=WorkCalendar(plan_df),
+            plan_facts=PlanFacts(plan_df),
+            due_profile=DueProfile(plan_df),
+            slack_table=build_slack_table(plan_df),
+        )
+
+
 # ========================================================================
 # 6단계: Python 검증 (AI moves를 안전하게 필터/조정)
 # ========================================================================
@@ -619,83 +1270,38 @@ def step5_ask_ai_strategy(
 def step6_validate_ai_strategy(
     ai_strategy: Dict[str, Any],
     constraint_info: List[Dict[str, Any]],
-    capa_status: Dict[str, Dict[str, Any]],
+    capa_status: CapacityLedger,
     plan_df: pd.DataFrame,
     target_line: str,
+    plan_index: Optional[PlanIndex] = None,
+    due_checker: Optional[DueCumsumChecker] = None,
+    calendar: Optional[WorkCalendar] = None,
+    plan_facts: Optional[PlanFacts] = None,
+    ctx: Optional[SchedulerContext] = None,
 ) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    due_checker는 capa_status와 같은 수명으로 넘겨야 함
+    (같은 capa_status로 여러 번 호출하면, 앞서 승인된 이동이 누적 납기/출발지 잔량/T6 1회 규칙에 반영됨)
+    """
     if not ai_strategy or "moves" not in ai_strategy:
         return [], ["❌ AI 전략 형식 오류: 'moves' 키가 없습니다."]
 
+    if plan_index is None:
+        plan_index = ctx.plan_index if ctx else PlanIndex(plan_df)
+    if due_checker is None:
+        due_checker = DueCumsumChecker(ctx.due_profile if ctx else DueProfile(plan_df), plan_index)
+    if calendar is None:
+        calendar = ctx.calendar if ctx else WorkCalendar(plan_df)
+    if plan_facts is None:
+        plan_facts = ctx.plan_facts if ctx else PlanFacts(plan_df)
+
     name_to_item = {x["name"]: x for x in constraint_info}
     validated: List[Dict[str, Any]] = []
     violations: List[str] = []
 
-    t6_sameday_shift_used = False  # T6 같은날 타라인 이송은 1회만 허용
-
-    today_str = TODAY.strftime("%Y-%m-%d") if TODAY else None
-
-    def _get_item_last_due(item_name: str) -> Optional[str]:
-        if plan_df.empty or ("qty_0차" not in plan_df.columns):
-            return None
-        df = plan_df[plan_df["product_name"] == item_name].copy()
-        if df.empty:
-            return None
-        df["qty_0차"] = pd.to_numeric(df["qty_0차"], errors="coerce").fillna(0)
-        due = df[df["qty_0차"] > 0]["plan_date"]
-        if due.empty:
-            return None
-        return str(due.max())[:10]
-
-    def _check_due_cumsum_after_move(item_name: str, from_date: str, to_date: str, qty_move: int) -> Tuple[bool, Optional[str]]:
-        """이동을 적용했을 때 품목별 누적 납기(cumsum1>=cumsum0)가 모든 날짜에서 유지되는지 검증"""
-        needed = {"product_name", "plan_date", "qty_0차", "qty_1차"}
-        if plan_df.empty or not needed.issubset(set(plan_df.columns)):
-            return True, None
-
-        df = plan_df[plan_df["product_name"] == item_name].copy()
-        if df.empty:
-            return True, None
-
-        daily = (
-            df.groupby("plan_date")[["qty_0차", "qty_1차"]]
-            .sum()
-            .reset_index()
-            .copy()
-        )
-        daily["qty_0차"] = pd.to_numeric(daily["qty_0차"], errors="coerce").fillna(0).astype(int)
-        daily["qty_1차"] = pd.to_numeric(daily["qty_1차"], errors="coerce").fillna(0).astype(int)
-
-        # from/to 날짜가 daily에 없을 수 있으니 보강
-        for d in [from_date, to_date]:
-            if d not in set(daily["plan_date"].astype(str).str[:10].tolist()):
-                daily = pd.concat([daily, pd.DataFrame([{"plan_date": d, "qty_0차": 0, "qty_1차": 0}])], ignore_index=True)
-
-        # plan_date 정규화
-        daily["plan_date"] = daily["plan_date"].astype(str).str[:10]
-        daily = daily.sort_values("plan_date").reset_index(drop=True)
-
-        # 이동 적용 (생산량만 이동, 수요(qty_0차)는 그대로)
-        # from에서 빼기
-        idx_from = daily.index[daily["plan_date"] == from_date]
-        idx_to = daily.index[daily["plan_date"] == to_date]
-        if len(idx_from) == 0 or len(idx_to) == 0:
-            return True, None
-
-        f = int(idx_from[0]); t = int(idx_to[0])
-
-        daily.loc[f, "qty_1차"] -= int(qty_move)
-        daily.loc[t, "qty_1차"] += int(qty_move)
+    t6_sameday_shift_used = due_checker.t6_sameday_used  # T6 같은날 타라인 이송은 1회만 허용 (세션 누적)
 
-        # 음수 생산량은 불가
-        if daily.loc[f, "qty_1차"] < 0:
-            return False, from_date
-
-        daily["c0"] = daily["qty_0차"].cumsum()
-        daily["c1"] = daily["qty_1차"].cumsum()
-        bad = daily[daily["c1"] < daily["c0"]]
-        if bad.empty:
-            return True, None
-        return False, str(bad.iloc[0]["plan_date"])
+    today_str = ctx.today_str if ctx else None
 
     for idx, move in enumerate(ai_strategy.get("moves", []), 1):
         item_name = str(move.get("item", "") or "")
@@ -776,13 +1382,13 @@ def step6_validate_ai_strategy(
         # -----------------------
         # (2) 가동일 (휴무일이면 즉시 컷)
         # -----------------------
-        if not is_workday_in_db(plan_df, to_date):
+        if not is_workday_in_db(calendar, to_date):
             violations.append(f"❌ [{idx}] {item_name}: {to_date}는 휴무일")
             continue
 
         # -----------------------
-        # (3) TODAY(질문일) 이전/당일 선행생산 금지
-        #     - '과거로 당기기'는 오늘 이후만 허용 (TODAY+1 ~ target_date-1)
+        # (3) today(질문일) 이전/당일 선행생산 금지
+        #     - '과거로 당기기'는 오늘 이후만 허용 (today+1 ~ target_date-1)
         # -----------------------
         if today_str and to_date <= today_str:
             violations.append(f"❌ [{idx}] {item_name}: 목적지 날짜({to_date})가 오늘({today_str}) 이전/당일이라 선행생산 금지")
@@ -791,21 +1397,19 @@ def step6_validate_ai_strategy(
         # -----------------------
         # (4) 납기(=qty_0차) 기반 상한: last_due 이후로는 이동 금지
         # -----------------------
-        last_due = _get_item_last_due(item_name)
+        last_due = plan_facts.last_due(item_name)
         if last_due and to_date > last_due:
             violations.append(f"❌ [{idx}] {item_name}: 납기 이후 날짜로 이동 불가 (to {to_date} > last_due {last_due})")
             continue
 
         # -----------------------
         # (5) 출발지 수량 존재 검증 (가능한 경우)
+        # - 같은 세션에서 앞서 승인된 이동(최적화안 → 폴백 채움 등)이 뺀 만큼 차감한 잔량 기준
         # -----------------------
         if from_date and from_line:
-            src_qty = plan_df[
-                (plan_df["plan_date"] == from_date)
-                & (plan_df["line"] == from_line)
-                & (plan_df["product_name"] == item_name)
-            ]["qty_1차"].sum()
-            src_qty = int(src_qty) if pd.notna(src_qty) else 0
+            src_qty = due_checker.source_remaining(item_name, from_date, from_line)
+            if src_qty is None:
+                src_qty = plan_index.product_qty(item_name, from_date, from_line)
             if src_qty < qty:
                 violations.append(f"❌ [{idx}] {item_name}: 출발지 수량 부족 (from {from_loc} 보유 {src_qty:,} < 요청 {qty:,})")
                 continue
@@ -814,38 +1418,40 @@ def step6_validate_ai_strategy(
         # (6) 목적지 CAPA 확인/조정
         # -----------------------
         capa_key = f"{to_date}_{to_line}"
-        if capa_key not in capa_status:
+        if (to_date, to_line) not in capa_status:
             violations.append(f"⚠️ [{idx}] {item_name}: 목적지 CAPA 정보 없음 ({capa_key})")
             continue
 
-        dest = capa_status[capa_key]
+        dest_remaining = capa_status.remaining(to_date, to_line)
         final_qty = qty
         adjusted = False
         original_qty = None
 
-        if final_qty > int(dest["remaining"]):
+        if final_qty > dest_remaining:
             # 남은 CAPA 내에서 PLT 정수배로 줄여서라도 반영
-            if int(dest["remaining"]) >= int(item["plt"]):
-                adj_plts = int(dest["remaining"]) // int(item["plt"])
+            if dest_remaining >= int(item["plt"]):
+                adj_plts = dest_remaining // int(item["plt"])
                 adj_qty = adj_plts * int(item["plt"])
                 final_qty = adj_qty
                 adjusted = True
                 original_qty = qty
             else:
-                violations.append(f"❌ [{idx}] {item_name}: CAPA 부족 및 조정 불가 (남은 {dest['remaining']:,})")
+                violations.append(f"❌ [{idx}] {item_name}: CAPA 부족 및 조정 불가 (남은 {dest_remaining:,})")
                 continue
 
         # -----------------------
         # (7) 이동 적용 시 '누적 납기' 위반 여부 최종 검증
         # -----------------------
         if from_date:
-            ok, bad_date = _check_due_cumsum_after_move(item_name, from_date, to_date, final_qty)
+            ok, bad_date = due_checker.check(item_name, from_date, to_date, final_qty, from_line, to_line)
             if not ok:
                 violations.append(f"❌ [{idx}] {item_name}: 납기 누적 위반(이동 후 {bad_date}까지 생산 부족) → 이동 불가")
                 continue
 
-        # ✅ 모든 검증 통과 후에만 CAPA 차감
-        capa_status[capa_key]["remaining"] -= final_qty
+        # ✅ 모든 검증 통과 후에만 CAPA 차감 (+ 누적 납기 검증기에도 반영)
+        capa_status.reserve(to_date, to_line, final_qty)
+        if from_date:
+            due_checker.apply(item_name, from_date, to_date, final_qty, from_line, to_line)
 
         validated.append(
             {
@@ -863,6 +1469,7 @@ def step6_validate_ai_strategy(
 
         if item.get('is_t6') and from_date and from_line and (from_date == to_date) and (from_line != to_line):
             t6_sameday_shift_used = True
+            due_checker.t6_sameday_used = True
         if adjusted:
             violations.append(f"✅ [{idx}] {item_name}: CAPA 부족으로 자동 조정 ({qty:,} → {final_qty:,})")
 
@@ -877,14 +1484,111 @@ def _pick_qty_plts(qty: int, plt: int) -> int:
     return (qty // plt) * plt
 
 
+def _plt_option(
+    move: Dict[str, Any],
+    plt: int,
+    cap: int,
+    dest: Optional[Tuple[str, str]] = None,
+    t6_sameday: bool = False,
+    source_cap: Optional[int] = None,
+) -> Dict[str, Any]:
+    """수량 선택 후보: move(qty=0이면 대기 후보), PLT 단위, 후보 상한, 목적지 슬롯(CAPA 그룹),
+    출발지(품목, 칸) 상한 = 같은 출발지에서 여러 목적지로 나가는 후보들의 합 상한 (None이면 없음)"""
+    return {
+        "move": move, "unit": int(plt), "cap": _pick_qty_plts(int(cap), int(plt)), "dest": dest, "t6_sameday": bool(t6_sameday),
+        "source": (move["item"], move["from"]), "source_cap": None if source_cap is None else max(0, int(source_cap)),
+    }
+
+
+def _select_plt_quantities(
+    options: List[Dict[str, Any]],
+    moves: List[Dict[str, Any]],
+    target: int,
+    capa_status: Optional[CapacityLedger] = None,
+    due_checker: Optional[DueCumsumChecker] = None,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    폴백 수량 선택 단계 (PLT 조합 DP)
+    - 그리디로 잡힌 (품목, 목적지) + 남은 수량이 1PLT 미만이라 빠진 대기 후보를 모아
+      bounded knapsack으로 PLT 수를 다시 골라 목표 수량에 가장 가깝게(이하) 채움
+    - 목적지별 합 <= 폴백 시작 시점 잔여 CAPA, T6 같은날 타라인은 1건만
+    - due_checker가 있으면 후보별 상한을 누적 납기 허용량(max_shift_qty)으로 제한
+    - 같은 출발지(품목, 칸)에서 나가는 후보들의 합은 source_cap 이하 (목적지가 여러 개여도 출발지를 두 번 빼지 않음)
+    - 그리디보다 더 채울 때만 교체 (capa_status 예약도 함께 교체)
+    Returns: (moves, 채운 수량)
+    """
+    greedy_total = sum(int(m["qty"]) for m in moves)
+    if greedy_total >= target or not options:
+        return moves, greedy_total
+
+    t6_opts = [o for o in options if o["t6_sameday"]]
+    if len(t6_opts) > 1:
+        keep = next((o for o in t6_opts if o["move"]["qty"] > 0), t6_opts[0])
+        options = [o for o in options if (not o["t6_sameday"]) or o is keep]
+
+    caps = []
+    for o in options:
+        cap = o["cap"]
+        if due_checker is not None:
+            m = o["move"]
+            from_date, _, from_line = str(m["from"]).partition("_")
+            due_cap = due_checker.max_shift_qty(m["item"], from_date, str(m["to"]).split("_")[0], from_line or None)
+            if due_cap is not None:
+                cap = max(min(cap, _pick_qty_plts(due_cap, o["unit"])), int(m["qty"]))
+        caps.append(cap)
+
+    group_caps: Optional[Dict[Tuple[str, str], int]] = None
+    if capa_status is not None:
+        group_caps = {}
+        for o in options:
+            if o["dest"] is not None and o["dest"] not in group_caps:
+                group_caps[o["dest"]] = capa_status.remaining(*o["dest"])
+        for o in options:
+            if o["dest"] is not None and o["move"]["qty"] > 0:
+                group_caps[o["dest"]] += int(o["move"]["qty"])
+
+    item_caps: Dict[Tuple[str, str], int] = {}
+    for o in options:
+        if o["source_cap"] is not None:
+            item_caps[o["source"]] = min(item_caps.get(o["source"], o["source_cap"]), o["source_cap"])
+
+    best, counts = bounded_knapsack_fill(
+        [(o["unit"], cap // o["unit"] if o["unit"] > 0 else 0, o["dest"], o["source"]) for o, cap in zip(options, caps)],
+        int(target),
+        group_caps,
+        item_caps,
+    )
+    if best <= greedy_total:
+        return moves, greedy_total
+
+    if capa_status is not None:
+        for o in options:
+            if o["dest"] is not None and o["move"]["qty"] > 0:
+                capa_status.release(*o["dest"], int(o["move"]["qty"]))
+
+    selected = []
+    for o, cnt in zip(options, counts):
+        if cnt <= 0:
+            continue
+        qty = cnt * o["unit"]
+        if capa_status is not None and o["dest"] is not None:
+            capa_status.reserve(*o["dest"], qty)
+        selected.append(dict(o["move"], qty=qty, plt=cnt))
+    return selected, best
+
+
 def python_fallback_reduce(
     plan_df: pd.DataFrame,
     constraint_info: List[Dict[str, Any]],
-    capa_status: Dict[str, Dict[str, Any]],
+    capa_status: CapacityLedger,
     question_date: str,
     target_line: str,
     need_reduce: int,
     t6_sameday_already_used: bool = False,
+    calendar: Optional[WorkCalendar] = None,
+    due_checker: Optional[DueCumsumChecker] = None,
+    plan_facts: Optional[PlanFacts] = None,
+    ctx: Optional[SchedulerContext] = None,
 ) -> Tuple[List[Dict[str, Any]], List[str]]:
     """
     감축 폴백 (사람 같은 분산 우선순위):
@@ -892,36 +1596,45 @@ def python_fallback_reduce(
        - A2XX는 같은날 타라인 이송 가능(조립3 금지)하되, 전용(기타)은 타라인 금지
     2) 남은 감축은 '비 T6' 품목의 동일라인 날짜 이동(미래 연기)부터 우선 시도
     3) 그래도 부족하면 마지막에 T6의 동일라인 날짜 이동(미래 연기)
-    4) 그래도 부족하면 과거(선행생산)로 당기기 (TODAY 이전/당일 금지, 마지막 수단)
+    4) 그래도 부족하면 과거(선행생산)로 당기기 (today 이전/당일 금지, 마지막 수단)
+    5) 수량 선택: 위에서 잡힌 후보들의 PLT 수를 조합 DP로 다시 골라 need_reduce에 최대한 맞춤
+    - 품목별 상한 = min(이동최대, 출발지(질문일, 대상 라인) 잔량) - 이번 폴백에서 이미 잡은 수량
+      (due_checker가 있으면 출발지 잔량은 세션에서 앞서 승인된 이동을 뺀 값)
     """
     moves: List[Dict[str, Any]] = []
     notes: List[str] = []
+    options: List[Dict[str, Any]] = []  # 수량 선택(PLT 조합) 후보
+    src_taken: Dict[str, int] = {}  # 품목별 이번 폴백에서 출발지에서 뺀 수량
 
     remain = int(need_reduce or 0)
     if remain <= 0:
         return [], []
 
+    def _movable(item: Dict[str, Any]) -> int:
+        cap = int(item["max_movable"])
+        if due_checker is not None:
+            left = due_checker.source_remaining(item["name"], question_date, target_line)
+            if left is not None:
+                cap = min(cap, left)
+        return cap - src_taken.get(item["name"], 0)
+
+    if calendar is None:
+        calendar = ctx.calendar if ctx else WorkCalendar(plan_df)
+
     # buffer_days 큰 순(납기 여유가 큰 품목 우선)
     candidates = sorted(constraint_info, key=lambda x: x.get("buffer_days", 0), reverse=True)
 
     # -------------------------------
-    # (0) 미래 확장 상한(horizon_end) 계산 (qty_0차 > 0인 마지막 납기일)
+    # (0) 미래 확장 상한(horizon_end) = qty_0차 > 0인 마지막 납기일 (없으면 상한 없음)
     # -------------------------------
-    horizon_end = None
-    if (not plan_df.empty) and ("plan_date" in plan_df.columns) and ("qty_0차" in plan_df.columns):
-        try:
-            tmp = plan_df.copy()
-            tmp["qty_0차"] = pd.to_numeric(tmp["qty_0차"], errors="coerce").fillna(0)
-            due = tmp[tmp["qty_0차"] > 0]["plan_date"]
-            if not due.empty:
-                horizon_end = str(due.max())[:10]
-        except Exception:
-            horizon_end = None
+    if plan_facts is None:
+        plan_facts = ctx.plan_facts if ctx else PlanFacts(plan_df)
+    horizon_end = plan_facts.due_end
 
     # ======================================================
     # [1] 같은날 타라인 이송 (T6는 1회/5PLT 상한)
     # ======================================================
-    t6_used_sameday = bool(t6_sameday_already_used)
+    t6_used_sameday = bool(t6_sameday_already_used) or (due_checker is not None and due_checker.t6_sameday_used)
 
     for item in candidates:
         if remain <= 0:
@@ -929,7 +1642,7 @@ def python_fallback_reduce(
 
         name = item["name"]
         plt = int(item["plt"])
-        movable = int(item["max_movable"])
+        movable = _movable(item)
         if movable < plt:
             continue
 
@@ -949,9 +1662,8 @@ def python_fallback_reduce(
         # 목적지 후보(같은날)
         dests = []
         for dl in possible_lines:
-            key = f"{question_date}_{dl}"
-            if key in capa_status and int(capa_status[key]["remaining"]) > 0:
-                dests.append((dl, int(capa_status[key]["remaining"])))
+            if (question_date, dl) in capa_status and capa_status.remaining(question_date, dl) > 0:
+                dests.append((dl, capa_status.remaining(question_date, dl)))
         dests.sort(key=lambda x: x[1], reverse=True)
         if not dests:
             continue
@@ -962,34 +1674,36 @@ def python_fallback_reduce(
             if rem_capa < plt:
                 continue
 
-            take = min(remain, movable, rem_capa)
+            item_cap = movable
 
             # T6는 같은날 타라인 이송을 '최대 5PLT'까지만 우선 사용
             if is_t6:
-                take = min(take, int(MAX_T6_SAMEDAY_SHIFT_PLTS) * plt)
+                item_cap = min(item_cap, int(MAX_T6_SAMEDAY_SHIFT_PLTS) * plt)
 
-            take = _pick_qty_plts(take, plt)
-            if take <= 0:
+            if item_cap < plt:
                 continue
+            take = _pick_qty_plts(min(remain, item_cap, rem_capa), plt)
 
             # 가동일 체크
-            if not is_workday_in_db(plan_df, question_date):
-                continue
-            if not is_workday_in_db(plan_df, question_date):
+            if not is_workday_in_db(calendar, question_date):
                 continue
 
-            capa_status[f"{question_date}_{dl}"]["remaining"] -= take
+            move = {
+                "item": name,
+                "qty": take,
+                "plt": take // plt,
+                "from": f"{question_date}_{target_line}",
+                "to": f"{question_date}_{dl}",
+                "reason": f"[폴백] 타라인 이송으로 감축 ({dl} 잔여 활용)",
+            }
+            options.append(_plt_option(move, plt, item_cap, (question_date, dl), t6_sameday=is_t6, source_cap=movable + src_taken.get(name, 0)))
+            if take <= 0:
+                break  # 남은 감축 < 1PLT: 수량 선택 단계 후보로만 등록
+
+            capa_status.reserve(question_date, dl, take)
             remain -= take
-            moves.append(
-                {
-                    "item": name,
-                    "qty": take,
-                    "plt": take // plt,
-                    "from": f"{question_date}_{target_line}",
-                    "to": f"{question_date}_{dl}",
-                    "reason": f"[폴백] 타라인 이송으로 감축 ({dl} 잔여 활용)",
-                }
-            )
+            src_taken[name] = src_taken.get(name, 0) + take
+            moves.append(move)
 
             if is_t6:
                 t6_used_sameday = True
@@ -1001,11 +1715,7 @@ def python_fallback_reduce(
     if remain > 0:
         max_future_days = 10
 
-        future_candidates = get_workdays_from_db(plan_df, question_date, direction="future", days_count=400)
-        future_candidates = [d for d in future_candidates if str(d)[:10] != question_date]
-        if horizon_end:
-            future_candidates = [d for d in future_candidates if str(d)[:10] <= horizon_end]
-        future_days = future_candidates[:max_future_days]
+        future_days = calendar.next_workdays(question_date, max_future_days, exclusive=True, until=horizon_end)
 
         if not future_days:
             notes.append("⚠️ [폴백] 미래 가동일 정보를 찾지 못했습니다 (is_workday 없음/데이터 범위 부족).")
@@ -1017,37 +1727,36 @@ def python_fallback_reduce(
 
                 name = item["name"]
                 plt = int(item["plt"])
-                movable = int(item["max_movable"])
+                movable = _movable(item)
                 if movable < plt:
                     continue
 
                 for d in future_days:
                     if remain <= 0:
                         break
-                    key = f"{d}_{target_line}"
-                    if key not in capa_status:
+                    if (d, target_line) not in capa_status:
                         continue
-                    rem_capa = int(capa_status[key]["remaining"])
+                    rem_capa = capa_status.remaining(d, target_line)
                     if rem_capa < plt:
                         continue
 
-                    take = min(remain, movable, rem_capa)
-                    take = _pick_qty_plts(take, plt)
+                    take = _pick_qty_plts(min(remain, movable, rem_capa), plt)
+                    move = {
+                        "item": name,
+                        "qty": take,
+                        "plt": take // plt,
+                        "from": f"{question_date}_{target_line}",
+                        "to": f"{d}_{target_line}",
+                        "reason": f"[폴백] 동일라인 미래 연기로 감축 ({d})",
+                    }
+                    options.append(_plt_option(move, plt, movable, (d, target_line), source_cap=movable + src_taken.get(name, 0)))
                     if take <= 0:
-                        continue
+                        break
 
-                    capa_status[key]["remaining"] -= take
+                    capa_status.reserve(d, target_line, take)
                     remain -= take
-                    moves.append(
-                        {
-                            "item": name,
-                            "qty": take,
-                            "plt": take // plt,
-                            "from": f"{question_date}_{target_line}",
-                            "to": f"{d}_{target_line}",
-                            "reason": f"[폴백] 동일라인 미래 연기로 감축 ({d})",
-                        }
-                    )
+                    src_taken[name] = src_taken.get(name, 0) + take
+                    moves.append(move)
                     break  # 한 품목은 1건만
 
             # (2-b) 그래도 부족하면 마지막에 T6 동일라인 미래 연기
@@ -1058,44 +1767,45 @@ def python_fallback_reduce(
 
                     name = item["name"]
                     plt = int(item["plt"])
-                    movable = int(item["max_movable"])
+                    movable = _movable(item)
                     if movable < plt:
                         continue
 
                     for d in future_days:
                         if remain <= 0:
                             break
-                        key = f"{d}_{target_line}"
-                        if key not in capa_status:
+                        if (d, target_line) not in capa_status:
                             continue
-                        rem_capa = int(capa_status[key]["remaining"])
+                        rem_capa = capa_status.remaining(d, target_line)
                         if rem_capa < plt:
                             continue
 
-                        take = min(remain, movable, rem_capa)
-                        take = _pick_qty_plts(take, plt)
+                        take = _pick_qty_plts(min(remain, movable, rem_capa), plt)
+                        move = {
+                            "item": name,
+                            "qty": take,
+                            "plt": take // plt,
+                            "from": f"{question_date}_{target_line}",
+                            "to": f"{d}_{target_line}",
+                            "reason": f"[폴백] (보조) T6 동일라인 미래 연기로 감축 ({d})",
+                        }
+                        options.append(_plt_option(move, plt, movable, (d, target_line), source_cap=movable + src_taken.get(name, 0)))
                         if take <= 0:
-                            continue
+                            break
 
-                        capa_status[key]["remaining"] -= take
+                        capa_status.reserve(d, target_line, take)
                         remain -= take
-                        moves.append(
-                            {
-                                "item": name,
-                                "qty": take,
-                                "plt": take // plt,
-                                "from": f"{question_date}_{target_line}",
-                                "to": f"{d}_{target_line}",
-                                "reason": f"[폴백] (보조) T6 동일라인 미래 연기로 감축 ({d})",
-                            }
-                        )
+                        src_taken[name] = src_taken.get(name, 0) + take
+                        moves.append(move)
                         break
 
     # ======================================================
     # [3] 과거(선행생산)로 당기기 (마지막 수단)
     # ======================================================
     if remain > 0:
-        past_days = get_workdays_from_db(plan_df, question_date, direction="past", days_count=5)
+        past_days = get_workdays_from_db(
+            calendar, question_date, direction="past", days_count=5, today_str=ctx.today_str if ctx else None
+        )
 
         for item in candidates:
             if remain <= 0:
@@ -1103,96 +1813,122 @@ def python_fallback_reduce(
 
             name = item["name"]
             plt = int(item["plt"])
-            movable = int(item["max_movable"])
+            movable = _movable(item)
             if movable < plt:
                 continue
 
             for d in past_days:
                 if remain <= 0:
                     break
-                key = f"{d}_{target_line}"
-                if key not in capa_status:
+                if (d, target_line) not in capa_status:
                     continue
-                rem_capa = int(capa_status[key]["remaining"])
+                rem_capa = capa_status.remaining(d, target_line)
                 if rem_capa < plt:
                     continue
 
-                take = min(remain, movable, rem_capa)
-                take = _pick_qty_plts(take, plt)
+                take = _pick_qty_plts(min(remain, movable, rem_capa), plt)
+                move = {
+                    "item": name,
+                    "qty": take,
+                    "plt": take // plt,
+                    "from": f"{question_date}_{target_line}",
+                    "to": f"{d}_{target_line}",
+                    "reason": f"[폴백] 과거 선행생산으로 당기기 ({d})",
+                }
+                options.append(_plt_option(move, plt, movable, (d, target_line), source_cap=movable + src_taken.get(name, 0)))
                 if take <= 0:
-                    continue
+                    break
 
-                capa_status[key]["remaining"] -= take
+                capa_status.reserve(d, target_line, take)
                 remain -= take
-                moves.append(
-                    {
-                        "item": name,
-                        "qty": take,
-                        "plt": take // plt,
-                        "from": f"{question_date}_{target_line}",
-                        "to": f"{d}_{target_line}",
-                        "reason": f"[폴백] 과거 선행생산으로 당기기 ({d})",
-                    }
-                )
+                src_taken[name] = src_taken.get(name, 0) + take
+                moves.append(move)
                 break
 
+    # ======================================================
+    # [4] 수량 선택: PLT 조합 DP (그리디가 1PLT 미만으로 남긴 경우)
+    # ======================================================
+    if remain > 0:
+        greedy_filled = int(need_reduce) - remain
+        moves, filled = _select_plt_quantities(options, moves, int(need_reduce), capa_status, due_checker)
+        if filled > greedy_filled:
+            notes.append(f"✅ [폴백] PLT 조합 재선택: {greedy_filled:,} → {filled:,}개")
+
     return moves, notes
 
 def python_fallback_increase(
     plan_df: pd.DataFrame,
     constraint_info: List[Dict[str, Any]],
-    capa_status: Dict[str, Dict[str, Any]],
+    capa_status: CapacityLedger,
     question_date: str,
     target_line: str,
     need_increase: int,
+    plan_index: Optional[PlanIndex] = None,
+    calendar: Optional[WorkCalendar] = None,
+    due_checker: Optional[DueCumsumChecker] = None,
 ) -> Tuple[List[Dict[str, Any]], List[str]]:
     """
     증량 폴백:
     1) 같은날 타라인에서 가져오기 (T6만)
     2) 같은라인 미래 날짜에서 당기기
+    3) 수량 선택: 위 후보들의 PLT 수를 조합 DP로 다시 골라 need_increase에 최대한 맞춤
+    - 출발지 상한 = 칸 잔량(due_checker가 있으면 세션에서 앞서 승인된 이동을 뺀 값) - 이번 폴백에서 이미 잡은 수량
     """
     moves = []
     notes = []
+    options: List[Dict[str, Any]] = []  # 수량 선택(PLT 조합) 후보
+    src_taken: Dict[Tuple[str, str, str], int] = {}  # (품목, 날짜, 라인)별 이번 폴백에서 뺀 수량
 
     remain = need_increase
     if remain <= 0:
         return [], []
 
+    def _source_left(name: str, d: str, ln: str, row_qty: int) -> int:
+        left = due_checker.source_remaining(name, d, ln) if due_checker is not None else None
+        if left is None:
+            left = row_qty
+        return left - src_taken.get((name, d, ln), 0)
+
+    if plan_index is None:
+        plan_index = PlanIndex(plan_df)
+    if calendar is None:
+        calendar = WorkCalendar(plan_df)
+
     # [1] 같은날 타라인 -> target_line (T6만)
-    date_df = plan_df[plan_df["plan_date"] == question_date].copy()
-    if not date_df.empty:
-        for src_line in ["조립1", "조립2", "조립3"]:
-            if src_line == target_line:
-                continue
-            src = date_df[(date_df["line"] == src_line) & (date_df["qty_1차"] > 0)]
-            if src.empty:
-                continue
+    for src_line in ["조립1", "조립2", "조립3"]:
+        if src_line == target_line:
+            continue
+        src = [r for r in plan_index.line_rows(question_date, src_line) if (r.get("qty_1차") or 0) > 0]
+        if not src:
+            continue
 
-            for _, row in src.iterrows():
-                if remain <= 0:
-                    break
-                name = str(row.get("product_name", ""))
-                if "T6" not in name.upper():
-                    continue
-                plt = int(row.get("plt", 1) or 1)
-                src_qty = int(row.get("qty_1차", 0) or 0)
+        for row in src:
+            if remain <= 0:
+                break
+            name = str(row.get("product_name", ""))
+            if "T6" not in name.upper():
+                continue
+            plt = int(row.get("plt", 1) or 1)
+            src_qty = _source_left(name, question_date, src_line, int(row.get("qty_1차", 0) or 0))
 
-                take = min(remain, src_qty)
-                take = _pick_qty_plts(take, plt)
-                if take <= 0:
-                    continue
+            if src_qty < plt:
+                continue
+            take = _pick_qty_plts(min(remain, src_qty), plt)
+            move = {
+                "item": name,
+                "qty": take,
+                "plt": take // plt,
+                "from": f"{question_date}_{src_line}",
+                "to": f"{question_date}_{target_line}",
+                "reason": f"[폴백] 같은날 타라인({src_line})에서 T6 가져오기",
+            }
+            options.append(_plt_option(move, plt, src_qty, source_cap=src_qty + src_taken.get((name, question_date, src_line), 0)))
+            if take <= 0:
+                continue
 
-                remain -= take
-                moves.append(
-                    {
-                        "item": name,
-                        "qty": take,
-                        "plt": take // plt,
-                        "from": f"{question_date}_{src_line}",
-                        "to": f"{question_date}_{target_line}",
-                        "reason": f"[폴백] 같은날 타라인({src_line})에서 T6 가져오기",
-                    }
-                )
+            remain -= take
+            src_taken[(name, question_date, src_line)] = src_taken.get((name, question_date, src_line), 0) + take
+            moves.append(move)
 
     # [2] 미래 동일라인에서 당기기
     if remain > 0:
@@ -1201,19 +1937,15 @@ def python_fallback_increase(
             if remain <= 0:
                 break
             d = (base + timedelta(days=i)).strftime("%Y-%m-%d")
-            if not is_workday_in_db(plan_df, d):
+            if not is_workday_in_db(calendar, d):
                 continue
 
-            future = plan_df[
-                (plan_df["plan_date"] == d)
-                & (plan_df["line"] == target_line)
-                & (plan_df["qty_1차"] > 0)
-            ]
-            if future.empty:
+            future = [r for r in plan_index.line_rows(d, target_line) if (r.get("qty_1차") or 0) > 0]
+            if not future:
                 continue
 
             movable_map = {x["name"]: x for x in constraint_info}
-            for _, row in future.iterrows():
+            for row in future:
                 if remain <= 0:
                     break
 
@@ -1224,23 +1956,34 @@ def python_fallback_increase(
                 plt = int(item["plt"])
                 max_movable = int(item["max_movable"])
 
-                src_qty = int(row.get("qty_1차", 0) or 0)
-                take = min(remain, src_qty, max_movable)
-                take = _pick_qty_plts(take, plt)
+                src_qty = _source_left(name, d, target_line, int(row.get("qty_1차", 0) or 0))
+                item_cap = min(src_qty, max_movable)
+                if item_cap < plt:
+                    continue
+                take = _pick_qty_plts(min(remain, item_cap), plt)
+                move = {
+                    "item": name,
+                    "qty": take,
+                    "plt": take // plt,
+                    "from": f"{d}_{target_line}",
+                    "to": f"{question_date}_{target_line}",
+                    "reason": f"[폴백] 미래({d}) 동일라인 물량 당기기",
+                }
+                options.append(_plt_option(move, plt, item_cap, source_cap=min(src_qty + src_taken.get((name, d, target_line), 0), max_movable)))
                 if take <= 0:
                     continue
 
                 remain -= take
-                moves.append(
-                    {
-                        "item": name,
-                        "qty": take,
-                        "plt": take // plt,
-                        "from": f"{d}_{target_line}",
-                        "to": f"{question_date}_{target_line}",
-                        "reason": f"[폴백] 미래({d}) 동일라인 물량 당기기",
-                    }
-                )
+                src_taken[(name, d, target_line)] = src_taken.get((name, d, target_line), 0) + take
+                moves.append(move)
+
+    # [3] 수량 선택: PLT 조합 DP (그리디가 1PLT 미만으로 남긴 경우)
+    if remain > 0:
+        greedy_filled = int(need_increase) - remain
+        moves, filled = _select_plt_quantities(options, moves, int(need_increase), due_checker=due_checker)
+        remain = int(need_increase) - filled
+        if filled > greedy_filled:
+            notes.append(f"✅ [폴백] PLT 조합 재선택: {greedy_filled:,} → {filled:,}개")
 
     if remain > 0:
         notes.append(f"⚠️ [폴백] 증량 미달: 추가로 {remain:,}개 더 필요")
@@ -1248,6 +1991,228 @@ def python_fallback_increase(
     return moves, notes
 
 
+# ========================================================================
+# 최적화 엔진 (mode="optimize"): AI/폴백 재시도 없이 min-cost flow 1회로 이동안 산출
+# - 그래프: S → 품목(이동최대) → (날짜, 라인) 슬롯(잔여 CAPA) → T
+# - 간선 비용 = 사람 플로우 우선순위 (같은날 타라인 < 미래 연기(비 T6) < 미래 연기(T6) < 과거 당기기) + 날짜 거리
+# - 유량은 수량 단위로 풀고, 간선별 PLT 정수배로 내림한 뒤 남은 여유를 PLT 단위로 채움
+# ========================================================================
+
+def optimize_moves(
+    constraint_info: List[Dict[str, Any]],
+    capa_status: CapacityLedger,
+    question_date: str,
+    target_line: str,
+    operation_mode: str,
+    need_qty: int,
+    plan_index: PlanIndex,
+    calendar: WorkCalendar,
+    due_checker: DueCumsumChecker,
+    last_due_map: Dict[str, Any],
+    ctx: Optional[SchedulerContext] = None,
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    if need_qty <= 0:
+        return [], []
+
+    today_str = ctx.today_str if ctx else None
+    base_dt = _safe_date(question_date)
+    candidates = sorted(constraint_info, key=lambda x: x.get("buffer_days", 0), reverse=True)
+
+    def _days(d: str) -> int:
+        return abs((_safe_date(d) - base_dt).days)
+
+    def _floor_plt(q: int, plt: int) -> int:
+        return _pick_qty_plts(max(0, int(q)), plt)
+
+    # arc: 품목 1개가 슬롯 1개로(또는 슬롯에서) 움직이는 경로
+    arcs: List[Dict[str, Any]] = []
+    slot_cap: Dict[Tuple[str, str], int] = {}
+
+    for rank, item in enumerate(candidates):
+        name = item["name"]
+        plt = int(item["plt"])
+        supply = int(item["max_movable"])
+        if operation_mode == "reduce":
+            # 감축의 출발지는 (질문일, 대상 라인) 1곳 → 누적 여유가 커도 그 칸의 물량 이상은 못 뺌
+            left = due_checker.source_remaining(name, question_date, target_line)
+            supply = min(supply, plan_index.product_qty(name, question_date, target_line) if left is None else left)
+        supply = _floor_plt(supply, plt)
+        if supply < plt:
+            continue
+        is_t6 = bool(item.get("is_t6"))
+        is_a2xx = bool(item.get("is_a2xx"))
+        last_due = last_due_map.get(name)
+        last_due = None if last_due in (None, "미확인") else str(last_due)[:10]
+
+        if operation_mode == "reduce":
+            if is_t6:
+                sameday_lines = [l for l in ["조립1", "조립2", "조립3"] if l != target_line]
+            elif is_a2xx:
+                sameday_lines = [l for l in ["조립1", "조립2"] if l != target_line]
+            else:
+                sameday_lines = []
+
+            for d, ln in capa_status.keys():
+                if (d, ln) == (question_date, target_line):
+                    continue
+                if d == question_date:
+                    if ln not in sameday_lines:
+                        continue
+                    cost = 1000
+                    reason = f"[최적화] 타라인 이송으로 감축 ({ln} 잔여 활용)"
+                elif ln == target_line:
+                    if d > question_date:
+                        cost = (5000 if is_t6 else 2000) + _days(d)
+                        reason = f"[최적화] 동일라인 미래 연기로 감축 ({d})"
+                    else:
+                        cost = 8000 + _days(d)
+                        reason = f"[최적화] 과거 선행생산으로 당기기 ({d})"
+                else:
+                    continue
+
+                if not calendar.is_workday(d):
+                    continue
+                if today_str and d <= today_str:
+                    continue
+                if last_due and d > last_due:
+                    continue
+
+                cap = supply
+                due_cap = due_checker.max_shift_qty(name, question_date, d)
+                if due_cap is not None:
+                    cap = min(cap, due_cap)
+                sameday_t6 = is_t6 and d == question_date
+                if sameday_t6:
+                    cap = min(cap, int(MAX_T6_SAMEDAY_SHIFT_PLTS) * plt)
+                cap = _floor_plt(cap, plt)
+                if cap < plt:
+                    continue
+
+                slot_cap[(d, ln)] = max(0, capa_status.remaining(d, ln))
+                arcs.append(
+                    {
+                        "item": name, "plt": plt, "supply": supply, "rank": rank,
+                        "from": (question_date, target_line), "to": (d, ln), "slot": (d, ln),
+                        "cap": cap, "cost": cost + rank, "sameday_t6": sameday_t6, "reason": reason,
+                    }
+                )
+        else:
+            dest = (question_date, target_line)
+            if dest not in capa_status:
+                continue
+            if last_due and question_date > last_due:
+                continue
+            slot_cap[dest] = max(0, capa_status.remaining(*dest))
+
+            sources: List[Tuple[str, str, int, str]] = []
+            if is_t6:
+                for src_line in ["조립1", "조립2", "조립3"]:
+                    if src_line != target_line:
+                        sources.append((question_date, src_line, 1000, f"[최적화] 같은날 타라인({src_line})에서 T6 가져오기"))
+            for i in range(1, 11):
+                d = (base_dt + timedelta(days=i)).strftime("%Y-%m-%d")
+                if calendar.is_workday(d):
+                    sources.append((d, target_line, 2000 + i, f"[최적화] 미래({d}) 동일라인 물량 당기기"))
+
+            # 당기기(증량)는 누적 납기를 깨지 않으므로, 이동최대는 경로(출발지)별 상한으로만 적용 (step6과 동일)
+            item_arcs = []
+            for d, ln, cost, reason in sources:
+                left = due_checker.source_remaining(name, d, ln)
+                cap = min(supply, plan_index.product_qty(name, d, ln) if left is None else left)
+                sameday_t6 = is_t6 and d == question_date
+                if sameday_t6:
+                    cap = min(cap, int(MAX_T6_SAMEDAY_SHIFT_PLTS) * plt)
+                cap = _floor_plt(cap, plt)
+                if cap < plt:
+                    continue
+                item_arcs.append(
+                    {
+                        "item": name, "plt": plt, "rank": rank,
+                        "from": (d, ln), "to": dest, "slot": dest,
+                        "cap": cap, "cost": cost + rank, "sameday_t6": sameday_t6, "reason": reason,
+                    }
+                )
+            for a in item_arcs:
+                a["supply"] = sum(x["cap"] for x in item_arcs)
+            arcs.extend(item_arcs)
+
+    if not arcs:
+        return [], ["⚠️ [최적화] 이동 가능한 경로(품목×목적지)가 없습니다."]
+
+    # -------------------------------
+    # min-cost flow
+    # -------------------------------
+    item_names = list(dict.fromkeys(a["item"] for a in arcs))
+    slots = list(dict.fromkeys(a["slot"] for a in arcs))
+    item_node = {n: 1 + i for i, n in enumerate(item_names)}
+    slot_node = {k: 1 + len(item_names) + i for i, k in enumerate(slots)}
+    source, sink = 0, 1 + len(item_names) + len(slots)
+
+    mcf = MinCostFlow(sink + 1)
+    supply_of = {a["item"]: a["supply"] for a in arcs}
+    for n in item_names:
+        mcf.add_edge(source, item_node[n], supply_of[n], 0)
+    for k in slots:
+        mcf.add_edge(slot_node[k], sink, slot_cap[k], 0)
+    for a in arcs:
+        a["eid"] = mcf.add_edge(item_node[a["item"]], slot_node[a["slot"]], a["cap"], a["cost"])
+
+    flow, _ = mcf.flow(source, sink, int(need_qty))
+
+    # -------------------------------
+    # PLT 정수배 내림 + T6 같은날 타라인 1회 + 남은 여유 PLT 단위 채움
+    # -------------------------------
+    for a in arcs:
+        a["take"] = _pick_qty_plts(mcf.edge_flow(a["eid"]), a["plt"])
+
+    t6_arcs = sorted([a for a in arcs if a["sameday_t6"] and a["take"] > 0], key=lambda a: a["take"], reverse=True)
+    for a in t6_arcs[1:]:
+        a["take"] = 0
+    t6_used = t6_arcs[0] if t6_arcs else None
+
+    item_used: Dict[str, int] = {}
+    slot_used: Dict[Tuple[str, str], int] = {}
+    for a in arcs:
+        item_used[a["item"]] = item_used.get(a["item"], 0) + a["take"]
+        slot_used[a["slot"]] = slot_used.get(a["slot"], 0) + a["take"]
+    total = sum(a["take"] for a in arcs)
+
+    for a in sorted(arcs, key=lambda x: x["cost"]):
+        if a["sameday_t6"] and t6_used is not None and a is not t6_used:
+            continue
+        plt = a["plt"]
+        while (
+            total + plt <= need_qty
+            and a["take"] + plt <= a["cap"]
+            and item_used[a["item"]] + plt <= a["supply"]
+            and slot_used[a["slot"]] + plt <= slot_cap[a["slot"]]
+        ):
+            a["take"] += plt
+            item_used[a["item"]] += plt
+            slot_used[a["slot"]] += plt
+            total += plt
+        if a["sameday_t6"] and a["take"] > 0:
+            t6_used = a
+
+    moves: List[Dict[str, Any]] = []
+    for a in sorted(arcs, key=lambda x: x["cost"]):
+        if a["take"] <= 0:
+            continue
+        moves.append(
+            {
+                "item": a["item"],
+                "qty": a["take"],
+                "plt": a["take"] // a["plt"],
+                "from": f"{a['from'][0]}_{a['from'][1]}",
+                "to": f"{a['to'][0]}_{a['to'][1]}",
+                "reason": a["reason"],
+            }
+        )
+
+    notes = [f"[최적화] 후보 경로 {len(arcs)}개, 최소비용 유량 {flow:,}개 → PLT 단위 확정 {total:,}개"]
+    return moves, notes
+
+
 # ========================================================================
 # 보고서 생성 (reduce/increase 공통)
 # ========================================================================
@@ -1255,7 +2220,7 @@ def python_fallback_increase(
 def generate_full_report(
     stock_result: Dict[str, Any],
     items_with_slack: List[Dict[str, Any]],
-    capa_status: Dict[str, Dict[str, Any]],
+    capa_status: CapacityLedger,
     constraint_info: List[Dict[str, Any]],
     ai_strategy: Dict[str, Any],
     final_moves: List[Dict[str, Any]],
@@ -1417,6 +2382,68 @@ def generate_full_report(
     return "\n".join(report)
 
 
+# ========================================================================
+# 투기적 병렬 계획: Gemini 호출과 Python 계획(optimize_moves)을 동시에
+# ========================================================================
+
+def _get_ai_pool() -> ThreadPoolExecutor:
+    global _AI_POOL
+    with _AI_POOL_LOCK:
+        if _AI_POOL is None:
+            _AI_POOL = ThreadPoolExecutor(max_workers=GEMINI_MAX_INFLIGHT, thread_name_prefix="gemini")
+        return _AI_POOL
+
+
+def _ai_stuck_calls(older_than: float) -> int:
+    """older_than초보다 오래 응답 없는 진행 중 AI 호출 수"""
+    now = time.monotonic()
+    with _AI_POOL_LOCK:
+        return sum(1 for t0 in _AI_INFLIGHT.values() if now - t0 > older_than)
+
+
+def _submit_ai(fn: Callable[..., Any], **kwargs: Any):
+    """
+    AI 풀에 제출. 진행 중 호출이 GEMINI_MAX_INFLIGHT개로 꽉 차 있으면(멈춘 호출이 워커 점유) None
+    → 호출측은 AI를 건너뛰고 Python 계획으로 진행 (큐에 쌓여 예산만 소모하는 것 방지)
+    """
+    pool = _get_ai_pool()
+    with _AI_POOL_LOCK:
+        if len(_AI_INFLIGHT) >= GEMINI_MAX_INFLIGHT:
+            return None
+        fut = pool.submit(fn, **kwargs)
+        _AI_INFLIGHT[fut] = time.monotonic()
+
+    def _done(f) -> None:
+        with _AI_POOL_LOCK:
+            _AI_INFLIGHT.pop(f, None)
+
+    fut.add_done_callback(_done)
+    return fut
+
+
+def _score_strategy(
+    strategy: Dict[str, Any],
+    constraint_info: List[Dict[str, Any]],
+    capa_status: CapacityLedger,
+    plan_df: pd.DataFrame,
+    target_line: str,
+    ctx: SchedulerContext,
+) -> int:
+    """전략을 step6로 검증했을 때 승인되는 수량 (capa_status는 원복, moves 원본은 건드리지 않음)"""
+    cp = capa_status.checkpoint()
+    validated, _ = step6_validate_ai_strategy(
+        ai_strategy={"moves": [dict(m) for m in (strategy or {}).get("moves", []) if isinstance(m, dict)]},
+        constraint_info=constraint_info,
+        capa_status=capa_status,
+        plan_df=plan_df,
+        target_line=target_line,
+        due_checker=DueCumsumChecker(ctx.due_profile, ctx.plan_index),
+        ctx=ctx,
+    )
+    capa_status.rollback(cp)
+    return sum(int(m.get("qty", 0) or 0) for m in validated)
+
+
 # ========================================================================
 # 메인 엔진 (app (3).py 호환)
 # ========================================================================
@@ -1424,25 +2451,34 @@ def generate_full_report(
 def ask_professional_scheduler(
     question: str,
     plan_df: pd.DataFrame,
-    hist_df: pd.DataFrame,
-    product_map: Dict[str, Any],
-    plt_map: Dict[str, Any],
+    hist_df: Any,
+    product_map: Any,
+    plt_map: Any,
     question_date: str,
     mode: str = "hybrid",
     today=None,
     capa_limits: Optional[Dict[str, int]] = None,
     genai_key: str = "",
+    ai_latency_budget: Optional[float] = AI_LATENCY_BUDGET_SEC,
+    on_late_ai: Optional[Callable[[Optional[Dict[str, Any]], Optional[str]], None]] = None,
+    on_ai_token: Optional[Callable[[str], None]] = None,
 ) -> Tuple[str, bool, List[Any], str, List[Dict[str, Any]]]:
     """
     Returns: (report, success, charts, status, validated_moves)_message)
+    - mode="hybrid": AI 전략 ∥ Python 계획(동시 실행) → 검증 승인량이 큰 쪽 채택 → 폴백
+      - ai_latency_budget초 안에 AI가 안 오면 Python 계획으로 바로 진행 (None이면 끝까지 대기)
+      - on_late_ai(ai_strategy, error): 예산을 넘겨 늦게 도착한 AI 결과를 받는 콜백 (선택)
+      - on_ai_token(조각): Gemini 스트리밍 텍스트 조각 콜백 (AI 스레드에서 호출됨, 선택)
+    - mode="optimize": AI 없이 min-cost flow 최적화 → 검증 (부족분만 폴백)
+    - hist_df/product_map/plt_map: app 호환용 인자 (엔진에서 읽지 않음 → 지연 로드 핸들을 넘겨도 로드되지 않음)
     """
-    if today is None:
-        today = datetime(2026, 1, 5).date()
-    if capa_limits is None:
-        capa_limits = {"조립1": 3300, "조립2": 3700, "조립3": 3600}
-
-    initialize_globals(today, capa_limits)
-    today_str = today.strftime("%Y-%m-%d")
+    # 질문 1건의 실행 문맥: plan 정규화 + 스냅샷당 1회 인덱싱 (이후 단계는 전부 O(1) 조회, 전역 상태 없음)
+    ctx = SchedulerContext.build(plan_df, today=today, capa_limits=capa_limits)
+    today_str = ctx.today_str
+    capa_limits = ctx.capa_limits
+    plan_df, plan_index, slack_table, due_profile, calendar = (
+        ctx.plan_df, ctx.plan_index, ctx.slack_table, ctx.due_profile, ctx.calendar
+    )
 
     # 0) 대상 라인 탐색
     target_line = _infer_target_line(question, plan_df, question_date)
@@ -1456,17 +2492,17 @@ def ask_professional_scheduler(
         )
 
     # 1) stock
-    stock_res, err = step1_list_current_stock(plan_df, question_date, target_line)
+    stock_res, err = step1_list_current_stock(plan_df, question_date, target_line, plan_index=plan_index)
     if err:
         return f"❌ [1단계 실패] {err}", False, [], "[ERROR] 품목 조회 실패", []
 
     # 2) slack
-    items_with_slack = step2_calculate_cumulative_slack(plan_df, stock_res)
+    items_with_slack = step2_calculate_cumulative_slack(plan_df, stock_res, slack_table=slack_table)
     if not items_with_slack:
         return "❌ [2단계 실패] 이동 가능한 품목이 없습니다.", False, [], "[ERROR] 품목 분석 실패", []
 
     # 3) capa
-    capa_status = step3_analyze_destination_capacity(plan_df, question_date, target_line, capa_limits)
+    capa_status = step3_analyze_destination_capacity(plan_df, question_date, target_line, capa_limits, plan_index=plan_index, calendar=calendar, ctx=ctx)
 
     # 4) constraint
     constraint_info = step4_prepare_constraint_info(items_with_slack, target_line)
@@ -1506,31 +2542,160 @@ def ask_professional_scheduler(
     extra_notes: List[str] = []
     report_prefix: str = ""
 
-    fact_report = build_ai_fact_report(
-        constraint_info=constraint_info,
-        capa_status=capa_status,
-        target_date=question_date,
-        target_line=target_line,
-        operation_mode=operation_mode,
-        operation_qty=operation_qty,
-    )
+    # 누적 납기 검증기는 capa_status와 같은 수명: 승인된 이동이 계속 누적됨
+    cp_after_step3 = capa_status.checkpoint()
+    due_checker = DueCumsumChecker(due_profile, plan_index)
+
+    if mode == "optimize":
+        # AI 호출/폴백 재시도 없이 min-cost flow 1회로 이동안 산출 (검증은 6단계 그대로)
+        opt_moves, opt_notes = optimize_moves(
+            constraint_info=constraint_info,
+            capa_status=capa_status,
+            question_date=question_date,
+            target_line=target_line,
+            operation_mode=operation_mode,
+            need_qty=operation_qty,
+            plan_index=plan_index,
+            calendar=calendar,
+            due_checker=due_checker,
+            last_due_map={x["name"]: x.get("last_due") for x in items_with_slack},
+            ctx=ctx,
+        )
+        ai_strategy = {
+            "strategy": "Python 최적화 (min-cost flow)",
+            "explanation": "품목×목적지 이동을 최소 비용 유량으로 한 번에 배분 (CAPA/납기/라인 제약 반영)",
+            "moves": opt_moves,
+        }
+        strategy_source = "Python 최적화 엔진 (min-cost flow, AI 미사용)"
+        extra_notes.extend(opt_notes)
+    else:
+        fact_report = build_ai_fact_report(
+            constraint_info=constraint_info,
+            capa_status=capa_status,
+            target_date=question_date,
+            target_line=target_line,
+            operation_mode=operation_mode,
+            operation_qty=operation_qty,
+        )
 
-    ai_strategy, ai_err, strategy_source = step5_ask_ai_strategy(
-        fact_report=fact_report,
-        operation_mode=operation_mode,
-        operation_qty=operation_qty,
-        target_line=target_line,
-        target_date=question_date,
-        today_str=today_str,
-        capa_target_pct=int(capa_target * 100),
-        genai_key=genai_key,
-    )
+        # AI 호출은 스레드 풀에서, 그동안 Python 계획을 미리 계산 (genai 전역 설정은 여기 호출 스레드에서)
+        configure_genai(genai_key)
+        ai_future = _submit_ai(
+            step5_ask_ai_strategy,
+            fact_report=fact_report,
+            operation_mode=operation_mode,
+            operation_qty=operation_qty,
+            target_line=target_line,
+            target_date=question_date,
+            today_str=today_str,
+            capa_target_pct=int(capa_target * 100),
+            genai_key=genai_key,
+            on_token=on_ai_token,
+        )
+        # 지연 예산은 제출 시점부터 (Python 계획 계산 시간도 예산에 포함)
+        ai_deadline = None if ai_latency_budget is None else time.monotonic() + ai_latency_budget
+        opt_moves, opt_notes = optimize_moves(
+            constraint_info=constraint_info,
+            capa_status=capa_status,
+            question_date=question_date,
+            target_line=target_line,
+            operation_mode=operation_mode,
+            need_qty=operation_qty,
+            plan_index=plan_index,
+            calendar=calendar,
+            due_checker=due_checker,
+            last_due_map={x["name"]: x.get("last_due") for x in items_with_slack},
+            ctx=ctx,
+        )
+
+        # 기존 폴백 계획도 같이 세워 검증 승인량이 큰 쪽을 Python 계획으로 (최적화가 폴백보다 나빠지는 회귀 방지)
+        sim_cp = capa_status.checkpoint()
+        if operation_mode == "reduce":
+            fbp_moves, fbp_notes = python_fallback_reduce(
+                plan_df=plan_df,
+                constraint_info=constraint_info,
+                capa_status=capa_status,
+                question_date=question_date,
+                target_line=target_line,
+                need_reduce=operation_qty,
+                calendar=calendar,
+                due_checker=DueCumsumChecker(due_profile, plan_index),
+                ctx=ctx,
+            )
+        else:
+            fbp_moves, fbp_notes = python_fallback_increase(
+                plan_df=plan_df,
+                constraint_info=constraint_info,
+                capa_status=capa_status,
+                question_date=question_date,
+                target_line=target_line,
+                need_increase=operation_qty,
+                plan_index=plan_index,
+                calendar=calendar,
+                due_checker=DueCumsumChecker(due_profile, plan_index),
+            )
+        capa_status.rollback(sim_cp)
+
+        common = dict(
+            constraint_info=constraint_info,
+            capa_status=capa_status,
+            plan_df=plan_df,
+            target_line=target_line,
+            ctx=ctx,
+        )
+        opt_score = _score_strategy({"moves": opt_moves}, **common)
+        fbp_score = _score_strategy({"moves": fbp_moves}, **common)
+        if fbp_score > opt_score:
+            py_strategy = {
+                "strategy": "Python 계획 (폴백 우선순위)",
+                "explanation": "AI 대기 중 병렬로 계산한 기본 계획 (사람 플로우 우선순위, 최적화안보다 검증 승인량 큼)",
+                "moves": fbp_moves,
+            }
+            py_notes, py_score = list(fbp_notes), fbp_score
+        else:
+            py_strategy = {
+                "strategy": "Python 계획 (min-cost flow)",
+                "explanation": "AI 대기 중 병렬로 계산한 기본 계획 (CAPA/납기/라인 제약 반영)",
+                "moves": opt_moves,
+            }
+            py_notes, py_score = list(opt_notes), opt_score
 
-    if ai_strategy is None:
-        ai_failed = True
-        ai_error_msg = ai_err or "AI 전략 수립 실패"
-        ai_strategy = {"strategy": "AI 실패 → Python 폴백", "explanation": "AI 오류로 기본 로직 적용", "moves": []}
-        strategy_source = "Python 폴백 (AI 오류)"
+        if ai_future is None:
+            stuck = _ai_stuck_calls(ai_latency_budget or 0.0)
+            ai_strategy, ai_err, strategy_source = None, f"AI 호출 슬롯 포화 (응답 없는 호출 {stuck}건) → AI 생략", "AI 생략"
+        else:
+            try:
+                ai_strategy, ai_err, strategy_source = ai_future.result(
+                    timeout=None if ai_deadline is None else max(0.0, ai_deadline - time.monotonic())
+                )
+            except FutureTimeoutError:
+                ai_strategy, ai_err, strategy_source = None, f"AI 응답 지연 ({ai_latency_budget:g}초 초과)", "AI 지연"
+                if on_late_ai is not None:
+                    def _deliver_late(f, cb=on_late_ai) -> None:
+                        # 늦게 끝난 호출이 실패/취소됐으면 전달할 결과 없음 (result()가 콜백 안에서 예외를 던지지 않게)
+                        if f.cancelled() or f.exception() is not None:
+                            return
+                        cb(*f.result()[:2])
+
+                    ai_future.add_done_callback(_deliver_late)
+                stuck = _ai_stuck_calls(ai_latency_budget or 0.0)
+                if stuck > 1:
+                    extra_notes.append(f"⚠️ 응답 없는 Gemini 호출 {stuck}건 진행 중 (슬롯 {GEMINI_MAX_INFLIGHT}개 중)")
+
+        if ai_strategy is None:
+            ai_failed = True
+            ai_error_msg = ai_err or "AI 전략 수립 실패"
+            ai_strategy = py_strategy
+            strategy_source = "Python 계획 (AI 지연/오류 → 병렬 계산분 사용)"
+            extra_notes.extend(py_notes)
+        else:
+            # 둘 다 있으면 검증 승인량으로 비교 (같으면 AI 우선)
+            ai_score = _score_strategy(ai_strategy, **common)
+            if py_score > ai_score:
+                extra_notes.append(f"ℹ️ Python 계획 채택: 검증 승인량 {py_score:,}개 > AI {ai_score:,}개")
+                extra_notes.extend(py_notes)
+                ai_strategy = py_strategy
+                strategy_source = "Python 계획 (AI보다 검증 결과 우수)"
 
     # 6) 검증
     final_moves, violations = step6_validate_ai_strategy(
@@ -1539,10 +2704,14 @@ def ask_professional_scheduler(
         capa_status=capa_status,
         plan_df=plan_df,
         target_line=target_line,
+        plan_index=plan_index,
+        due_checker=due_checker,
+        calendar=calendar,
+        ctx=ctx,
     )
 
     # 6.5) AI가 부족하면 Python 폴백으로 채우기
-    # - 폴백은 capa_status를 직접 깎지 않고(deepcopy로 시뮬레이션), 검증 통과분만 원본 capa_status에 반영
+    # - 폴백은 checkpoint 이후 capa_status를 깎아 시뮬레이션하고 rollback, 검증 통과분만 capa_status에 반영
     # - 검증 후 remaining을 다시 계산하여 최대 2회까지 재시도
     def _sum_qty(moves: List[Dict[str, Any]]) -> int:
         return sum(int(m.get("qty", 0) or 0) for m in (moves or []))
@@ -1556,7 +2725,7 @@ def ask_professional_scheduler(
     while remaining > 0 and fb_attempts < 2:
         fb_attempts += 1
 
-        sim_capa = deepcopy(capa_status)
+        sim_cp = capa_status.checkpoint()
 
         if operation_mode == "reduce":
             t6_sameday_used_now = any(
@@ -1569,22 +2738,30 @@ def ask_professional_scheduler(
             fb_moves, fb_notes = python_fallback_reduce(
                 plan_df=plan_df,
                 constraint_info=constraint_info,
-                capa_status=sim_capa,
+                capa_status=capa_status,
                 question_date=question_date,
                 target_line=target_line,
                 need_reduce=remaining,
                 t6_sameday_already_used=t6_sameday_used_now,
+                calendar=calendar,
+                due_checker=due_checker,
+                ctx=ctx,
             )
         else:
             fb_moves, fb_notes = python_fallback_increase(
                 plan_df=plan_df,
                 constraint_info=constraint_info,
-                capa_status=sim_capa,
+                capa_status=capa_status,
                 question_date=question_date,
                 target_line=target_line,
                 need_increase=remaining,
+                plan_index=plan_index,
+                calendar=calendar,
+                due_checker=due_checker,
             )
 
+        capa_status.rollback(sim_cp)
+
         # 폴백 내부의 "미달" 숫자는 검증 탈락/재시도 때문에 어긋날 수 있으므로,
         # 여기서는 "미달" 문구는 버리고 최종 remaining 기준으로 마지막에 1번만 출력한다.
         fb_notes_all.extend([n for n in (fb_notes or []) if "미달" not in n])
@@ -1597,6 +2774,10 @@ def ask_professional_scheduler(
                 capa_status=capa_status,
                 plan_df=plan_df,
                 target_line=target_line,
+                plan_index=plan_index,
+                due_checker=due_checker,
+                calendar=calendar,
+                ctx=ctx,
             )
             final_moves.extend(fb_valid)
             violations.extend([f"[폴백검증] {x}" for x in fb_viol])
@@ -1622,7 +2803,7 @@ def ask_professional_scheduler(
             plt_base = min(plts) if plts else 1
 
             capa_events = _suggest_capa_events_auto(
-                plan_df=plan_df,
+                calendar=calendar,
                 question_date=question_date,
                 target_line=target_line,
                 shortfall_qty=baseline_shortfall,
@@ -1631,15 +2812,21 @@ def ask_professional_scheduler(
             )
 
             if capa_events:
-                capa_status2 = step3_analyze_destination_capacity(plan_df, question_date, target_line, capa_limits)
-                _apply_capa_events_to_status(capa_status2, capa_events, capa_limits)
+                # 이벤트 시뮬레이션은 step3 직후 CAPA에서 출발 (기존 결과의 차감분은 잠시 되돌렸다가, 채택 안 되면 redo)
+                baseline_entries = capa_status.rollback(cp_after_step3)
+                _apply_capa_events_to_status(capa_status, capa_events, capa_limits)
+                due_checker2 = DueCumsumChecker(due_profile, plan_index)
 
                 final2, viol2 = step6_validate_ai_strategy(
                     ai_strategy=ai_strategy,
                     constraint_info=constraint_info,
-                    capa_status=capa_status2,
+                    capa_status=capa_status,
                     plan_df=plan_df,
                     target_line=target_line,
+                    plan_index=plan_index,
+                    due_checker=due_checker2,
+                    calendar=calendar,
+                    ctx=ctx,
                 )
 
                 remaining2 = max(0, operation_qty - _sum_qty(final2))
@@ -1647,7 +2834,7 @@ def ask_professional_scheduler(
                 fb_attempts2 = 0
                 while remaining2 > 0 and fb_attempts2 < 2:
                     fb_attempts2 += 1
-                    sim2 = deepcopy(capa_status2)
+                    sim_cp2 = capa_status.checkpoint()
 
                     t6_sameday_used_now2 = any(
                         (str(x.get('item')) == 'T6 (P703) 수원(U725)')
@@ -1659,13 +2846,18 @@ def ask_professional_scheduler(
                     fb_moves2, fb_notes_tmp = python_fallback_reduce(
                         plan_df=plan_df,
                         constraint_info=constraint_info,
-                        capa_status=sim2,
+                        capa_status=capa_status,
                         question_date=question_date,
                         target_line=target_line,
                         need_reduce=remaining2,
                         t6_sameday_already_used=t6_sameday_used_now2,
+                        calendar=calendar,
+                        due_checker=due_checker2,
+                        ctx=ctx,
                     )
 
+                    capa_status.rollback(sim_cp2)
+
                     fb_notes2.extend([n for n in (fb_notes_tmp or []) if "미달" not in n])
 
                     if fb_moves2:
@@ -1673,9 +2865,13 @@ def ask_professional_scheduler(
                         fb_valid2, fb_viol2 = step6_validate_ai_strategy(
                             ai_strategy=fb_strategy2,
                             constraint_info=constraint_info,
-                            capa_status=capa_status2,
+                            capa_status=capa_status,
                             plan_df=plan_df,
                             target_line=target_line,
+                            plan_index=plan_index,
+                            due_checker=due_checker2,
+                            calendar=calendar,
+                            ctx=ctx,
                         )
                         final2.extend(fb_valid2)
                         viol2.extend([f"[폴백검증] {x}" for x in fb_viol2])
@@ -1694,10 +2890,12 @@ def ask_professional_scheduler(
 
                     final_moves = final2
                     violations = viol2
-                    capa_status = capa_status2
                     extra_notes = fb_notes2[:]
                     if remaining2 > 0:
                         extra_notes.append(f"⚠️ [폴백] 감축 미달: 추가로 {remaining2:,}개 더 감축 필요")
+                else:
+                    capa_status.rollback(cp_after_step3)
+                    capa_status.redo(baseline_entries)
     # 최종 달성률 기반 success/status
     moved_total = sum(int(m["qty"]) for m in final_moves) if final_moves else 0
     achievement = (moved_total / operation_qty * 100) if operation_qty else 0
@@ -1732,3 +2930,435 @@ def ask_professional_scheduler(
     )
 
     return report, success, [], status, final_moves
+
+
+# ========================================================================
+# 기간 평준화 (batch): 전체 날짜×라인을 목표 가동률 이하로 한 번에 재배치
+# - 전 기간 (날짜, 라인) 슬롯을 CapacityLedger 1개에 등록 (max = CAPA × 목표 가동률)
+#   → 초과 슬롯은 remaining < 0, 이동 목적지 여유는 목표 가동률 기준
+# - 초과 슬롯을 날짜순으로: step1 → step2 → step4 → optimize_moves → step6 (부족분만 폴백)
+# - CAPA 장부/누적 납기 검증기를 모든 슬롯이 공유 → 앞 슬롯의 이동이 뒤 슬롯 판단에 그대로 반영
+# ========================================================================
+
+def _as_util_ratio(v: Any) -> float:
+    """0.85 / 85 / "85%" 모두 0.85로"""
+    f = float(str(v).strip().rstrip("%"))
+    return f / 100 if f > 1.5 else f
+
+
+def level_horizon(
+    plan_df: pd.DataFrame,
+    target_util: Any = 0.85,
+    today=None,
+    capa_limits: Optional[Dict[str, int]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Tuple[str, bool, str, List[Dict[str, Any]], pd.DataFrame]:
+    """
+    기간 전체 평준화 (AI 미사용, 1회 호출)
+    - target_util: 전 라인 공통 값 또는 {"조립1": 0.85, ...} (비율/퍼센트 모두 허용)
+    - start_date/end_date: 평준화 대상 기간 (기본: plan_df 전체, today 이전/당일은 출발지에서 제외)
+    Returns: (report, success, status, moves, load_df)
+      - moves: 검증 통과 이동 (ask_professional_scheduler와 같은 형식)
+      - load_df: 슬롯별 before/after 부하 (plan_date, line, capa, target, before, after, before_pct, after_pct)
+    """
+    lines = ["조립1", "조립2", "조립3"]
+    # plan 스냅샷당 1회 (모든 슬롯이 공유)
+    ctx = SchedulerContext.build(plan_df, today=today, capa_limits=capa_limits)
+    today_str = ctx.today_str
+    capa_limits = ctx.capa_limits
+
+    if not isinstance(target_util, dict):
+        target_util = {ln: target_util for ln in lines}
+    ratios = {ln: _as_util_ratio(target_util.get(ln, 0.85)) for ln in lines}
+    ceilings = {ln: int(int(capa_limits[ln]) * ratios[ln]) for ln in lines}
+
+    empty_load = pd.DataFrame(columns=["plan_date", "line", "capa", "target", "before", "after", "before_pct", "after_pct"])
+    plan_df = ctx.plan_df
+    if plan_df.empty or "plan_date" not in plan_df.columns:
+        return "❌ 생산계획 데이터가 없습니다.", False, "[ERROR] 데이터 없음", [], empty_load
+
+    plan_index, slack_table, calendar = ctx.plan_index, ctx.slack_table, ctx.calendar
+    due_checker = DueCumsumChecker(ctx.due_profile, plan_index)
+
+    dates = sorted(plan_df["plan_date"].unique())
+    if start_date:
+        dates = [d for d in dates if d >= str(start_date)[:10]]
+    if end_date:
+        dates = [d for d in dates if d <= str(end_date)[:10]]
+    if not dates:
+        return "❌ 평준화 대상 기간에 생산계획이 없습니다.", False, "[ERROR] 기간 없음", [], empty_load
+
+    ledger = CapacityLedger(initial_slots=max(16, len(dates) * len(lines)))
+    for d in dates:
+        for ln in lines:
+            ledger.register(d, ln, current=plan_index.line_total(d, ln), max_capa=ceilings[ln])
+
+    over_before = [(d, ln) for d in dates for ln in lines if ledger.remaining(d, ln) < 0]
+    sources = [(d, ln) for d, ln in over_before if d > today_str]
+
+    def _sum_qty(moves: List[Dict[str, Any]]) -> int:
+        return sum(int(m.get("qty", 0) or 0) for m in (moves or []))
+
+    all_moves: List[Dict[str, Any]] = []
+    unresolved: List[Tuple[str, str, int, str]] = []
+
+    for d, ln in sources:
+        need = -ledger.remaining(d, ln)
+        if need <= 0:
+            continue
+
+        stock_res, err = step1_list_current_stock(plan_df, d, ln, plan_index=plan_index)
+        if err:
+            unresolved.append((d, ln, need, err))
+            continue
+        items_with_slack = step2_calculate_cumulative_slack(plan_df, stock_res, slack_table=slack_table)
+        constraint_info = step4_prepare_constraint_info(items_with_slack, ln)
+        if not constraint_info:
+            unresolved.append((d, ln, need, "이동 가능한 품목(1PLT 이상) 없음"))
+            continue
+
+        opt_moves, _ = optimize_moves(
+            constraint_info=constraint_info,
+            capa_status=ledger,
+            question_date=d,
+            target_line=ln,
+            operation_mode="reduce",
+            need_qty=need,
+            plan_index=plan_index,
+            calendar=calendar,
+            due_checker=due_checker,
+            last_due_map={x["name"]: x.get("last_due") for x in items_with_slack},
+            ctx=ctx,
+        )
+        slot_moves, _ = step6_validate_ai_strategy(
+            ai_strategy={"moves": opt_moves},
+            constraint_info=constraint_info,
+            capa_status=ledger,
+            plan_df=plan_df,
+            target_line=ln,
+            plan_index=plan_index,
+            due_checker=due_checker,
+            calendar=calendar,
+            ctx=ctx,
+        )
+
+        shortfall = need - _sum_qty(slot_moves)
+        if shortfall > 0:
+            sim_cp = ledger.checkpoint()
+            t6_sameday_used_now = any(
+                x.get("from") == f"{d}_{ln}" and str(x.get("to", "")).startswith(f"{d}_") and ("T6" in str(x.get("item", "")).upper())
+                for x in slot_moves
+            )
+            fb_moves, _ = python_fallback_reduce(
+                plan_df=plan_df,
+                constraint_info=constraint_info,
+                capa_status=ledger,
+                question_date=d,
+                target_line=ln,
+                need_reduce=shortfall,
+                t6_sameday_already_used=t6_sameday_used_now,
+                calendar=calendar,
+                due_checker=due_checker,
+                ctx=ctx,
+            )
+            ledger.rollback(sim_cp)
+            if fb_moves:
+                fb_valid, _ = step6_validate_ai_strategy(
+                    ai_strategy={"moves": fb_moves},
+                    constraint_info=constraint_info,
+                    capa_status=ledger,
+                    plan_df=plan_df,
+                    target_line=ln,
+                    plan_index=plan_index,
+                    due_checker=due_checker,
+                    calendar=calendar,
+                    ctx=ctx,
+                )
+                slot_moves.extend(fb_valid)
+
+        moved = _sum_qty(slot_moves)
+        if moved > 0:
+            # 출발 슬롯 부하 감소도 공유 장부에 반영
+            ledger.release(d, ln, moved)
+        all_moves.extend(slot_moves)
+        if need - moved > 0:
+            unresolved.append((d, ln, need - moved, "목적지 여유/납기 제약으로 미달"))
+
+    # -------------------------------
+    # 슬롯별 before/after
+    # -------------------------------
+    rows = []
+    for d in dates:
+        for ln in lines:
+            before = plan_index.line_total(d, ln)
+            after = ceilings[ln] - ledger.remaining(d, ln)
+            capa = int(capa_limits[ln])
+            rows.append(
+                {
+                    "plan_date": d,
+                    "line": ln,
+                    "capa": capa,
+                    "target": ceilings[ln],
+                    "before": int(before),
+                    "after": int(after),
+                    "before_pct": round(before / capa * 100, 1) if capa else 0.0,
+                    "after_pct": round(after / capa * 100, 1) if capa else 0.0,
+                }
+            )
+    load_df = pd.DataFrame(rows)
+    over_after = load_df[load_df["after"] > load_df["target"]]
+
+    # -------------------------------
+    # 보고서
+    # -------------------------------
+    moved_total = _sum_qty(all_moves)
+    util_txt = " / ".join(f"{ln} {ratios[ln] * 100:.0f}%" for ln in lines)
+    report = []
+    report.append(f"# 📊 기간 평준화 보고서 ({dates[0]} ~ {dates[-1]})")
+    report.append(f"🔧 엔진 버전: {ENGINE_VERSION}")
+    report.append("")
+    report.append("## 🔍 기준")
+    report.append(f"- 목표 가동률: {util_txt}")
+    report.append(f"- 분석 기준일: {today_str} (이전/당일 슬롯은 출발지에서 제외)")
+    report.append("")
+    report.append("## 🎯 결과")
+    report.append(f"- 목표 초과 슬롯: **{len(over_before)}개 → {len(over_after)}개**")
+    report.append(f"- 이동: **{len(all_moves)}건 / {moved_total:,}개**")
+    report.append("")
+
+    report.append(f"## 🧾 이동 계획 ({len(all_moves)}건)")
+    if all_moves:
+        for i, m in enumerate(all_moves, 1):
+            report.append(
+                f"{i}) {m['item']} | {int(m['qty']):,}개({m.get('plt', '?')}PLT) | "
+                f"{m.get('from', '-')} → {m.get('to', '-')} | {m.get('reason', '-')}"
+            )
+    else:
+        report.append("❌ 승인된 이동 없음")
+
+    if unresolved:
+        report.append("")
+        report.append(f"## ⚠️ 미해소 슬롯 ({len(unresolved)}개)")
+        for d, ln, q, why in unresolved:
+            report.append(f"- {d} {ln}: 초과 {q:,}개 ({why})")
+
+    success = over_after.empty
+    if success:
+        status = "[OK] 기간 평준화 완료 (전 슬롯 목표 이하)"
+    else:
+        status = f"[WARN] 기간 평준화 미달 - 초과 슬롯 {len(over_after)}개"
+
+    return "\n".join(report), success, status, all_moves, load_df
+
+
+# ========================================================================
+# CAPA 목표 스윕: 1~4단계는 1회, 목표치(70/75/80...%)별 풀이는 프로세스 풀에서 병렬
+# - 프로세스 풀은 모듈 단위로 1번 만들어 재사용 (호출마다 워커를 새로 띄우지 않음), executor=로 직접 넘길 수도 있음
+# - 목표치를 워커 수만큼 묶어 보냄 → 사실 정보(facts, plan_df 포함)는 묶음당 1회만 전송
+# - 목표별 풀이 = optimize_moves → step6 → (부족분) 폴백 ×2, CAPA 장부는 checkpoint/rollback으로 매번 원복
+# ========================================================================
+
+def _get_sweep_pool(max_workers: Optional[int]) -> ProcessPoolExecutor:
+    with _SWEEP_POOL_LOCK:
+        pool = _SWEEP_POOLS.get(max_workers)
+        if pool is None:
+            pool = _SWEEP_POOLS[max_workers] = ProcessPoolExecutor(max_workers=max_workers)
+        return pool
+
+
+def _drop_sweep_pool(pool: ProcessPoolExecutor) -> None:
+    """깨진 풀은 버림 → 다음 호출에서 새로 생성"""
+    with _SWEEP_POOL_LOCK:
+        for k, v in list(_SWEEP_POOLS.items()):
+            if v is pool:
+                del _SWEEP_POOLS[k]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _sweep_solve_chunk(facts: Dict[str, Any], ratios: List[float]) -> List[Dict[str, Any]]:
+    return [_sweep_solve(facts, r) for r in ratios]
+
+
+def _sweep_solve(f: Dict[str, Any], ratio: float) -> Dict[str, Any]:
+    ctx: SchedulerContext = f["ctx"]
+    plan_df = ctx.plan_df
+    question_date = f["question_date"]
+    target_line = f["target_line"]
+    capa_status: CapacityLedger = f["capa_status"]
+    constraint_info = f["constraint_info"]
+
+    def _sum_qty(moves: List[Dict[str, Any]]) -> int:
+        return sum(int(m.get("qty", 0) or 0) for m in (moves or []))
+
+    current_total = int(f["stock_res"]["total"])
+    target_qty = int(int(ctx.capa_limits[target_line]) * ratio)
+    diff = target_qty - current_total
+    row = {
+        "target_pct": round(ratio * 100, 1),
+        "target_qty": target_qty,
+        "current_qty": current_total,
+        "operation": "감축" if diff < 0 else ("증량" if diff > 0 else "-"),
+        "need_qty": abs(diff),
+    }
+    if diff == 0:
+        row.update({"moved_qty": 0, "achievement": 100.0, "moves": 0, "shortfall": 0})
+        return row
+
+    operation_mode = "increase" if diff > 0 else "reduce"
+    operation_qty = abs(diff)
+
+    cp = capa_status.checkpoint()
+    due_checker = DueCumsumChecker(ctx.due_profile, ctx.plan_index)
+    common = dict(
+        constraint_info=constraint_info,
+        capa_status=capa_status,
+        plan_df=plan_df,
+        target_line=target_line,
+        due_checker=due_checker,
+        ctx=ctx,
+    )
+
+    opt_moves, _ = optimize_moves(
+        constraint_info=constraint_info,
+        capa_status=capa_status,
+        question_date=question_date,
+        target_line=target_line,
+        operation_mode=operation_mode,
+        need_qty=operation_qty,
+        plan_index=ctx.plan_index,
+        calendar=ctx.calendar,
+        due_checker=due_checker,
+        last_due_map=f["last_due_map"],
+        ctx=ctx,
+    )
+    final_moves, _ = step6_validate_ai_strategy(ai_strategy={"moves": opt_moves}, **common)
+
+    remaining = max(0, operation_qty - _sum_qty(final_moves))
+    fb_attempts = 0
+    while remaining > 0 and fb_attempts < 2:
+        fb_attempts += 1
+        sim_cp = capa_status.checkpoint()
+        if operation_mode == "reduce":
+            t6_sameday_used_now = any(
+                x.get("from") == f"{question_date}_{target_line}"
+                and str(x.get("to", "")).startswith(f"{question_date}_")
+                and ("T6" in str(x.get("item", "")).upper())
+                for x in final_moves
+            )
+            fb_moves, _ = python_fallback_reduce(
+                plan_df=plan_df,
+                constraint_info=constraint_info,
+                capa_status=capa_status,
+                question_date=question_date,
+                target_line=target_line,
+                need_reduce=remaining,
+                t6_sameday_already_used=t6_sameday_used_now,
+                calendar=ctx.calendar,
+                due_checker=due_checker,
+                ctx=ctx,
+            )
+        else:
+            fb_moves, _ = python_fallback_increase(
+                plan_df=plan_df,
+                constraint_info=constraint_info,
+                capa_status=capa_status,
+                question_date=question_date,
+                target_line=target_line,
+                need_increase=remaining,
+                plan_index=ctx.plan_index,
+                calendar=ctx.calendar,
+                due_checker=due_checker,
+            )
+        capa_status.rollback(sim_cp)
+        if not fb_moves:
+            break
+        fb_valid, _ = step6_validate_ai_strategy(ai_strategy={"moves": fb_moves}, **common)
+        final_moves.extend(fb_valid)
+        remaining = max(0, operation_qty - _sum_qty(final_moves))
+
+    capa_status.rollback(cp)
+
+    moved = _sum_qty(final_moves)
+    row.update(
+        {
+            "moved_qty": moved,
+            "achievement": round(moved / operation_qty * 100, 1) if operation_qty else 100.0,
+            "moves": len(final_moves),
+            "shortfall": max(0, operation_qty - moved),
+        }
+    )
+    return row
+
+
+def sweep_capa_targets(
+    plan_df: pd.DataFrame,
+    question_date: str,
+    target_line: str,
+    targets: Any = (70, 75, 80, 85, 90),
+    today=None,
+    capa_limits: Optional[Dict[str, int]] = None,
+    max_workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """
+    한 날짜/라인에 대해 여러 CAPA 목표치를 한 번에 평가 (AI 미사용, optimize 엔진)
+    - targets: [70, 75, 80] / [0.7, 0.75] / range(70, 95, 5) 등 (비율/퍼센트 모두 허용)
+    - max_workers: 프로세스 수 (1이면 현재 프로세스에서 순차 실행, None이면 CPU 수)
+    - executor: 호출측이 관리하는 풀 (없으면 모듈 공용 프로세스 풀을 재사용, 여기서 닫지 않음)
+    - 풀을 쓸 수 없으면(프로세스 생성 실패/풀 깨짐/pickle 실패) 순차 실행. 풀이 중 오류는 그대로 올림
+    Returns: (표, 오류 메시지)
+      - 표 columns: target_pct, target_qty, current_qty, operation, need_qty, moved_qty, achievement, moves, shortfall
+    """
+    ratios = [_as_util_ratio(t) for t in targets]
+    if not ratios:
+        return None, "평가할 CAPA 목표치가 없습니다."
+
+    # 1~4단계: 1회만
+    ctx = SchedulerContext.build(plan_df, today=today, capa_limits=capa_limits)
+    plan_df, plan_index = ctx.plan_df, ctx.plan_index
+    stock_res, err = step1_list_current_stock(plan_df, question_date, target_line, plan_index=plan_index)
+    if err:
+        return None, f"[1단계 실패] {err}"
+    items_with_slack = step2_calculate_cumulative_slack(plan_df, stock_res, slack_table=ctx.slack_table)
+    if not items_with_slack:
+        return None, "[2단계 실패] 이동 가능한 품목이 없습니다."
+    capa_status = step3_analyze_destination_capacity(
+        plan_df, question_date, target_line, ctx.capa_limits, plan_index=plan_index, ctx=ctx
+    )
+    constraint_info = step4_prepare_constraint_info(items_with_slack, target_line)
+    if not constraint_info:
+        return None, "[4단계 실패] 이동 가능한 품목(1PLT 이상)이 없습니다."
+
+    facts = {
+        "ctx": ctx,
+        "question_date": question_date,
+        "target_line": target_line,
+        "stock_res": stock_res,
+        "capa_status": capa_status,
+        "constraint_info": constraint_info,
+        "last_due_map": {x["name"]: x.get("last_due") for x in items_with_slack},
+    }
+
+    rows: Optional[List[Dict[str, Any]]] = None
+    if (max_workers != 1 or executor is not None) and len(ratios) > 1:
+        n_chunks = min(len(ratios), max_workers or os.cpu_count() or 1)
+        chunks = [ratios[i::n_chunks] for i in range(n_chunks)]
+        pool = None
+        try:
+            pool = executor if executor is not None else _get_sweep_pool(max_workers)
+            solved = list(pool.map(_sweep_solve_chunk, [facts] * n_chunks, chunks))
+            by_ratio = [None] * len(ratios)
+            for i, chunk_rows in enumerate(solved):
+                by_ratio[i::n_chunks] = chunk_rows
+            rows = by_ratio
+        except (BrokenProcessPool, OSError, pickle.PicklingError):
+            # 프로세스 풀을 못 쓰는 환경이면 순차 실행 (깨진 공용 풀은 버림)
+            if executor is None and isinstance(pool, ProcessPoolExecutor):
+                _drop_sweep_pool(pool)
+            rows = None
+
+    if rows is None:
+        rows = _sweep_solve_chunk(facts, ratios)
+
+    return pd.DataFrame(rows), None
@@ -1,8 +1,14 @@
 # legacy.py
 import re
 import json
+import os
+import random
+import threading
+import time
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from typing import Iterator
 
 
 # =============================================================================
@@ -446,16 +452,74 @@ def fetch_db_data_legacy(user_input: str, supabase):
 # 3) Gemini 응답 생성 (legacy)
 # =============================================================================
 
-def query_gemini_ai_legacy(user_input: str, context: str, gemini_key: str) -> str:
+# 공용 HTTP 클라이언트: Streamlit 세션(스레드) 전체가 keep-alive 커넥션 풀 1개를 공유
+GEMINI_CONNECT_TIMEOUT = 5      # 초: TCP/TLS 연결
+GEMINI_READ_TIMEOUT = 60        # 초: 응답 대기 (LLM 생성 시간)
+GEMINI_MAX_INFLIGHT = 8         # 동시에 나가는 Gemini 요청 상한
+GEMINI_MAX_RETRIES = 3          # 429/5xx/연결 실패 재시도 횟수
+GEMINI_BACKOFF_BASE = 0.5       # 초: 재시도 대기 = random(0, base * 2^n) (full jitter)
+GEMINI_BACKOFF_MAX = 8.0
+
+_GEMINI_SESSION = None
+_GEMINI_SESSION_LOCK = threading.Lock()
+_GEMINI_SEMAPHORE = threading.BoundedSemaphore(GEMINI_MAX_INFLIGHT)
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+# 비워두면 공식 API. 오프라인 테스트는 GEMINI_API_ENDPOINT=http://127.0.0.1:8089 (gemini_standin.py)
+GEMINI_API_ENDPOINT = (os.environ.get("GEMINI_API_ENDPOINT") or "https://generativelanguage.googleapis.com").rstrip("/")
+GEMINI_API_BASE = f"{GEMINI_API_ENDPOINT}/v1beta/models/gemini-2.0-flash-exp"
+
+
+def _get_gemini_session() -> requests.Session:
+    global _GEMINI_SESSION
+    with _GEMINI_SESSION_LOCK:
+        if _GEMINI_SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=GEMINI_MAX_INFLIGHT, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Content-Type": "application/json"})
+            _GEMINI_SESSION = session
+        return _GEMINI_SESSION
+
+
+def _retry_delay(attempt: int, response=None) -> float:
+    """Retry-After(초)가 있으면 따르고, 없으면 지수 백오프 + full jitter"""
+    if response is not None:
+        ra = response.headers.get("Retry-After")
+        if ra:
+            try:
+                return min(float(ra), GEMINI_BACKOFF_MAX)
+            except ValueError:
+                pass
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _post_gemini(url: str, payload: dict) -> requests.Response:
     """
-    app(3).py에서 호출:
-        answer = query_gemini_ai_legacy(prompt, db_result, GENAI_KEY)
+    풀링된 세션으로 POST
+    - 동시 요청은 GEMINI_MAX_INFLIGHT개까지 (재시도 대기 중에는 슬롯 반납)
+    - 429/5xx, 연결 실패/연결 타임아웃만 재시도 (읽기 타임아웃은 재시도 안 함: 이미 60초를 기다렸음)
     """
-    if not gemini_key:
-        # 키가 없으면 그냥 컨텍스트 출력
-        return context
-
-    system_prompt = f"""
+    session = _get_gemini_session()
+    attempt = 0
+    while True:
+        with _GEMINI_SEMAPHORE:
+            try:
+                response = session.post(url, json=payload, timeout=(GEMINI_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT))
+            except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout):
+                if attempt >= GEMINI_MAX_RETRIES:
+                    raise
+                response = None
+
+        if response is not None and (response.status_code not in _RETRY_STATUS or attempt >= GEMINI_MAX_RETRIES):
+            return response
+
+        time.sleep(_retry_delay(attempt, response))
+        attempt += 1
+
+
+def _build_legacy_prompt(user_input: str, context: str) -> str:
+    return f"""
 당신은 숙련된 생산계획 담당자입니다. 제공된 데이터(Context)를 기반으로 사용자의 질문에 답하세요.
 
 [중요: CAPA 초과 답변 규칙]
@@ -482,12 +546,23 @@ Context에 [CODE CASE FOUND]가 있다면:
 {user_input}
 """.strip()
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent?key={gemini_key}"
-    headers = {"Content-Type": "application/json"}
+
+def query_gemini_ai_legacy(user_input: str, context: str, gemini_key: str) -> str:
+    """
+    app(3).py에서 호출:
+        answer = query_gemini_ai_legacy(prompt, db_result, GENAI_KEY)
+    """
+    if not gemini_key:
+        # 키가 없으면 그냥 컨텍스트 출력
+        return context
+
+    system_prompt = _build_legacy_prompt(user_input, context)
+
+    url = f"{GEMINI_API_BASE}:generateContent?key={gemini_key}"
     data = {"contents": [{"parts": [{"text": system_prompt}]}]}
 
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=60)
+        response = _post_gemini(url, data)
         if response.status_code != 200:
             return context
 
@@ -495,3 +570,65 @@ Context에 [CODE CASE FOUND]가 있다면:
         return j["candidates"][0]["content"]["parts"][0]["text"]
     except Exception:
         return context
+
+
+def stream_gemini_ai_legacy(user_input: str, context: str, gemini_key: str) -> Iterator[str]:
+    """
+    query_gemini_ai_legacy의 스트리밍 버전 (SSE streamGenerateContent)
+    - 텍스트 조각을 도착하는 대로 yield → app에서 말풍선을 점진적으로 갱신
+    - 키가 없거나, 첫 조각이 오기 전에 실패하면 컨텍스트를 그대로 1번 yield (기존 동작과 동일)
+    - 첫 조각 전 연결 실패/429/5xx는 _post_gemini와 같은 규칙으로 재시도, 조각을 보낸 뒤 끊기면 중단 안내를 덧붙임
+    - 스트림이 끝날 때까지 동시 요청 슬롯(GEMINI_MAX_INFLIGHT)을 점유
+    """
+    if not gemini_key:
+        yield context
+        return
+
+    url = f"{GEMINI_API_BASE}:streamGenerateContent?alt=sse&key={gemini_key}"
+    data = {"contents": [{"parts": [{"text": _build_legacy_prompt(user_input, context)}]}]}
+    session = _get_gemini_session()
+
+    yielded = False
+    interrupted = False
+    attempt = 0
+    while True:
+        response = None
+        try:
+            with _GEMINI_SEMAPHORE:
+                response = session.post(
+                    url, json=data, stream=True, timeout=(GEMINI_CONNECT_TIMEOUT, GEMINI_READ_TIMEOUT)
+                )
+                if response.status_code == 200:
+                    with response:
+                        for line in response.iter_lines(decode_unicode=True):
+                            if not line or not line.startswith("data:"):
+                                continue
+                            try:
+                                j = json.loads(line[len("data:"):].strip())
+                                parts = j["candidates"][0]["content"]["parts"]
+                            except (ValueError, KeyError, IndexError):
+                                continue
+                            text = "".join(p.get("text", "") for p in parts)
+                            if text:
+                                yielded = True
+                                yield text
+                    break
+                response.close()
+        except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout):
+            # 첫 조각 전 연결 실패는 _post_gemini처럼 재시도, 이미 조각을 보냈으면 이어 받을 수 없음
+            if yielded or attempt >= GEMINI_MAX_RETRIES:
+                interrupted = yielded
+                break
+        except requests.RequestException:
+            interrupted = yielded
+            break
+
+        if response is not None and (response.status_code not in _RETRY_STATUS or attempt >= GEMINI_MAX_RETRIES):
+            break
+        time.sleep(_retry_delay(attempt, response))
+        attempt += 1
+
+    if interrupted:
+        yield "\n\n⚠️ 응답이 중단되었습니다. (네트워크 오류로 답변 일부만 표시)"
+    if not yielded:
+        yield context
@@ -0,0 +1,275 @@
+# optimizer.py
+"""
+hybrid.py 최적화 엔진(mode="optimize")에서 쓰는 범용 풀이 루틴
+- MinCostFlow: 최소 비용 유량 (successive shortest path + SPFA)
+- bounded_knapsack_fill: PLT 묶음 조합으로 목표 수량에 가장 가깝게(이하) 채우는 bounded knapsack DP
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from functools import reduce
+from math import gcd
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 품목 상한 보정 시 품목 1개당 시험해 볼 옵션별 PLT 수 조합 수 (조합마다 그룹 DP 1회)
+ITEM_SPLIT_LIMIT = 64
+
+
+class MinCostFlow:
+    """정수 용량/비용 그래프의 최소 비용 유량. add_edge()가 돌려준 id로 간선별 유량 조회"""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.graph: List[List[int]] = [[] for _ in range(n)]
+        # 간선 e: to[e], cap[e](잔여 용량), cost[e] / 역간선은 e ^ 1
+        self.to: List[int] = []
+        self.cap: List[int] = []
+        self.cost: List[int] = []
+        self.orig_cap: List[int] = []
+
+    def add_edge(self, u: int, v: int, cap: int, cost: int) -> int:
+        eid = len(self.to)
+        self.graph[u].append(eid)
+        self.to.append(v)
+        self.cap.append(int(cap))
+        self.cost.append(int(cost))
+        self.orig_cap.append(int(cap))
+
+        self.graph[v].append(eid + 1)
+        self.to.append(u)
+        self.cap.append(0)
+        self.cost.append(-int(cost))
+        self.orig_cap.append(0)
+        return eid
+
+    def edge_flow(self, eid: int) -> int:
+        return self.orig_cap[eid] - self.cap[eid]
+
+    def flow(self, s: int, t: int, max_flow: int) -> Tuple[int, int]:
+        """s→t로 최대 max_flow만큼, 비용 최소로 흘림. Returns: (유량, 총비용)"""
+        total_flow = 0
+        total_cost = 0
+        inf = float("inf")
+
+        while total_flow < max_flow:
+            dist = [inf] * self.n
+            in_queue = [False] * self.n
+            prev_edge = [-1] * self.n
+            dist[s] = 0
+            q = deque([s])
+            while q:
+                u = q.popleft()
+                in_queue[u] = False
+                for e in self.graph[u]:
+                    if self.cap[e] <= 0:
+                        continue
+                    v = self.to[e]
+                    nd = dist[u] + self.cost[e]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        prev_edge[v] = e
+                        if not in_queue[v]:
+                            in_queue[v] = True
+                            q.append(v)
+
+            if dist[t] == inf:
+                break
+
+            push = max_flow - total_flow
+            v = t
+            while v != s:
+                e = prev_edge[v]
+                push = min(push, self.cap[e])
+                v = self.to[e ^ 1]
+
+            v = t
+            while v != s:
+                e = prev_edge[v]
+                self.cap[e] -= push
+                self.cap[e ^ 1] += push
+                v = self.to[e ^ 1]
+
+            total_flow += push
+            total_cost += push * dist[t]
+
+        return total_flow, total_cost
+
+
+def _reach_bounded(
+    pieces: Sequence[Tuple[int, int, int]], limit: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    0/1 조각(binary splitting) 목록으로 도달 가능한 합(0..limit) 계산
+    - pieces: (옵션 index, 개수, 무게)
+    - via[s] = s에 처음 도달한 조각 번호 (역추적용, 0은 -2, 미도달은 -1)
+    """
+    reach = np.zeros(limit + 1, dtype=bool)
+    via = np.full(limit + 1, -1, dtype=np.int64)
+    reach[0] = True
+    via[0] = -2
+    for p, (_, _, w) in enumerate(pieces):
+        if w <= 0 or w > limit:
+            continue
+        cand = np.zeros_like(reach)
+        cand[w:] = reach[:-w]
+        new = cand & ~reach
+        via[new] = p
+        reach |= new
+    return reach, via
+
+
+def bounded_knapsack_fill(
+    options: Sequence[Tuple],
+    target: int,
+    group_caps: Optional[Dict[Hashable, int]] = None,
+    item_caps: Optional[Dict[Hashable, int]] = None,
+) -> Tuple[int, List[int]]:
+    """
+    PLT 묶음 선택 (bounded knapsack, 목표 이하 최대)
+    - options: (단위 수량 PLT, 최대 PLT 수, 그룹 키[, 품목 키]) / 그룹 = 목적지 슬롯, 같은 그룹 합은 group_caps[그룹] 이하
+      (그룹 키가 None이거나 group_caps에 없으면 상한 없음)
+    - 품목 키 = 출발지(품목, 칸): 여러 목적지로 나뉜 옵션의 합은 item_caps[품목 키] 이하
+    - 옵션 순서가 우선순위: 같은 합이면 앞쪽 옵션/앞쪽 그룹이 먼저 채워짐
+    - 수량은 전체 PLT의 최대공약수 단위로 줄여서 DP (NumPy bool 배열 shift-OR)
+    - 품목 상한은 그룹 DP 위에서 보정: 해가 품목 상한을 넘으면 그 품목의 옵션별 최대 PLT 수를
+      합이 상한 이하인 조합들(이번 해를 앞 옵션부터 유지한 것 + 최대 ITEM_SPLIT_LIMIT개) 중 DP 결과가 가장 큰 것으로 고정하고 다시 풂
+      → 결과는 항상 두 상한을 모두 지킴 (품목 상한이 안 걸리면 기존과 같은 최적해, 걸리면 품목 단위로 순서대로 고정)
+    Returns: (달성 수량, 옵션별 PLT 수)
+    """
+    opts = [(int(o[0]), int(o[1]), o[2]) for o in options]
+    item_keys = [o[3] if len(o) > 3 else None for o in options]
+    item_caps = {k: max(0, int(v)) for k, v in (item_caps or {}).items()}
+
+    for i, key in enumerate(item_keys):
+        unit, cnt, group = opts[i]
+        if key in item_caps and unit > 0:
+            opts[i] = (unit, min(cnt, item_caps[key] // unit), group)
+
+    fixed = set()
+    while True:
+        best, counts = _fill_by_group(opts, target, group_caps)
+        over = None
+        for key, cap in item_caps.items():
+            idxs = [i for i, k in enumerate(item_keys) if k == key]
+            if key not in fixed and sum(opts[i][0] * counts[i] for i in idxs) > cap:
+                over = (key, idxs)
+                break
+        if over is None:
+            return best, counts
+
+        key, idxs = over
+        left = item_caps[key]
+        keep = []
+        for i in idxs:
+            unit = opts[i][0]
+            keep.append(min(counts[i], left // unit) if unit > 0 else 0)
+            left -= keep[-1] * unit
+        splits = [keep] + _item_cap_splits([opts[i][0] for i in idxs], [opts[i][1] for i in idxs], item_caps[key])
+
+        best_opts, best_val = None, -1
+        for split in splits:
+            trial = list(opts)
+            for i, c in zip(idxs, split):
+                trial[i] = (opts[i][0], c, opts[i][2])
+            val, _ = _fill_by_group(trial, target, group_caps)
+            if val > best_val:
+                best_opts, best_val = trial, val
+        opts = best_opts
+        fixed.add(key)
+
+
+def _item_cap_splits(units: List[int], cnts: List[int], cap: int, limit: int = ITEM_SPLIT_LIMIT) -> List[List[int]]:
+    """품목 상한 cap을 옵션별 최대 PLT 수로 나누는 조합 (더 늘릴 수 없는 것만, 앞 옵션이 많은 순, 최대 limit개)"""
+    out: List[List[int]] = []
+    cur: List[int] = []
+
+    def rec(i: int, left: int) -> None:
+        if len(out) >= limit:
+            return
+        if i == len(units):
+            if all(cur[j] >= cnts[j] or units[j] <= 0 or units[j] > left for j in range(len(units))):
+                out.append(list(cur))
+            return
+        hi = min(cnts[i], left // units[i]) if units[i] > 0 else 0
+        for c in range(hi, -1, -1):
+            cur.append(c)
+            rec(i + 1, left - c * units[i])
+            cur.pop()
+
+    rec(0, int(cap))
+    return out
+
+
+def _fill_by_group(
+    options: Sequence[Tuple[int, int, Optional[Hashable]]],
+    target: int,
+    group_caps: Optional[Dict[Hashable, int]] = None,
+) -> Tuple[int, List[int]]:
+    """목적지 그룹 상한만 있는 bounded knapsack (그룹 내부 DP → 그룹 간 합 결합)"""
+    counts = [0] * len(options)
+    units = [int(u) for u, c, _ in options if int(u) > 0 and int(c) > 0]
+    if target <= 0 or not units:
+        return 0, counts
+
+    g = reduce(gcd, units)
+    t = int(target) // g
+    if t <= 0:
+        return 0, counts
+    group_caps = group_caps or {}
+
+    # 그룹별 도달 가능 합 (그룹 내부 bounded knapsack)
+    groups: Dict[Optional[Hashable], List[Tuple[int, int, int]]] = {}
+    for idx, (unit, cnt, key) in enumerate(options):
+        unit, cnt = int(unit), int(cnt)
+        if unit <= 0 or cnt <= 0:
+            continue
+        w = unit // g
+        k = 1
+        while cnt > 0:
+            take = min(k, cnt)
+            groups.setdefault(key, []).append((idx, take, take * w))
+            cnt -= take
+            k *= 2
+
+    group_list = []
+    for key, pieces in groups.items():
+        limit = t
+        if key is not None and key in group_caps:
+            limit = min(t, max(0, int(group_caps[key])) // g)
+        reach, via = _reach_bounded(pieces, limit)
+        group_list.append((pieces, reach, via))
+
+    # 그룹 간 결합 (그룹마다 도달 합 1개 선택)
+    total = np.zeros(t + 1, dtype=bool)
+    total[0] = True
+    choices = []
+    for _, reach, _ in group_list:
+        nxt = total.copy()
+        choice = np.zeros(t + 1, dtype=np.int64)
+        for s in np.flatnonzero(reach)[1:]:
+            s = int(s)
+            cand = np.zeros_like(total)
+            cand[s:] = total[: t + 1 - s]
+            new = cand & ~nxt
+            choice[new] = s
+            nxt |= new
+        choices.append(choice)
+        total = nxt
+
+    best = int(np.flatnonzero(total)[-1])
+
+    # 역추적
+    rest = best
+    for (pieces, _, via), choice in zip(reversed(group_list), reversed(choices)):
+        s = int(choice[rest])
+        rest -= s
+        while s > 0:
+            p = int(via[s])
+            idx, take, w = pieces[p]
+            counts[idx] += take
+            s -= w
+
+    return best * g, counts
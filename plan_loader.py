@@ -0,0 +1,384 @@
+# plan_loader.py
+"""
+Supabase 테이블 페이지 단위 로더
+- select("*") 한 번 execute()는 PostgREST 행 상한(기본 1000)에서 조용히 잘림 → range(start, end) 페이지로 끝까지 받음
+- 첫 페이지에서 count="exact"로 전체 행 수를 받고, 나머지 페이지는 스레드풀로 동시에 요청
+  (서버 행 상한이 page_size보다 작으면 실제 받은 페이지 길이만큼씩 전진, count에 닿을 때까지)
+- 컬럼별 배열을 전체 행 수만큼 미리 잡아두고 도착한 페이지를 제자리에 채움 (페이지 DataFrame concat 없음)
+- 페이지별 행 수 / 바이트(JSON 기준 추정) / 지연(ms)을 stats로 반환
+- Lazy: 보조 데이터(hist_df, product_map, plt_map)를 실제로 읽는 순간에만 로드하는 핸들
+- PlanChunkCache: 생산계획을 날짜(일) 단위 조각으로 캐시 → 요청 구간은 캐시 조각을 이어 붙이고 빈 날짜만 받음
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+PLAN_TABLE = "production_plan_2026_01"
+# hybrid.py가 실제로 읽는 컬럼만
+PLAN_COLUMNS = ("plan_date", "line", "product_name", "qty_0차", "qty_1차", "plt", "is_workday")
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_MAX_WORKERS = 4
+
+# 조정 질문 1건이 보는 구간: 질문 날짜 ±N일
+DEFAULT_WINDOW_DAYS = 10
+
+DEFAULT_CHUNK_TTL_SEC = 600
+DEFAULT_CHUNK_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _page_query(client: Any, table: str, columns: str, filters, order_by, count: Optional[str] = None):
+    q = client.table(table).select(columns, count=count) if count else client.table(table).select(columns)
+    for method, col, val in filters or []:
+        q = getattr(q, method)(col, val)
+    for col in order_by or []:
+        q = q.order(col)
+    return q
+
+
+def _page_stat(page: int, offset: int, data: List[Dict[str, Any]], started: float) -> Dict[str, Any]:
+    return {
+        "page": page,
+        "offset": offset,
+        "rows": len(data),
+        "bytes": len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def fetch_table_paged(
+    client: Any,
+    table: str,
+    columns: Sequence[str] | str = "*",
+    filters: Optional[Sequence[Tuple[str, str, Any]]] = None,
+    order_by: Optional[Sequence[str]] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_page: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    테이블 전체(필터 적용) 로드
+    - filters: [(메서드, 컬럼, 값)] 예) [("gte", "plan_date", "2026-01-01")]
+    - order_by: 페이지 경계가 요청마다 같도록 정렬 기준. 없으면 첫 페이지에 다 안 들어올 때
+      id(없으면 전체 컬럼) 기준으로 정렬해서 다시 받음
+    - on_page: 페이지가 도착할 때마다 stats 1건으로 호출
+    Returns: (DataFrame, 페이지별 stats)
+    """
+    cols = columns if isinstance(columns, str) else ",".join(columns)
+    page_size = max(1, int(page_size))
+    stats: List[Dict[str, Any]] = []
+
+    def _record(st: Dict[str, Any]) -> None:
+        stats.append(st)
+        if on_page is not None:
+            on_page(st)
+
+    # 첫 페이지 + 전체 행 수
+    t0 = time.perf_counter()
+    first = _page_query(client, table, cols, filters, order_by, count="exact").range(0, page_size - 1).execute()
+    first_data = first.data or []
+    _record(_page_stat(0, 0, first_data, t0))
+    total = getattr(first, "count", None)
+
+    # count가 있으면 그것을 믿음: 서버 행 상한(max_rows)이 page_size보다 작으면 첫 페이지가 짧아도 뒤에 행이 더 있음
+    if not first_data or (total is not None and total <= len(first_data)):
+        return pd.DataFrame(first_data), stats
+
+    if not order_by:
+        # 정렬 없이 나눠 받으면 페이지 경계가 요청마다 달라질 수 있음 → 정렬 기준 정해서 처음부터 다시
+        names = list(first_data[0].keys())
+        order_by = ["id"] if "id" in names else names
+        t0 = time.perf_counter()
+        first = _page_query(client, table, cols, filters, order_by, count="exact").range(0, page_size - 1).execute()
+        first_data = first.data or []
+        _record(_page_stat(0, 0, first_data, t0))
+        total = getattr(first, "count", None)
+
+    names = list(first_data[0].keys())
+    # 실제 페이지 길이 (서버 행 상한이 page_size보다 작으면 그만큼씩 잘려 옴)
+    step = len(first_data)
+
+    if total is None:
+        # count를 못 주는 클라이언트: 실제 받은 행 수만큼 전진, 빈 페이지(또는 첫 페이지보다 짧은 페이지)까지 순차 요청
+        rows = list(first_data)
+        page, offset = 1, step
+        while True:
+            t0 = time.perf_counter()
+            data = _page_query(client, table, cols, filters, order_by).range(offset, offset + page_size - 1).execute().data or []
+            _record(_page_stat(page, offset, data, t0))
+            rows.extend(data)
+            if len(data) < step or not data:
+                break
+            page, offset = page + 1, offset + len(data)
+        return pd.DataFrame(rows, columns=names), stats
+
+    # 미리 할당한 컬럼 배열에 페이지를 제자리로 채움
+    total = int(total)
+    arrays = {c: np.empty(total, dtype=object) for c in names}
+    filled = np.zeros(total, dtype=bool)
+
+    def _fill(offset: int, data: List[Dict[str, Any]]) -> None:
+        n = min(len(data), total - offset)
+        if n <= 0:
+            return
+        for c in names:
+            arrays[c][offset:offset + n] = [r.get(c) for r in data[:n]]
+        filled[offset:offset + n] = True
+
+    _fill(0, first_data)
+
+    def _fetch(page: int, offset: int) -> Tuple[int, List[Dict[str, Any]], Dict[str, Any]]:
+        t0 = time.perf_counter()
+        data = _page_query(client, table, cols, filters, order_by).range(offset, offset + page_size - 1).execute().data or []
+        return offset, data, _page_stat(page, offset, data, t0)
+
+    offsets = list(range(step, total, step))
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as pool:
+        futures = [pool.submit(_fetch, i + 1, off) for i, off in enumerate(offsets)]
+        for fut in as_completed(futures):
+            offset, data, st = fut.result()
+            _fill(offset, data)
+            _record(st)
+
+    # 동시 요청 중 짧게 잘린 페이지가 있으면 빈 구간을 실제 받은 길이만큼 전진하며 순차로 메움 (count까지)
+    page = len(offsets) + 1
+    gaps = np.flatnonzero(~filled)
+    while gaps.size:
+        offset, data, st = _fetch(page, int(gaps[0]))
+        _fill(offset, data)
+        _record(st)
+        page += 1
+        if not data:
+            break  # 로드 중 행이 줄어든 경우
+        gaps = gaps[gaps >= offset + len(data)]
+
+    # 로드 중 행이 줄었으면 빈 칸 제외
+    df = pd.DataFrame({c: arrays[c][filled] for c in names}).infer_objects()
+    stats.sort(key=lambda s: (s["offset"], s["page"]))
+    return df, stats
+
+
+def load_production_plan(
+    client: Any,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    table: str = PLAN_TABLE,
+    columns: Sequence[str] = PLAN_COLUMNS,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_page: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """생산계획 로드 (hybrid.py가 쓰는 컬럼만, plan_date 범위 필터, 페이지 동시 요청)"""
+    filters: List[Tuple[str, str, Any]] = []
+    if start_date:
+        filters.append(("gte", "plan_date", start_date))
+    if end_date:
+        filters.append(("lte", "plan_date", end_date))
+    return fetch_table_paged(
+        client,
+        table,
+        columns=columns,
+        filters=filters,
+        order_by=list(columns),
+        page_size=page_size,
+        max_workers=max_workers,
+        on_page=on_page,
+    )
+
+
+def plan_window(target_date: str, days: int = DEFAULT_WINDOW_DAYS) -> Tuple[str, str]:
+    """질문 날짜 ±days일 (start_date, end_date)"""
+    dt = datetime.strptime(target_date, "%Y-%m-%d")
+    return (dt - timedelta(days=days)).strftime("%Y-%m-%d"), (dt + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def add_name_clean(df: pd.DataFrame) -> pd.DataFrame:
+    """product_name 공백 제거본 (name_clean) 컬럼 추가"""
+    df["name_clean"] = df["product_name"].apply(lambda x: re.sub(r"\s+", "", str(x)).strip())
+    return df
+
+
+# ========================================================================
+# 날짜 조각 캐시
+# ========================================================================
+
+class PlanChunkCache:
+    """
+    생산계획 일 단위 조각 캐시 (프로세스 공용, 스레드 안전)
+    - get_window(start, end): 캐시에 있는 날짜는 그대로, 빠진 날짜는 연속 구간별로 1번씩만 로드
+      (1/20 ±10일과 1/21 ±10일 질문이 같은 조각을 공유)
+    - 행이 없는 날짜도 빈 조각으로 저장 (다시 요청하지 않음)
+    - 조각별 TTL, 전체 메모리(바이트) 상한 넘으면 오래 안 쓴 조각부터 제거
+    - prepare: 로드 직후 조각에 적용할 전처리 (예: name_clean 컬럼 추가)
+    - version_fn: 데이터 버전 워터마크 (값이 바뀌면 조각 전체 무효화)
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        table: str = PLAN_TABLE,
+        columns: Sequence[str] = PLAN_COLUMNS,
+        ttl_sec: float = DEFAULT_CHUNK_TTL_SEC,
+        max_bytes: int = DEFAULT_CHUNK_MAX_BYTES,
+        prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+        version_fn: Optional[Callable[[], Any]] = None,
+    ):
+        self.client = client
+        self.table = table
+        self.columns = tuple(columns)
+        self.ttl_sec = float(ttl_sec)
+        self.max_bytes = int(max_bytes)
+        self.prepare = prepare
+        self.version_fn = version_fn
+        self._version: Any = None
+
+        self._lock = threading.Lock()
+        # 날짜 -> (로드 시각, DataFrame, 바이트)
+        self._chunks: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _days(start_date: str, end_date: str) -> List[str]:
+        d0 = datetime.strptime(start_date, "%Y-%m-%d").date()
+        d1 = datetime.strptime(end_date, "%Y-%m-%d").date()
+        return [(d0 + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((d1 - d0).days + 1)]
+
+    def _lookup(self, days: List[str], now: float) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+        found: Dict[str, pd.DataFrame] = {}
+        missing: List[str] = []
+        with self._lock:
+            for d in days:
+                hit = self._chunks.get(d)
+                if hit is not None and now - hit[0] <= self.ttl_sec:
+                    self._chunks.move_to_end(d)
+                    found[d] = hit[1]
+                    self.hits += 1
+                else:
+                    if hit is not None:
+                        self._drop(d)
+                    missing.append(d)
+                    self.misses += 1
+        return found, missing
+
+    def _drop(self, day: str) -> None:
+        _, _, size = self._chunks.pop(day)
+        self._bytes -= size
+
+    def _store(self, day: str, df: pd.DataFrame, now: float) -> None:
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if day in self._chunks:
+                self._drop(day)
+            self._chunks[day] = (now, df, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._chunks) > 1:
+                self._drop(next(iter(self._chunks)))
+
+    @staticmethod
+    def _runs(days: List[str]) -> List[Tuple[str, str]]:
+        """빠진 날짜 → 연속 구간 [(시작, 끝)]"""
+        runs: List[Tuple[str, str]] = []
+        for d in days:
+            if runs:
+                prev = datetime.strptime(runs[-1][1], "%Y-%m-%d").date()
+                if (datetime.strptime(d, "%Y-%m-%d").date() - prev).days == 1:
+                    runs[-1] = (runs[-1][0], d)
+                    continue
+            runs.append((d, d))
+        return runs
+
+    def get_window(self, start_date: str, end_date: str) -> pd.DataFrame:
+        now = time.time()
+        if self.version_fn is not None:
+            version = self.version_fn()
+            if version != self._version:
+                self.clear()
+                self._version = version
+        days = self._days(start_date, end_date)
+        found, missing = self._lookup(days, now)
+
+        for run_start, run_end in self._runs(missing):
+            df, _ = load_production_plan(
+                self.client, start_date=run_start, end_date=run_end, table=self.table, columns=self.columns
+            )
+            if self.prepare is not None and not df.empty:
+                df = self.prepare(df)
+            by_day = dict(tuple(df.groupby(df["plan_date"].astype(str).str[:10], sort=False))) if not df.empty else {}
+            for d in self._days(run_start, run_end):
+                chunk = by_day.get(d)
+                chunk = chunk.reset_index(drop=True) if chunk is not None else df.iloc[0:0]
+                self._store(d, chunk, now)
+                found[d] = chunk
+
+        parts = [found[d] for d in days if not found[d].empty]
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chunks.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "chunks": len(self._chunks),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+class Lazy:
+    """처음 get() 할 때 loader를 한 번만 호출하는 핸들 (스레드 안전). 안 읽으면 네트워크/DataFrame 생성 없음"""
+
+    _UNSET = object()
+
+    def __init__(self, loader: Callable[[], Any]):
+        self._loader = loader
+        self._value = Lazy._UNSET
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not Lazy._UNSET
+
+    def get(self) -> Any:
+        if self._value is Lazy._UNSET:
+            with self._lock:
+                if self._value is Lazy._UNSET:
+                    self._value = self._loader()
+        return self._value
+
+    def __call__(self) -> Any:
+        return self.get()
+
+
+def summarize_page_stats(stats: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """페이지 stats 합계 (rows, bytes, 페이지 수, 최대/합계 지연)"""
+    if not stats:
+        return {"pages": 0, "rows": 0, "bytes": 0, "max_latency_ms": 0.0, "sum_latency_ms": 0.0}
+    return {
+        "pages": len(stats),
+        "rows": sum(s["rows"] for s in stats),
+        "bytes": sum(s["bytes"] for s in stats),
+        "max_latency_ms": max(s["latency_ms"] for s in stats),
+        "sum_latency_ms": round(sum(s["latency_ms"] for s in stats), 1),
+    }
@@ -0,0 +1,88 @@
+# plan_registry.py
+"""
+세션 공용 생산계획 스냅샷 저장소 (버전 기반 무효화)
+- 메시지에는 plan_df 대신 snapshot id만 보관 → 세션 × 질문 수만큼 DataFrame이 쌓이지 않음
+- id = hash(키, 데이터 버전): 같은 구간/같은 버전을 물은 세션들은 같은 스냅샷 1개를 공유
+- 데이터 버전이 바뀌면 이전 버전 스냅샷은 모두 제거, 메모리(바이트)/개수 상한은 오래 안 쓴 것부터 제거
+- 등록된 DataFrame은 공유 객체 → 조회 측은 읽기 전용으로 사용 (groupby 등 새 객체를 만드는 연산만)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+
+DEFAULT_REGISTRY_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_REGISTRY_MAX_ITEMS = 64
+
+
+def plan_snapshot_id(key: str, version: Any) -> str:
+    return hashlib.sha1(f"{key}|{version}".encode("utf-8")).hexdigest()[:16]
+
+
+class PlanSnapshotRegistry:
+    """프로세스 공용 불변 스냅샷 저장소 (스레드 안전)"""
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_REGISTRY_MAX_BYTES,
+        max_items: int = DEFAULT_REGISTRY_MAX_ITEMS,
+    ):
+        self.max_bytes = int(max_bytes)
+        self.max_items = int(max_items)
+        self._lock = threading.Lock()
+        # id -> (버전, DataFrame, 바이트)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._version: Any = None
+
+    def _drop(self, sid: str) -> None:
+        _, _, size = self._entries.pop(sid)
+        self._bytes -= size
+
+    def _advance(self, version: Any) -> None:
+        if version == self._version:
+            return
+        for sid in [k for k, (v, _, _) in self._entries.items() if v != version]:
+            self._drop(sid)
+        self._version = version
+
+    def advance(self, version: Any) -> None:
+        """데이터 버전 갱신: 다른 버전 스냅샷 제거"""
+        with self._lock:
+            self._advance(version)
+
+    def put(self, key: str, plan_df: pd.DataFrame, version: Any) -> str:
+        """스냅샷 등록 (같은 키/버전이 이미 있으면 기존 것 공유). Returns: snapshot id"""
+        sid = plan_snapshot_id(key, version)
+        with self._lock:
+            self._advance(version)
+            if sid in self._entries:
+                self._entries.move_to_end(sid)
+                return sid
+            size = int(plan_df.memory_usage(index=True, deep=True).sum())
+            self._entries[sid] = (version, plan_df, size)
+            self._bytes += size
+            while len(self._entries) > 1 and (self._bytes > self.max_bytes or len(self._entries) > self.max_items):
+                self._drop(next(iter(self._entries)))
+        return sid
+
+    def get(self, sid: Optional[str]) -> Optional[pd.DataFrame]:
+        """스냅샷 조회 (만료/제거됐으면 None)"""
+        if not sid:
+            return None
+        with self._lock:
+            hit = self._entries.get(sid)
+            if hit is None:
+                return None
+            self._entries.move_to_end(sid)
+            return hit[1]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"snapshots": len(self._entries), "bytes": self._bytes, "version": self._version}
@@ -0,0 +1,558 @@
+# service.py
+"""
+헤드리스 스케줄러 서비스 (HTTP/JSON, Streamlit 없이)
+- POST /v1/ask  {"question": "1/21 조립1 80%", "engine": "auto|hybrid|legacy", "mode": "hybrid|optimize",
+                 "today": "2026-01-05", "capa_limits": {"조립1": 3300, ...}}
+  → {"engine", "status", "success", "moves", "sections", "report" | "answer", "timings"}
+  (mode가 hybrid/optimize가 아니거나 capa_limits 값이 양수가 아니면 400, capa_limits에 없는 라인은 서비스 기본값)
+- GET /healthz, GET /v1/stats
+- 계산은 프로세스 풀에서: 워커마다 SnapshotStore(로컬 SQLite) + PlanChunkCache를 1번 만들어 요청 간 유지 (warm 스냅샷)
+- 처리 중+대기 요청 수가 max_pending을 넘으면 바로 503 + Retry-After (큐가 무한정 쌓이지 않음)
+- 질문 라우팅(조정 질문 → hybrid, 그 외 → legacy)은 app과 같은 규칙 (route_question)
+- 접속 정보는 환경변수: SUPABASE_URL, SUPABASE_KEY, GEMINI_API_KEY, SUPABASE_SNAPSHOT_PATH
+  (SUPABASE_FIXTURES_DIR가 있으면 fake_supabase로 로컬 픽스처 조회 + FAKE_SUPABASE_LATENCY/FAKE_SUPABASE_MAX_ROWS,
+   GEMINI_API_ENDPOINT로 Gemini 대역 서버 지정)
+
+실행: python service.py --port 8080 --workers 4 --max-pending 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Manager
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from fake_supabase import fake_from_config
+from hybrid import AI_LATENCY_BUDGET_SEC, DEFAULT_CAPA_LIMITS, ask_professional_scheduler, normalize_plan_df
+from legacy import fetch_db_data_legacy, query_gemini_ai_legacy
+from plan_loader import DEFAULT_WINDOW_DAYS, PLAN_TABLE, PlanChunkCache, add_name_clean, plan_window
+from snapshot_store import DEFAULT_SNAPSHOT_PATH, SnapshotStore
+
+
+DEFAULT_PORT = 8080
+DEFAULT_MAX_PENDING = 32
+DEFAULT_REQUEST_TIMEOUT_SEC = 120.0
+RETRY_AFTER_SEC = 1
+WARM_TIMEOUT_SEC = 120.0
+
+ADJUST_KEYWORDS = ("줄여", "늘려", "추가", "증량", "감량", "생산하고")
+HYBRID_MODES = ("hybrid", "optimize")
+
+
+# ========================================================================
+# 질문 라우팅 (app과 공용)
+# ========================================================================
+def extract_date(text: Optional[str]) -> Optional[str]:
+    """'1/21', '1월 21일', '2026-01-21' → 'YYYY-MM-DD' (월/일만 있으면 2026년)"""
+    if not text:
+        return None
+    patterns = [r"(\d{1,2})/(\d{1,2})", r"(\d{1,2})월\s*(\d{1,2})일", r"(202[56])-(\d{1,2})-(\d{1,2})"]
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            g = match.groups()
+            if len(g) == 2:
+                m, d = g
+                return f"2026-{int(m):02d}-{int(d):02d}"
+            else:
+                y, m, d = g
+                return f"{int(y):04d}-{int(m):02d}-{int(d):02d}"
+    return None
+
+
+def route_question(text: str) -> Tuple[str, Optional[str]]:
+    """
+    Returns: (engine, target_date)
+    - 날짜 + (라인명 / N% / CAPA / 증감 키워드) → "hybrid" (생산계획 조정)
+    - 그 외 → "legacy" (DB 조회 + Gemini 설명)
+    """
+    target_date = extract_date(text)
+    is_adjustment_mode = bool(target_date) and (
+        any(line in text for line in ["조립1", "조립2", "조립3", "조립"])
+        or re.search(r"\d+%", text) is not None
+        or "CAPA" in text.upper()
+        or any(k in text for k in ADJUST_KEYWORDS)
+    )
+    return ("hybrid" if is_adjustment_mode else "legacy"), target_date
+
+
+def split_report_sections(report_md: str) -> Dict[str, str]:
+    """보고서 마크다운을 '## 제목' 단위로 분리 (__FULL__: 전체)"""
+    if not report_md:
+        return {}
+    parts = re.split(r"\n##\s+", report_md.strip())
+    sections = {"__FULL__": report_md.strip()}
+    for p in parts[1:]:
+        lines = p.splitlines()
+        title = lines[0].strip()
+        body = "\n".join(lines[1:]).strip()
+        sections[title] = body
+    return sections
+
+
+def default_today() -> date:
+    return datetime.now(ZoneInfo("Asia/Seoul")).date()
+
+
+def service_config_from_env(**overrides: Any) -> Dict[str, Any]:
+    """워커 초기화 설정 (환경변수 기본값 + overrides)"""
+    config = {
+        "supabase_url": os.environ.get("SUPABASE_URL", ""),
+        "supabase_key": os.environ.get("SUPABASE_KEY", ""),
+        "genai_key": os.environ.get("GEMINI_API_KEY", ""),
+        "snapshot_path": os.environ.get("SUPABASE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH),
+        "fixtures_dir": os.environ.get("SUPABASE_FIXTURES_DIR", ""),
+        "fake_latency": os.environ.get("FAKE_SUPABASE_LATENCY", ""),
+        "fake_max_rows": os.environ.get("FAKE_SUPABASE_MAX_ROWS", ""),
+        "window_days": DEFAULT_WINDOW_DAYS,
+        "ai_latency_budget": AI_LATENCY_BUDGET_SEC,
+        "warm_dates": [],
+    }
+    config.update({k: v for k, v in overrides.items() if v is not None})
+    return config
+
+
+# ========================================================================
+# 워커 프로세스 (요청 간 유지되는 상태)
+# ========================================================================
+_WORKER: Optional[Dict[str, Any]] = None
+
+
+def _make_remote(config: Dict[str, Any]) -> Any:
+    if not (config.get("supabase_url") and config.get("supabase_key")):
+        return None
+    from supabase import create_client
+
+    return create_client(config["supabase_url"], config["supabase_key"])
+
+
+def open_data_client(config: Dict[str, Any]) -> Tuple[Any, Optional[SnapshotStore]]:
+    """
+    (조회용 클라이언트, 로컬 스냅샷) — 스냅샷을 못 만들면 원격 클라이언트 그대로
+    - fixtures_dir가 있으면 픽스처를 적재한 가짜 Supabase (스냅샷 없음, fake_latency/fake_max_rows 적용)
+    """
+    fake = fake_from_config(config.get("fixtures_dir"), config.get("fake_latency"), config.get("fake_max_rows"))
+    if fake is not None:
+        return fake, None
+    remote = _make_remote(config)
+    try:
+        store: Optional[SnapshotStore] = SnapshotStore(path=config["snapshot_path"], remote=remote)
+    except Exception:
+        store = None  # 디스크를 못 쓰는 환경이면 원격 직접 조회
+    return (store.client() if store is not None else remote), store
+
+
+def service_worker_init(config: Dict[str, Any], plan_df: Optional[pd.DataFrame] = None) -> None:
+    """
+    워커 1회 초기화: DB 클라이언트 / 로컬 스냅샷 / plan 조각 캐시 (이후 요청이 재사용)
+    - plan_df: 미리 읽어 둔 정규화 plan (배치 실행용). 주면 질문 구간을 여기서 잘라 씀 (DB 조회 없음)
+    """
+    global _WORKER
+    client, store = open_data_client(config)
+    plan_cache = PlanChunkCache(
+        client,
+        prepare=add_name_clean,
+        version_fn=(lambda: store.version(PLAN_TABLE)) if store is not None else None,
+    )
+    _WORKER = {
+        "client": client,
+        "store": store,
+        "plan_cache": plan_cache,
+        "plan_df": plan_df,
+        "genai_key": config.get("genai_key", ""),
+        "window_days": int(config.get("window_days", DEFAULT_WINDOW_DAYS)),
+        "ai_latency_budget": config.get("ai_latency_budget", AI_LATENCY_BUDGET_SEC),
+        "pid": os.getpid(),
+    }
+    for d in config.get("warm_dates") or []:
+        try:
+            plan_cache.get_window(*plan_window(d, _WORKER["window_days"]))
+        except Exception:
+            pass
+
+
+def service_ping(barrier: Any = None, timeout: float = WARM_TIMEOUT_SEC) -> Dict[str, Any]:
+    """
+    워커 상태 확인. barrier(Manager().Barrier)를 주면 모든 워커가 도착할 때까지 대기
+    → 대기 중인 워커는 다른 ping을 못 받으므로 ping N개가 서로 다른 워커 N개에 하나씩 배정됨
+    """
+    if barrier is not None:
+        try:
+            barrier.wait(timeout)
+        except threading.BrokenBarrierError:
+            pass  # 제한 시간 안에 다 못 모임 → warm()에서 pid 수로 판정
+    w = _WORKER or {}
+    cache = w.get("plan_cache")
+    return {"pid": os.getpid(), "plan_cache": cache.stats() if cache is not None else None}
+
+
+def _ms(t0: float, t1: float) -> float:
+    return round((t1 - t0) * 1000, 1)
+
+
+def _plan_for(target_date: str) -> pd.DataFrame:
+    w = _WORKER
+    start_date, end_date = plan_window(target_date, w["window_days"])
+    base = w["plan_df"]
+    if base is None:
+        return normalize_plan_df(w["plan_cache"].get_window(start_date, end_date))
+    if base.empty:
+        return base
+    dates = base["plan_date"].astype(str)
+    return base[(dates >= start_date) & (dates <= end_date)].reset_index(drop=True)
+
+
+def solve_hybrid(
+    question: str,
+    target_date: str,
+    mode: str,
+    today: Optional[date],
+    capa_limits: Optional[Dict[str, int]],
+) -> Dict[str, Any]:
+    w = _WORKER
+    t0 = time.perf_counter()
+    plan_df = _plan_for(target_date)
+    t1 = time.perf_counter()
+    if plan_df.empty:
+        return {
+            "engine": "hybrid",
+            "question_date": target_date,
+            "status": "[ERROR] 데이터 없음",
+            "success": False,
+            "moves": [],
+            "report": "",
+            "sections": {},
+            "timings": {"load_ms": _ms(t0, t1), "solve_ms": 0.0, "worker_ms": _ms(t0, t1)},
+            "worker": w["pid"],
+        }
+    report, success, _charts, status, moves = ask_professional_scheduler(
+        question=question,
+        plan_df=plan_df,
+        hist_df=None,
+        product_map=None,
+        plt_map=None,
+        question_date=target_date,
+        mode=mode,
+        today=today,
+        capa_limits=capa_limits,
+        genai_key=w["genai_key"],
+        ai_latency_budget=w["ai_latency_budget"],
+    )
+    t2 = time.perf_counter()
+    return {
+        "engine": "hybrid",
+        "question_date": target_date,
+        "status": status,
+        "success": bool(success),
+        "moves": moves or [],
+        "report": report,
+        "sections": split_report_sections(report),
+        "timings": {"load_ms": _ms(t0, t1), "solve_ms": _ms(t1, t2), "worker_ms": _ms(t0, t2)},
+        "worker": w["pid"],
+    }
+
+
+def solve_legacy(question: str) -> Dict[str, Any]:
+    w = _WORKER
+    if w["client"] is None:
+        raise RuntimeError("DB 접속 정보가 없습니다 (SUPABASE_URL / SUPABASE_KEY)")
+    t0 = time.perf_counter()
+    db_result = fetch_db_data_legacy(question, w["client"])
+    t1 = time.perf_counter()
+    failed = "찾을 수 없습니다" in db_result or "오류" in db_result
+    answer = db_result if failed else query_gemini_ai_legacy(question, db_result, w["genai_key"])
+    t2 = time.perf_counter()
+    return {
+        "engine": "legacy",
+        "status": "[WARN] DB 조회 결과 없음/오류" if failed else "[OK]",
+        "success": not failed,
+        "answer": answer,
+        "context": db_result,
+        "timings": {"db_ms": _ms(t0, t1), "ai_ms": _ms(t1, t2), "worker_ms": _ms(t0, t2)},
+        "worker": w["pid"],
+    }
+
+
+# ========================================================================
+# 서비스 (프로세스 풀 + 백프레셔)
+# ========================================================================
+def parse_today(v: Any) -> Optional[date]:
+    if v in (None, ""):
+        return None
+    return datetime.strptime(str(v)[:10], "%Y-%m-%d").date()
+
+
+def parse_capa_limits(v: Any, defaults: Dict[str, int]) -> Dict[str, int]:
+    """요청의 capa_limits({"조립1": 3300, ...}) → 기본값에 덮어쓴 dict. 객체가 아니거나 값이 양수가 아니면 ValueError"""
+    limits = dict(defaults)
+    if v in (None, ""):
+        return limits
+    if not isinstance(v, dict):
+        raise ValueError("capa_limits는 {라인: 숫자} 객체여야 합니다.")
+    for line, cap in v.items():
+        if isinstance(cap, bool) or not isinstance(cap, (int, float, str)):
+            raise ValueError(f"capa_limits[{line}]가 숫자가 아닙니다.")
+        try:
+            cap = float(cap)
+        except ValueError:
+            raise ValueError(f"capa_limits[{line}]가 숫자가 아닙니다.") from None
+        if not cap > 0 or cap == float("inf"):
+            raise ValueError(f"capa_limits[{line}]는 0보다 큰 숫자여야 합니다.")
+        limits[str(line)] = int(cap)
+    return limits
+
+
+def json_default(v: Any) -> Any:
+    if hasattr(v, "item"):  # numpy 스칼라
+        return v.item()
+    if isinstance(v, (date, datetime)):
+        return v.isoformat()
+    return str(v)
+
+
+class SchedulerService:
+    """
+    엔진 실행기 (스레드 안전)
+    - ask(payload) → (HTTP 상태 코드, 응답 dict)
+    - 자리(max_pending)는 작업이 실제로 끝날 때 반납 → 타임아웃 응답 후에도 계산 중인 작업은 자리를 계속 차지
+    """
+
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        max_workers: Optional[int] = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT_SEC,
+        today: Optional[date] = None,
+        capa_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.config = config if config is not None else service_config_from_env()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = int(max_pending)
+        self.request_timeout = float(request_timeout)
+        self.today = today
+        self.capa_limits = dict(capa_limits or DEFAULT_CAPA_LIMITS)
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=service_worker_init, initargs=(self.config,)
+        )
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._counts = {"ok": 0, "rejected": 0, "timeout": 0, "error": 0, "bad_request": 0}
+        self._latency_ms: List[float] = []
+
+    def warm(self, timeout: float = WARM_TIMEOUT_SEC) -> List[Dict[str, Any]]:
+        """
+        워커를 미리 띄워 초기화(스냅샷/조각 캐시 적재)까지 끝내둠
+        - ping마다 공용 barrier에서 대기 → 워커 max_workers개가 모두 떠서 각자 ping 1개씩 처리
+        - 서로 다른 pid가 max_workers개가 아니면 RuntimeError
+        """
+        with Manager() as manager:
+            barrier = manager.Barrier(self.max_workers)
+            futures = [self._pool.submit(service_ping, barrier, timeout) for _ in range(self.max_workers)]
+            pings = [f.result() for f in futures]
+        pids = {p["pid"] for p in pings}
+        if len(pids) != self.max_workers:
+            raise RuntimeError(f"워커 초기화 실패: {self.max_workers}개 중 {len(pids)}개만 응답 (pid {sorted(pids)})")
+        return pings
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _release(self, _future: Any = None) -> None:
+        with self._lock:
+            self._inflight -= 1
+        self._slots.release()
+
+    def ask(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        question = str(payload.get("question") or "").strip()
+        if not question:
+            self._count("bad_request")
+            return 400, {"error": "question이 비어 있습니다."}
+
+        engine, target_date = route_question(question)
+        requested = str(payload.get("engine") or "auto")
+        if requested in ("hybrid", "legacy"):
+            engine = requested
+        if engine == "hybrid" and not target_date:
+            self._count("bad_request")
+            return 400, {"error": "생산계획 조정 질문에는 날짜가 필요합니다. (예: '1/21 조립1 80%')"}
+        try:
+            today = parse_today(payload.get("today")) or self.today or default_today()
+        except ValueError:
+            self._count("bad_request")
+            return 400, {"error": "today는 YYYY-MM-DD 형식이어야 합니다."}
+        mode = str(payload.get("mode") or "hybrid")
+        if mode not in HYBRID_MODES:
+            self._count("bad_request")
+            return 400, {"error": f"mode는 {' / '.join(HYBRID_MODES)} 중 하나여야 합니다. (요청: {mode})"}
+        try:
+            capa_limits = parse_capa_limits(payload.get("capa_limits"), self.capa_limits)
+        except ValueError as e:
+            self._count("bad_request")
+            return 400, {"error": str(e)}
+
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            return 503, {"error": "요청이 많습니다. 잠시 후 다시 시도하세요.", "retry_after": RETRY_AFTER_SEC}
+        with self._lock:
+            self._inflight += 1
+
+        t0 = time.perf_counter()
+        try:
+            if engine == "hybrid":
+                future = self._pool.submit(
+                    solve_hybrid,
+                    question,
+                    target_date,
+                    mode,
+                    today,
+                    capa_limits,
+                )
+            else:
+                future = self._pool.submit(solve_legacy, question)
+        except Exception as e:
+            self._release()
+            self._count("error")
+            return 500, {"error": str(e)}
+        future.add_done_callback(self._release)
+
+        try:
+            result = future.result(timeout=self.request_timeout)
+        except FutureTimeout:
+            future.cancel()
+            self._count("timeout")
+            return 504, {"error": f"{self.request_timeout:.0f}초 안에 끝나지 않았습니다."}
+        except Exception as e:
+            self._count("error")
+            return 500, {"error": str(e)}
+
+        total_ms = _ms(t0, time.perf_counter())
+        result["timings"]["queue_ms"] = round(max(0.0, total_ms - result["timings"]["worker_ms"]), 1)
+        result["timings"]["total_ms"] = total_ms
+        with self._lock:
+            self._counts["ok"] += 1
+            self._latency_ms.append(total_ms)
+            if len(self._latency_ms) > 4096:
+                del self._latency_ms[:2048]
+        return 200, result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lat = sorted(self._latency_ms)
+            inflight = self._inflight
+            counts = dict(self._counts)
+
+        def pct(p: float) -> float:
+            return lat[min(len(lat) - 1, int(len(lat) * p))] if lat else 0.0
+
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "inflight": inflight,
+            "counts": counts,
+            "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "max": lat[-1] if lat else 0.0},
+        }
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ========================================================================
+# HTTP
+# ========================================================================
+class _Handler(BaseHTTPRequestHandler):
+    service: SchedulerService = None  # make_server에서 지정
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, code: int, body: Dict[str, Any]) -> None:
+        raw = json.dumps(body, ensure_ascii=False, default=json_default).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        if code == 503:
+            self.send_header("Retry-After", str(RETRY_AFTER_SEC))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self) -> None:
+        if self.path == "/healthz":
+            s = self.service.stats()
+            self._send(200, {"ok": True, "inflight": s["inflight"], "max_pending": s["max_pending"]})
+        elif self.path == "/v1/stats":
+            self._send(200, self.service.stats())
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path != "/v1/ask":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("JSON 객체가 아닙니다.")
+        except ValueError as e:
+            self._send(400, {"error": f"요청 본문 오류: {e}"})
+            return
+        code, body = self.service.ask(payload)
+        self._send(code, body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # 요청마다 stderr 로그 안 남김 (stats로 확인)
+
+
+def make_server(service: SchedulerService, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type("SchedulerHandler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="헤드리스 스케줄러 서비스 (HTTP/JSON)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--workers", type=int, default=None, help="엔진 프로세스 수 (기본: CPU 수)")
+    ap.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, help="처리 중+대기 요청 상한 (초과 시 503)")
+    ap.add_argument("--timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT_SEC, help="요청당 응답 제한 시간(초)")
+    ap.add_argument("--today", default=None, help="기준일 YYYY-MM-DD (기본: 오늘, 요청의 today가 우선)")
+    ap.add_argument("--warm", action="append", default=[], help="워커 시작 시 미리 적재할 질문 날짜 (반복 가능)")
+    args = ap.parse_args(argv)
+
+    service = SchedulerService(
+        config=service_config_from_env(warm_dates=args.warm),
+        max_workers=args.workers,
+        max_pending=args.max_pending,
+        request_timeout=args.timeout,
+        today=parse_today(args.today),
+    )
+    service.warm()
+    server = make_server(service, args.host, args.port)
+    print(f"scheduler service: http://{args.host}:{args.port} (workers={service.max_workers}, max_pending={service.max_pending})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
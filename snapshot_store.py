@@ -0,0 +1,461 @@
+# snapshot_store.py
+"""
+Supabase 테이블 로컬 스냅샷 (SQLite 파일, mmap 읽기)
+- 테이블별 워터마크(updated_at 또는 plan_date/날짜/date)로 증분 동기화 → Supabase에는 변경분만 요청
+  - updated_at: updated_at > 워터마크 행만 받아서 키(id) 기준 교체
+  - 날짜형: 날짜 >= 워터마크 행을 받아서 그 구간만 교체 (마지막 날짜 구간은 매번 다시 받음)
+  - version(): 교체 전후 내용 해시가 다를 때만 증가 → 같은 구간을 다시 받아도 캐시/스냅샷이 무효화되지 않음
+  - 워터마크 컬럼이 없으면 동기화 주기마다 전체 교체
+  - 워터마크 이전 구간은 증분으로 안 보임 → 매 동기화마다 원격/로컬 행 수(count)를 비교해 다르면(원격 삭제·과거 날짜 추가)
+    전체 교체, 행 수가 같은 수정(과거 날짜 값 변경)은 full_sync_interval마다 전체 교체로 반영
+- 원격 조회는 plan_loader.fetch_table_paged (PostgREST 행 상한에서 잘리지 않게 페이지 단위)
+- client(): supabase 클라이언트와 같은 모양의 쿼리 빌더(table().select().eq()...execute().data)
+  → app의 fetch_data / legacy.fetch_db_data_legacy가 코드 변경 없이 로컬에서 조회
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from plan_loader import fetch_table_paged
+
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(".cache", "supabase_snapshot.sqlite3")
+DEFAULT_SYNC_INTERVAL_SEC = 60
+DEFAULT_FULL_SYNC_INTERVAL_SEC = 600
+MMAP_BYTES = 256 * 1024 * 1024
+
+# 워터마크 후보 (앞쪽 우선). updated_at류는 "초과", 날짜류는 "이상"으로 증분 조회
+TIMESTAMP_WATERMARKS = ("updated_at",)
+DATE_WATERMARKS = ("plan_date", "날짜", "date")
+KEY_CANDIDATES = ("id",)
+
+
+def _q(name: str) -> str:
+    """SQLite 식별자 인용 (한글/공백 컬럼명 대응)"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _to_storable(df: pd.DataFrame) -> pd.DataFrame:
+    """dict/list 값은 JSON 문자열로 (SQLite 컬럼에 그대로 못 넣음)"""
+    out = df.copy()
+    for c in out.columns:
+        if out[c].dtype == object and out[c].map(lambda v: isinstance(v, (dict, list))).any():
+            out[c] = out[c].map(lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v)
+    return out
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """supabase 응답과 같은 형태: NaN → None"""
+    if df.empty:
+        return []
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _frame_digest(df: pd.DataFrame) -> str:
+    """행 순서/컬럼 순서와 무관한 내용 해시 (같은 SQLite에서 읽은 프레임끼리 비교용)"""
+    if df.empty:
+        return "empty:" + ",".join(sorted(map(str, df.columns)))
+    cols = sorted(df.columns, key=str)
+    row_hashes = pd.util.hash_pandas_object(df[cols].astype(str), index=False).to_numpy()
+    h = hashlib.sha1(",".join(map(str, cols)).encode("utf-8"))
+    h.update(sorted(row_hashes).__repr__().encode("ascii"))
+    return h.hexdigest()
+
+
+class SnapshotStore:
+    """로컬 스냅샷 저장소. remote(supabase Client)가 있으면 client()로 조회할 때 오래된 테이블만 증분 동기화"""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_SNAPSHOT_PATH,
+        remote: Any = None,
+        min_sync_interval: float = DEFAULT_SYNC_INTERVAL_SEC,
+        full_sync_interval: Optional[float] = DEFAULT_FULL_SYNC_INTERVAL_SEC,
+    ):
+        self.path = path
+        self.remote = remote
+        self.min_sync_interval = float(min_sync_interval)
+        # 증분 동기화로는 안 보이는 과거 구간 수정까지 반영하는 전체 교체 주기 (None이면 끔)
+        self.full_sync_interval = None if full_sync_interval is None else float(full_sync_interval)
+        self._lock = threading.RLock()
+        # 테이블별 데이터 버전 (이 프로세스에서 행 내용이 실제로 바뀔 때만 +1)
+        self._versions: Dict[str, int] = {}
+
+        if path != ":memory:":
+            d = os.path.dirname(path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS _snapshot_meta ("
+            " name TEXT PRIMARY KEY, wm_col TEXT, key_col TEXT, watermark TEXT, synced_at REAL, full_synced_at REAL)"
+        )
+        if "full_synced_at" not in [r[1] for r in self._conn.execute("PRAGMA table_info(_snapshot_meta)")]:
+            self._conn.execute("ALTER TABLE _snapshot_meta ADD COLUMN full_synced_at REAL")  # 이전 스냅샷 파일
+        self._conn.commit()
+
+    # -------------------------------
+    # 메타
+    # -------------------------------
+    def _meta(self, table: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT wm_col, key_col, watermark, synced_at, full_synced_at FROM _snapshot_meta WHERE name = ?", (table,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"wm_col": row[0], "key_col": row[1], "watermark": row[2], "synced_at": row[3], "full_synced_at": row[4]}
+
+    def _set_meta(
+        self, table: str, wm_col: Optional[str], key_col: Optional[str], watermark: Optional[str], full: bool = False
+    ) -> None:
+        """full=True(전체 교체)일 때만 full_synced_at 갱신, 증분이면 기존 값 유지"""
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO _snapshot_meta(name, wm_col, key_col, watermark, synced_at, full_synced_at)"
+            " VALUES (?, ?, ?, ?, ?, COALESCE(?, (SELECT full_synced_at FROM _snapshot_meta WHERE name = ?)))",
+            (table, wm_col, key_col, watermark, now, now if full else None, table),
+        )
+
+    def version(self, table: str) -> int:
+        """데이터 버전 워터마크: 동기화로 행 내용이 바뀔 때만 증가 (캐시/스냅샷 무효화 기준)"""
+        return self._versions.get(table, 0)
+
+    def _digest(self, table: str, where: str = "", params: Sequence[Any] = ()) -> Optional[str]:
+        """로컬 테이블(또는 where 구간)의 내용 해시. 테이블이 없으면 None"""
+        if not self.columns(table):
+            return None
+        return _frame_digest(pd.read_sql_query(f"SELECT * FROM {_q(table)}{where}", self._conn, params=list(params)))
+
+    def _bump_if_changed(self, table: str, before: Optional[str], after: Optional[str]) -> None:
+        if before is None or before != after:
+            self._versions[table] = self._versions.get(table, 0) + 1
+
+    def has_table(self, table: str) -> bool:
+        return self._meta(table) is not None
+
+    def columns(self, table: str) -> List[str]:
+        return [r[1] for r in self._conn.execute(f"PRAGMA table_info({_q(table)})")]
+
+    # -------------------------------
+    # 적재
+    # -------------------------------
+    def load_frame(
+        self,
+        table: str,
+        df: pd.DataFrame,
+        wm_col: Optional[str] = None,
+        key_col: Optional[str] = None,
+    ) -> None:
+        """테이블 전체 교체 (전체 동기화/초기 적재용). wm_col/key_col을 안 주면 컬럼명으로 추정"""
+        cols = list(df.columns)
+        if wm_col is None:
+            wm_col = next((c for c in TIMESTAMP_WATERMARKS + DATE_WATERMARKS if c in cols), None)
+        if key_col is None:
+            key_col = next((c for c in KEY_CANDIDATES if c in cols), None)
+
+        watermark = None
+        if wm_col and not df.empty:
+            watermark = str(df[wm_col].dropna().astype(str).max()) if df[wm_col].notna().any() else None
+
+        with self._lock:
+            before = self._digest(table) if table in self._versions else None
+            self._conn.execute(f"DROP TABLE IF EXISTS {_q(table)}")
+            if cols:
+                _to_storable(df).to_sql(table, self._conn, index=False)
+                if wm_col:
+                    self._conn.execute(f"CREATE INDEX IF NOT EXISTS {_q('idx_' + table + '_wm')} ON {_q(table)}({_q(wm_col)})")
+            self._set_meta(table, wm_col, key_col, watermark, full=True)
+            self._conn.commit()
+            # 주기적 전체 교체로 같은 내용을 다시 받은 경우는 버전 유지 (캐시 무효화 안 함)
+            self._bump_if_changed(table, before, self._digest(table))
+
+    def create_index(self, table: str, columns: Sequence[str]) -> bool:
+        """조회 필터용 보조 인덱스 (컬럼이 없으면 만들지 않음). Returns: 생성 여부"""
+        cols = [c for c in columns if c in self.columns(table)]
+        if not cols or len(cols) != len(columns):
+            return False
+        name = "idx_" + table + "_" + "_".join(cols)
+        with self._lock:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {_q(name)} ON {_q(table)}({', '.join(_q(c) for c in cols)})")
+            self._conn.commit()
+        return True
+
+    def _apply_delta(self, table: str, meta: Dict[str, Any], df: pd.DataFrame) -> None:
+        wm_col, key_col, watermark = meta["wm_col"], meta["key_col"], meta["watermark"]
+        if not set(df.columns).issubset(set(self.columns(table))):
+            raise ValueError("스키마 변경")  # 새 컬럼 → 호출 측에서 전체 동기화
+
+        before = after = None
+        if wm_col in TIMESTAMP_WATERMARKS and key_col:
+            # updated_at이 워터마크를 넘은 행만 옴 → 받은 행은 실제 변경분
+            keys = [(k,) for k in df[key_col].dropna().tolist()]
+            self._conn.executemany(f"DELETE FROM {_q(table)} WHERE {_q(key_col)} = ?", keys)
+            _to_storable(df).to_sql(table, self._conn, index=False, if_exists="append")
+        else:
+            # 날짜형은 마지막 날짜 구간을 매번 다시 받음 → 교체 전후 구간 해시가 같으면 버전 유지
+            where = f" WHERE {_q(wm_col)} >= ?"
+            before = self._digest(table, where, (watermark,))
+            self._conn.execute(f"DELETE FROM {_q(table)}{where}", (watermark,))
+            _to_storable(df).to_sql(table, self._conn, index=False, if_exists="append")
+            after = self._digest(table, where, (watermark,))
+
+        new_wm = str(df[wm_col].dropna().astype(str).max()) if df[wm_col].notna().any() else watermark
+        self._set_meta(table, wm_col, key_col, max(watermark or "", new_wm or "") or None)
+        self._bump_if_changed(table, before, after)
+
+    # -------------------------------
+    # 동기화
+    # -------------------------------
+    def _full_sync_due(self, meta: Dict[str, Any]) -> bool:
+        if self.full_sync_interval is None:
+            return False
+        return time.time() - (meta["full_synced_at"] or 0) >= self.full_sync_interval
+
+    def _head_matches(self, table: str, meta: Dict[str, Any]) -> bool:
+        """
+        증분으로 다시 받지 않는 구간(날짜형: 워터마크 미만, updated_at: 워터마크 이하)의 행 수가 원격과 같은지
+        - 다르면 원격에서 행이 지워졌거나 과거 구간에 추가된 것 → 전체 교체 필요
+        - count를 못 주는 원격이면 판단 불가 → True (주기적 전체 교체에 맡김)
+        """
+        wm_col, watermark = meta["wm_col"], meta["watermark"]
+        op, sql_op = ("lte", "<=") if wm_col in TIMESTAMP_WATERMARKS else ("lt", "<")
+        res = getattr(self.remote.table(table).select(wm_col, count="exact"), op)(wm_col, watermark).range(0, 0).execute()
+        remote_n = getattr(res, "count", None)
+        if remote_n is None:
+            return True
+        local_n = self._conn.execute(
+            f"SELECT COUNT(*) FROM {_q(table)} WHERE {_q(wm_col)} {sql_op} ?", (watermark,)
+        ).fetchone()[0]
+        return int(remote_n) == int(local_n)
+
+    def sync(self, table: str, force: bool = False) -> int:
+        """원격에서 변경분만 받아 반영. Returns: 받은 행 수 (주기 안이면 0)"""
+        if self.remote is None:
+            return 0
+        with self._lock:
+            meta = self._meta(table)
+            if meta and not force and time.time() - (meta["synced_at"] or 0) < self.min_sync_interval:
+                return 0
+
+            if (
+                meta is None
+                or not meta["wm_col"]
+                or not meta["watermark"]
+                or self._full_sync_due(meta)
+                or not self._head_matches(table, meta)
+            ):
+                df, _ = fetch_table_paged(self.remote, table)
+                self.load_frame(table, df)
+                return len(df)
+
+            op = "gt" if meta["wm_col"] in TIMESTAMP_WATERMARKS else "gte"
+            order_by = [meta["key_col"]] if meta["key_col"] else None
+            df, _ = fetch_table_paged(
+                self.remote, table, filters=[(op, meta["wm_col"], meta["watermark"])], order_by=order_by
+            )
+
+            if df.empty:
+                self._set_meta(table, meta["wm_col"], meta["key_col"], meta["watermark"])
+                self._conn.commit()
+                return 0
+
+            try:
+                self._apply_delta(table, meta, df)
+                self._conn.commit()
+            except Exception:
+                # 스키마가 바뀌었으면 메타를 지우고 전체 동기화
+                self._conn.rollback()
+                self._conn.execute("DELETE FROM _snapshot_meta WHERE name = ?", (table,))
+                self._conn.commit()
+                return self.sync(table, force=True)
+            return len(df)
+
+    # -------------------------------
+    # 조회
+    # -------------------------------
+    def query(self, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=list(params))
+
+    def read(
+        self,
+        table: str,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Sequence[Tuple[str, str, Any]]] = None,
+        limit: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        로컬 조회 (필요한 컬럼만)
+        - filters: [(컬럼, 연산자, 값)], 연산자: = != > >= < <= in like
+        """
+        q = LocalQuery(self, table, sync=False).select(",".join(columns) if columns else "*")
+        for col, op, val in filters or []:
+            q._add(col, op, val)
+        if limit is not None:
+            q = q.limit(limit)
+        return q.to_frame()
+
+    def client(self) -> "LocalClient":
+        return LocalClient(self)
+
+
+# ========================================================================
+# supabase-py 호환 쿼리 빌더 (이 저장소에서 쓰는 메서드만)
+# ========================================================================
+
+class LocalResult:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class LocalQuery:
+    _OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+    def __init__(self, store: SnapshotStore, table: str, sync: bool = True):
+        self.store = store
+        self.table_name = table
+        self._sync = sync
+        self._columns = "*"
+        self._count: Optional[str] = None
+        self._where: List[Tuple[str, List[Any]]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+
+    def _add(self, col: str, op: str, val: Any) -> "LocalQuery":
+        op = op.lower()
+        if op == "in":
+            vals = list(val)
+            if not vals:
+                self._where.append(("0", []))
+            else:
+                self._where.append((f"{_q(col)} IN ({','.join('?' * len(vals))})", vals))
+        elif op in ("like", "ilike"):
+            # SQLite LIKE는 ASCII 대소문자 무시 (ilike와 동일하게 동작)
+            self._where.append((f"{_q(col)} LIKE ?", [val]))
+        else:
+            self._where.append((f"{_q(col)} {op} ?", [val]))
+        return self
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "LocalQuery":
+        self._columns = columns
+        self._count = count
+        return self
+
+    def eq(self, col: str, val: Any) -> "LocalQuery":
+        return self._add(col, "=", val)
+
+    def neq(self, col: str, val: Any) -> "LocalQuery":
+        return self._add(col, "!=", val)
+
+    def gt(self, col: str, val: Any) -> "LocalQuery":
+        return self._add(col, ">", val)
+
+    def gte(self, col: str, val: Any) -> "LocalQuery":
+        return self._add(col, ">=", val)
+
+    def lt(self, col: str, val: Any) -> "LocalQuery":
+        return self._add(col, "<", val)
+
+    def lte(self, col: str, val: Any) -> "LocalQuery":
+        return self._add(col, "<=", val)
+
+    def in_(self, col: str, vals: Sequence[Any]) -> "LocalQuery":
+        return self._add(col, "in", vals)
+
+    def like(self, col: str, pattern: str) -> "LocalQuery":
+        return self._add(col, "like", pattern)
+
+    def ilike(self, col: str, pattern: str) -> "LocalQuery":
+        return self._add(col, "ilike", pattern)
+
+    def or_(self, expr: str) -> "LocalQuery":
+        """PostgREST or 필터: 'col.op.value,col.op.value' (op: eq/neq/gt/gte/lt/lte/like/ilike)"""
+        parts, params = [], []
+        for cond in expr.split(","):
+            col, op, val = cond.split(".", 2)
+            if op in ("like", "ilike"):
+                parts.append(f"{_q(col)} LIKE ?")
+                params.append(val.replace("*", "%"))
+            else:
+                parts.append(f"{_q(col)} {self._OPS[op]} ?")
+                params.append(val)
+        self._where.append(("(" + " OR ".join(parts) + ")", params))
+        return self
+
+    def order(self, col: str, desc: bool = False) -> "LocalQuery":
+        self._order.append(f"{_q(col)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, n: int) -> "LocalQuery":
+        self._limit = int(n)
+        return self
+
+    def range(self, start: int, end: int) -> "LocalQuery":
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    def _where_sql(self) -> Tuple[str, List[Any]]:
+        if not self._where:
+            return "", []
+        params: List[Any] = []
+        for _, p in self._where:
+            params.extend(p)
+        return " WHERE " + " AND ".join(w for w, _ in self._where), params
+
+    def _sql(self) -> Tuple[str, List[Any]]:
+        cols = "*"
+        if self._columns and self._columns.strip() != "*":
+            cols = ", ".join(_q(c.strip()) for c in self._columns.split(",") if c.strip())
+        where, params = self._where_sql()
+        sql = f"SELECT {cols} FROM {_q(self.table_name)}{where}"
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None:
+            sql += f" LIMIT {self._limit} OFFSET {self._offset}"
+        return sql, params
+
+    def to_frame(self) -> pd.DataFrame:
+        if self._sync:
+            try:
+                self.store.sync(self.table_name)
+            except Exception:
+                # 원격 장애 시 로컬에 받아둔 스냅샷이 있으면 그대로 사용
+                if not self.store.has_table(self.table_name):
+                    raise
+        if not self.store.columns(self.table_name):
+            return pd.DataFrame()
+        sql, params = self._sql()
+        return self.store.query(sql, params)
+
+    def execute(self) -> LocalResult:
+        df = self.to_frame()
+        count = None
+        if self._count and self.store.columns(self.table_name):
+            where, params = self._where_sql()
+            count = int(self.store.query(f"SELECT COUNT(*) AS n FROM {_q(self.table_name)}{where}", params)["n"].iloc[0])
+        return LocalResult(_records(df), count=count)
+
+
+class LocalClient:
+    """supabase Client 대용: table(name)만 제공 (조회 전 오래된 테이블은 증분 동기화)"""
+
+    def __init__(self, store: SnapshotStore):
+        self.store = store
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self.store, name)
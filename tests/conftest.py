@@ -0,0 +1,8 @@
+# tests/conftest.py
+# 저장소 루트의 평면 모듈(hybrid, plan_loader, ...)을 그대로 import 하도록 경로 추가
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
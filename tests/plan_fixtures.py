@@ -0,0 +1,114 @@
+# tests/plan_fixtures.py
+# 테스트용 시드 생산계획 + 엔진 결과 불변식 검사 (출발지 음수 / 누적 납기 / 목적지 CAPA / T6 같은날 1회)
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Sequence
+
+import pandas as pd
+
+LINES = ("조립1", "조립2", "조립3")
+KINDS = ("T6", "A2XX", "J9", "BERG")
+
+
+def make_plan(seed: int = 1, n_days: int = 31, per_line: int = 4) -> pd.DataFrame:
+    """라인마다 per_line개 품목 (T6/A2XX/J9/BERG 섞음), 평일만 생산. 품목명 예: 'T6 조립2-P0'"""
+    rnd = random.Random(seed)
+    prods = []
+    for line in LINES:
+        for i in range(per_line):
+            kind = KINDS[(i + LINES.index(line)) % len(KINDS)]
+            if kind == "A2XX" and line == "조립3":
+                kind = "J9"
+            prods.append((f"{kind} {line}-P{i}", line, rnd.choice([30, 60, 100, 120, 150])))
+    rows = []
+    for d in range(n_days):
+        dt = date(2026, 1, 1) + timedelta(days=d)
+        wd = dt.weekday() < 5
+        for name, line, plt in prods:
+            q0 = plt * rnd.randint(0, 6) if wd else 0
+            q1 = max(0, q0 + plt * rnd.choice([-1, 0, 0, 1, 2])) if wd else 0
+            rows.append({"plan_date": dt.strftime("%Y-%m-%d"), "line": line, "product_name": name,
+                         "qty_0차": q0, "qty_1차": q1, "plt": plt, "is_workday": wd})
+    return pd.DataFrame(rows)
+
+
+def question_date(question: str) -> str:
+    m, d = question.split()[0].split("/")
+    return f"2026-{int(m):02d}-{int(d):02d}"
+
+
+def _split_slot(s: str):
+    d, ln = str(s).rsplit("_", 1)
+    return d[:10], ln
+
+
+def invariant_violations(
+    plan_df: pd.DataFrame,
+    moves: List[Dict[str, Any]],
+    capa_limits: Dict[str, int],
+    checks: Sequence[str] = ("source", "due", "capa", "t6"),
+) -> List[str]:
+    """
+    승인된 이동을 plan에 적용했을 때 깨지는 불변식 목록 (비어 있으면 정상)
+    - 출발지 (품목, 날짜, 라인) 수량 음수 금지
+    - 품목별 누적 납기(cumsum 1차 >= cumsum 0차): 이동 전에 지켜지던 품목은 이동 후에도 유지
+    - 순유입이 있는 (날짜, 라인) 합계는 CAPA 이하
+    - T6 같은날 타라인 이송은 전체 1건 이하
+    """
+    qty = defaultdict(int)
+    due = defaultdict(int)
+    line_total = defaultdict(int)
+    for r in plan_df.itertuples(index=False):
+        qty[(r.product_name, str(r.plan_date)[:10], r.line)] += int(r.qty_1차)
+        line_total[(str(r.plan_date)[:10], r.line)] += int(r.qty_1차)
+        due[(r.product_name, str(r.plan_date)[:10])] += int(r.qty_0차)
+
+    def _due_ok(q: Dict) -> Dict[str, bool]:
+        per_item = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        for (name, d, _ln), v in q.items():
+            per_item[name][d][1] += v
+        for (name, d), v in due.items():
+            per_item[name][d][0] += v
+        ok = {}
+        for name, days in per_item.items():
+            c0 = c1 = 0
+            ok[name] = True
+            for d in sorted(days):
+                c0 += days[d][0]
+                c1 += days[d][1]
+                if c1 < c0:
+                    ok[name] = False
+                    break
+        return ok
+
+    before_ok = _due_ok(qty)
+    inflow = defaultdict(int)
+    for m in moves:
+        n = int(m["qty"])
+        fd, fl = _split_slot(m["from"])
+        td, tl = _split_slot(m["to"])
+        qty[(m["item"], fd, fl)] -= n
+        qty[(m["item"], td, tl)] += n
+        line_total[(fd, fl)] -= n
+        line_total[(td, tl)] += n
+        inflow[(td, tl)] += n
+        inflow[(fd, fl)] -= n
+
+    out = []
+    if "source" in checks:
+        out += [f"출발지 음수: {k} = {v}" for k, v in qty.items() if v < 0]
+    if "due" in checks:
+        after_ok = _due_ok(qty)
+        out += [f"누적 납기 위반: {name}" for name, ok in before_ok.items() if ok and not after_ok.get(name, True)]
+    if "capa" in checks:
+        out += [
+            f"CAPA 초과: {slot} = {line_total[slot]} > {capa_limits[slot[1]]}"
+            for slot, n in inflow.items()
+            if n > 0 and line_total[slot] > int(capa_limits[slot[1]])
+        ]
+    if "t6" in checks:
+        sameday = [m for m in moves if "T6" in m["item"] and _split_slot(m["from"])[0] == _split_slot(m["to"])[0]]
+        if len(sameday) > 1:
+            out.append(f"T6 같은날 타라인 {len(sameday)}건")
+    return out
@@ -0,0 +1,88 @@
+# tests/test_due_checker.py
+# DueCumsumChecker: 품목별 누적 납기(cumsum 1차 >= cumsum 0차) 검증이 승인된 이동을 누적 반영하는지
+import random
+
+import pandas as pd
+
+import hybrid
+
+DATES = ["2026-01-05", "2026-01-06", "2026-01-07", "2026-01-08", "2026-01-09"]
+
+
+def make_plan(qty0, qty1, name="A") -> pd.DataFrame:
+    return pd.DataFrame(
+        {"plan_date": DATES, "line": ["조립1"] * len(DATES), "product_name": [name] * len(DATES),
+         "qty_0차": qty0, "qty_1차": qty1}
+    )
+
+
+def brute_force_ok(qty0, qty1, moves) -> bool:
+    """이동을 일별 배열에 직접 적용해 누적 납기/음수 생산을 확인"""
+    prod = list(qty1)
+    for f, t, q in moves:
+        prod[f] -= q
+        prod[t] += q
+    if min(prod) < 0:
+        return False
+    c0 = c1 = 0
+    for a, b in zip(qty0, prod):
+        c0 += a
+        c1 += b
+        if c1 < c0:
+            return False
+    return True
+
+
+def test_check_does_not_mutate():
+    checker = hybrid.DueCumsumChecker(hybrid.DueProfile(make_plan([100] * 5, [200, 100, 100, 100, 100])))
+    first = checker.check("A", DATES[0], DATES[3], 100)
+    assert checker.check("A", DATES[0], DATES[3], 100) == first == (True, None)
+
+
+def test_accepted_moves_accumulate():
+    # 1/5 여유 100 → 100개 연기는 각각은 통과, 두 번째는 첫 번째가 반영된 뒤엔 위반
+    checker = hybrid.DueCumsumChecker(hybrid.DueProfile(make_plan([100] * 5, [200, 100, 100, 100, 100])))
+    assert checker.check("A", DATES[0], DATES[2], 100)[0]
+    checker.apply("A", DATES[0], DATES[2], 100)
+
+    ok, bad_date = checker.check("A", DATES[0], DATES[3], 100)
+    assert not ok
+    assert bad_date == DATES[0]
+
+
+def test_unknown_item_passes():
+    checker = hybrid.DueCumsumChecker(hybrid.DueProfile(make_plan([100] * 5, [100] * 5)))
+    assert checker.check("없는품목", DATES[0], DATES[1], 500) == (True, None)
+
+
+def test_matches_brute_force_on_random_sequences():
+    rnd = random.Random(7)
+    for _ in range(200):
+        qty0 = [rnd.choice([0, 100, 200]) for _ in DATES]
+        qty1 = [q + rnd.choice([0, 100, 200]) for q in qty0]
+        checker = hybrid.DueCumsumChecker(hybrid.DueProfile(make_plan(qty0, qty1)))
+        accepted = []
+        for _ in range(4):
+            f, t = rnd.randrange(len(DATES)), rnd.randrange(len(DATES))
+            q = rnd.choice([100, 200])
+            ok, _ = checker.check("A", DATES[f], DATES[t], q)
+            assert ok == brute_force_ok(qty0, qty1, accepted + [(f, t, q)])
+            if ok:
+                checker.apply("A", DATES[f], DATES[t], q)
+                accepted.append((f, t, q))
+
+
+def test_sameday_line_moves_deplete_source_slot():
+    # 같은날 타라인 이송은 일 합계가 그대로 → 칸(날짜, 라인) 잔량으로만 두 번째 이동을 막을 수 있음
+    plan = make_plan([0] * 5, [120, 0, 0, 0, 0])
+    checker = hybrid.DueCumsumChecker(hybrid.DueProfile(plan), hybrid.PlanIndex(plan))
+
+    assert checker.check("A", DATES[0], DATES[0], 120, "조립1", "조립2") == (True, None)
+    checker.apply("A", DATES[0], DATES[0], 120, "조립1", "조립2")
+    assert checker.source_remaining("A", DATES[0], "조립1") == 0
+    assert checker.source_remaining("A", DATES[0], "조립2") == 120
+
+    assert checker.check("A", DATES[0], DATES[0], 120, "조립1", "조립3") == (False, DATES[0])
+    assert checker.max_shift_qty("A", DATES[0], DATES[0], "조립1") == 0
+    # 옮겨 간 칸에서는 다시 뺄 수 있음
+    assert checker.check("A", DATES[0], DATES[0], 120, "조립2", "조립3") == (True, None)
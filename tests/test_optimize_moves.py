@@ -0,0 +1,177 @@
+# tests/test_optimize_moves.py
+# mode="optimize": min-cost flow 이동안 + 6단계 검증 (AI 미사용)
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+import hybrid
+from optimizer import MinCostFlow
+from plan_fixtures import invariant_violations, make_plan, question_date
+
+TODAY = date(2026, 1, 5)
+CAPA = {"조립1": 1500, "조립2": 1400, "조립3": 1300}
+# 감축 출발지 상한 회귀: 조립2 품목은 qty_0차 행이 없고(납기 상한 없음), 품목0은 1/22에 200개뿐
+SHALLOW_QUESTION = "1/22 조립2 3000개로 줄여줘"
+SHALLOW_DATE = "2026-01-22"
+QUESTIONS = ["1/20 조립2 70%", "1/21 조립2 50%", "1/20 조립3 70%", "1/14 조립1 95%", "1/22 조립1 40%", "1/15 조립3 샘플 300"]
+
+
+def test_min_cost_flow_prefers_cheap_path_and_respects_caps():
+    # s=0 → a=1 (cap 5, cost 1) / s → b=2 (cap 5, cost 3), a/b → t=3 (cap 4 / 10)
+    g = MinCostFlow(4)
+    sa = g.add_edge(0, 1, 5, 1)
+    sb = g.add_edge(0, 2, 5, 3)
+    at = g.add_edge(1, 3, 4, 0)
+    bt = g.add_edge(2, 3, 10, 0)
+    flow, cost = g.flow(0, 3, 7)
+
+    assert flow == 7
+    assert cost == 4 * 1 + 3 * 3
+    assert (g.edge_flow(sa), g.edge_flow(at)) == (4, 4)
+    assert (g.edge_flow(sb), g.edge_flow(bt)) == (3, 3)
+
+
+def test_optimize_mode_does_not_call_ai(monkeypatch):
+    def _no_ai(**_kwargs):
+        raise AssertionError("optimize 모드에서 AI 호출")
+
+    monkeypatch.setattr(hybrid, "step5_ask_ai_strategy", _no_ai)
+    plan = make_plan(1)
+    res = hybrid.ask_professional_scheduler(
+        "1/20 조립2 70%", plan, None, None, None, "2026-01-20", mode="optimize", today=TODAY, capa_limits=CAPA,
+    )
+    assert res[4]
+    assert all(int(m["qty"]) > 0 for m in res[4])
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("question", QUESTIONS)
+def test_optimize_mode_keeps_invariants(seed, question):
+    # 최적화안 + 폴백 채움까지 합친 최종 이동 기준 (출발지 음수 / 누적 납기 / CAPA / T6 같은날 1회)
+    plan = make_plan(seed)
+    res = hybrid.ask_professional_scheduler(
+        question, plan, None, None, None, question_date(question), mode="optimize", today=TODAY, capa_limits=CAPA,
+    )
+    assert invariant_violations(plan, res[4], CAPA) == []
+
+
+def test_fallback_does_not_reuse_source_drained_by_optimizer():
+    # 회귀: seed 1 / 1/20 조립2 70% 에서 폴백이 최적화안이 이미 비운 칸(T6 조립2-P3 120개)에서 다시 240개를 뺐음
+    plan = make_plan(1)
+    res = hybrid.ask_professional_scheduler(
+        "1/20 조립2 70%", plan, None, None, None, "2026-01-20", mode="optimize", today=TODAY, capa_limits=CAPA,
+    )
+    moved = defaultdict(int)
+    for m in res[4]:
+        if m["from"] == "2026-01-20_조립2":
+            moved[m["item"]] += int(m["qty"])
+    index = hybrid.PlanIndex(hybrid.normalize_plan_df(plan))
+    assert moved
+    for name, qty in moved.items():
+        assert qty <= index.product_qty(name, "2026-01-20", "조립2"), name
+
+
+# ========================================================================
+# 감축 공급량 = min(누적 여유, 질문일 출발지 칸 물량)
+# ========================================================================
+def make_shallow_source_plan() -> pd.DataFrame:
+    """조립2 품목은 qty_0차 행이 없음(납기 상한 없음), 품목0은 1/22에 200개뿐이고 다른 날은 많음"""
+    rows = []
+    for d in range(31):
+        dt = date(2026, 1, 1) + timedelta(days=d)
+        ds, wd = dt.strftime("%Y-%m-%d"), dt.weekday() < 5
+        for i in range(6):
+            if not wd:
+                q1 = 0
+            elif ds == SHALLOW_DATE:
+                q1 = 200 if i == 0 else 700
+            else:
+                q1 = 1500 if i == 0 else 300
+            rows.append({"plan_date": ds, "line": "조립2", "product_name": f"품목{i}",
+                         "qty_0차": 0, "qty_1차": q1, "plt": 100, "is_workday": wd})
+        for i in range(3):
+            q = 400 if wd else 0
+            rows.append({"plan_date": ds, "line": "조립1", "product_name": f"J9 모델{i}",
+                         "qty_0차": q, "qty_1차": q, "plt": 100, "is_workday": wd})
+    return pd.DataFrame(rows)
+
+
+def _prepare(plan_df: pd.DataFrame):
+    ctx = hybrid.SchedulerContext.build(plan_df, today=TODAY)
+    stock, err = hybrid.step1_list_current_stock(ctx.plan_df, SHALLOW_DATE, "조립2", plan_index=ctx.plan_index)
+    assert not err
+    items = hybrid.step2_calculate_cumulative_slack(ctx.plan_df, stock, slack_table=ctx.slack_table)
+    capa = hybrid.step3_analyze_destination_capacity(
+        ctx.plan_df, SHALLOW_DATE, "조립2", ctx.capa_limits,
+        plan_index=ctx.plan_index, calendar=ctx.calendar, ctx=ctx,
+    )
+    constraint_info = hybrid.step4_prepare_constraint_info(items, "조립2")
+    need = int(stock["total"]) - 3000
+    return ctx, items, capa, constraint_info, need
+
+
+def _optimize(ctx, items, capa, constraint_info, need):
+    return hybrid.optimize_moves(
+        constraint_info=constraint_info,
+        capa_status=capa,
+        question_date=SHALLOW_DATE,
+        target_line="조립2",
+        operation_mode="reduce",
+        need_qty=need,
+        plan_index=ctx.plan_index,
+        calendar=ctx.calendar,
+        due_checker=hybrid.DueCumsumChecker(ctx.due_profile),
+        last_due_map={x["name"]: x.get("last_due") for x in items},
+        ctx=ctx,
+    )
+
+
+def test_reduce_supply_capped_by_source_slot_qty():
+    ctx, items, capa, constraint_info, need = _prepare(make_shallow_source_plan())
+    moves, _ = _optimize(ctx, items, capa, constraint_info, need)
+
+    moved = defaultdict(int)
+    for m in moves:
+        moved[m["item"]] += int(m["qty"])
+    assert moved
+    for name, qty in moved.items():
+        assert qty <= ctx.plan_index.product_qty(name, SHALLOW_DATE, "조립2"), name
+
+
+def test_optimize_not_worse_than_python_fallback():
+    ctx, items, capa, constraint_info, need = _prepare(make_shallow_source_plan())
+    common = dict(constraint_info=constraint_info, capa_status=capa, plan_df=ctx.plan_df, target_line="조립2", ctx=ctx)
+
+    opt_moves, _ = _optimize(ctx, items, capa, constraint_info, need)
+    cp = capa.checkpoint()
+    fb_moves, _ = hybrid.python_fallback_reduce(
+        plan_df=ctx.plan_df,
+        constraint_info=constraint_info,
+        capa_status=capa,
+        question_date=SHALLOW_DATE,
+        target_line="조립2",
+        need_reduce=need,
+        calendar=ctx.calendar,
+        due_checker=hybrid.DueCumsumChecker(ctx.due_profile),
+        ctx=ctx,
+    )
+    capa.rollback(cp)
+
+    opt_score = hybrid._score_strategy({"moves": opt_moves}, **common)
+    fb_score = hybrid._score_strategy({"moves": fb_moves}, **common)
+    assert opt_score >= fb_score
+    # 제안한 이동이 검증에서 깎이지 않아야 함 (출발지 물량 초과 → 납기/재고 위반 반려가 없어야 함)
+    assert opt_score == sum(int(m["qty"]) for m in opt_moves)
+
+
+def test_optimize_mode_end_to_end_meets_fallback():
+    plan = make_shallow_source_plan()
+    res = hybrid.ask_professional_scheduler(
+        SHALLOW_QUESTION, plan, pd.DataFrame(), {}, {}, SHALLOW_DATE, mode="optimize", today=TODAY,
+    )
+    need = _prepare(plan)[-1]
+    moved = sum(int(m["qty"]) for m in res[4])
+    assert res[1]
+    assert moved >= need * 0.9
@@ -0,0 +1,67 @@
+# tests/test_plan_loader.py
+# fetch_table_paged: 서버 행 상한(max_rows)이 page_size보다 작아도 count="exact"까지 끝까지 받아야 함
+import pandas as pd
+
+from fake_supabase import FakeSupabase
+from plan_loader import PLAN_TABLE, fetch_table_paged
+
+
+def make_rows(n: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "id": range(1, n + 1),
+            "plan_date": [f"2026-01-{i % 28 + 1:02d}" for i in range(n)],
+            "line": ["조립1", "조립2", "조립3"] * (n // 3) + ["조립1"] * (n % 3),
+            "qty_1차": [100 * (i % 7) for i in range(n)],
+        }
+    )
+
+
+def test_fetch_table_paged_follows_count_past_server_row_cap():
+    fake = FakeSupabase(tables={PLAN_TABLE: make_rows(1860)}, max_rows=500)
+    df, stats = fetch_table_paged(fake, PLAN_TABLE, page_size=1000)
+
+    assert len(df) == 1860
+    assert sorted(df["id"].tolist()) == list(range(1, 1861))
+    assert sum(s["rows"] for s in stats) >= 1860
+
+
+def test_fetch_table_paged_with_filter_and_uncapped_pages():
+    fake = FakeSupabase(tables={PLAN_TABLE: make_rows(1860)})
+    df, _ = fetch_table_paged(fake, PLAN_TABLE, filters=[("eq", "line", "조립2")], order_by=["id"], page_size=200)
+
+    assert len(df) == 620
+    assert df["id"].is_unique
+    assert set(df["line"]) == {"조립2"}
+
+
+def test_fetch_table_paged_small_table_single_page():
+    fake = FakeSupabase(tables={PLAN_TABLE: make_rows(30)}, max_rows=500)
+    df, stats = fetch_table_paged(fake, PLAN_TABLE, page_size=1000)
+
+    assert len(df) == 30
+    assert len(stats) == 1
+
+
+class _NoCountClient:
+    """count를 돌려주지 않는 클라이언트 (행 상한만 있음)"""
+
+    def __init__(self, fake: FakeSupabase):
+        self.fake = fake
+
+    def table(self, name: str):
+        q = self.fake.table(name)
+        select = q.select
+
+        def _select(columns="*", count=None):
+            return select(columns)
+
+        q.select = _select
+        return q
+
+
+def test_fetch_table_paged_without_count_advances_by_returned_rows():
+    fake = FakeSupabase(tables={PLAN_TABLE: make_rows(1860)}, max_rows=500)
+    df, _ = fetch_table_paged(_NoCountClient(fake), PLAN_TABLE, page_size=1000)
+
+    assert sorted(df["id"].tolist()) == list(range(1, 1861))
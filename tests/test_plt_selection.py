@@ -0,0 +1,100 @@
+# tests/test_plt_selection.py
+# 폴백 수량 선택: bounded_knapsack_fill (PLT 묶음, 목표 이하 최대, 목적지 그룹 상한)
+import itertools
+import random
+
+from optimizer import bounded_knapsack_fill
+
+
+def brute_force(options, target, group_caps):
+    best = 0
+    for counts in itertools.product(*[range(c + 1) for _, c, _ in options]):
+        per_group = {}
+        for (u, _, key), n in zip(options, counts):
+            per_group[key] = per_group.get(key, 0) + u * n
+        if any(key in group_caps and v > group_caps[key] for key, v in per_group.items()):
+            continue
+        total = sum(per_group.values())
+        if total <= target:
+            best = max(best, total)
+    return best
+
+
+def assert_feasible(options, target, group_caps, best, counts):
+    assert sum(u * n for (u, _, _), n in zip(options, counts)) == best <= target
+    assert all(0 <= n <= c for (_, c, _), n in zip(options, counts))
+    per_group = {}
+    for (u, _, key), n in zip(options, counts):
+        per_group[key] = per_group.get(key, 0) + u * n
+    assert all(v <= group_caps[k] for k, v in per_group.items() if k in group_caps)
+
+
+def test_exact_fill_beats_greedy_order():
+    # 그리디(앞에서부터 최대)면 300 → 남은 100에 200 PLT가 안 들어감. DP는 200 x 2 = 400
+    options = [(300, 1, "d1"), (200, 2, "d2")]
+    best, counts = bounded_knapsack_fill(options, 400)
+    assert best == 400
+    assert counts == [0, 2]
+    assert_feasible(options, 400, {}, best, counts)
+
+
+def test_group_cap_limits_destination():
+    options = [(100, 5, "d1"), (100, 5, "d1"), (50, 2, "d2")]
+    best, counts = bounded_knapsack_fill(options, 1000, {"d1": 300})
+    assert best == 400
+    assert counts[0] + counts[1] == 3
+
+
+def test_earlier_option_preferred_on_tie():
+    best, counts = bounded_knapsack_fill([(100, 3, "d1"), (100, 3, "d2")], 200)
+    assert best == 200
+    assert counts == [2, 0]
+
+
+def test_matches_brute_force():
+    rnd = random.Random(3)
+    for _ in range(150):
+        options = [
+            (rnd.choice([50, 100, 150, 200]), rnd.randint(0, 3), rnd.choice(["d1", "d2", None]))
+            for _ in range(rnd.randint(1, 4))
+        ]
+        group_caps = {k: rnd.choice([0, 100, 250, 400]) for k in ("d1", "d2") if rnd.random() < 0.7}
+        target = rnd.choice([0, 100, 250, 500, 900])
+        best, counts = bounded_knapsack_fill(options, target, group_caps)
+        assert best == brute_force(options, target, group_caps)
+        assert_feasible(options, target, group_caps, best, counts)
+
+
+def test_item_cap_shared_across_destinations():
+    # 품목 1개(출발지 300개)를 목적지 2곳으로: 옵션 합(200 + 200)이 출발지보다 커도 합은 300 이하
+    options = [(100, 2, "d1", "A"), (100, 2, "d2", "A")]
+    best, counts = bounded_knapsack_fill(options, 1000, {"d1": 1000, "d2": 1000}, {"A": 300})
+    assert best == 300
+    assert sum(counts) == 3
+
+
+def test_item_cap_repair_keeps_group_caps():
+    # d1이 100으로 막혀 있으면 나머지 200은 d2로 (먼저 고른 해를 품목 상한 안에서 유지)
+    options = [(100, 3, "d1", "A"), (100, 3, "d2", "A"), (50, 4, "d1", "B")]
+    best, counts = bounded_knapsack_fill(options, 1000, {"d1": 200}, {"A": 300})
+    assert best == 500
+    assert counts[0] + counts[1] == 3
+    assert counts[0] * 100 + counts[2] * 50 <= 200
+
+
+def test_item_caps_always_feasible():
+    rnd = random.Random(11)
+    for _ in range(150):
+        options = [
+            (rnd.choice([50, 100, 150]), rnd.randint(0, 3), rnd.choice(["d1", "d2", None]), rnd.choice(["A", "B"]))
+            for _ in range(rnd.randint(1, 5))
+        ]
+        group_caps = {k: rnd.choice([0, 100, 250, 400]) for k in ("d1", "d2") if rnd.random() < 0.7}
+        item_caps = {k: rnd.choice([0, 100, 200, 350]) for k in ("A", "B") if rnd.random() < 0.7}
+        target = rnd.choice([100, 250, 500, 900])
+        best, counts = bounded_knapsack_fill(options, target, group_caps, item_caps)
+        assert_feasible([o[:3] for o in options], target, group_caps, best, counts)
+        per_item = {}
+        for (u, _, _, key), n in zip(options, counts):
+            per_item[key] = per_item.get(key, 0) + u * n
+        assert all(v <= item_caps[k] for k, v in per_item.items() if k in item_caps)
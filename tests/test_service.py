@@ -0,0 +1,71 @@
+# tests/test_service.py
+# service.py HTTP 계층: 잘못된 입력은 400, 정상 요청은 프로세스 풀을 거쳐 200
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from datetime import date
+
+import pytest
+
+import service
+from plan_fixtures import make_plan
+from plan_loader import PLAN_TABLE
+
+
+@pytest.fixture(scope="module")
+def base_url(tmp_path_factory):
+    fixtures = tmp_path_factory.mktemp("fixtures")
+    make_plan(1).to_csv(fixtures / f"{PLAN_TABLE}.csv", index=False, encoding="utf-8-sig")
+    svc = service.SchedulerService(
+        config=service.service_config_from_env(fixtures_dir=str(fixtures), genai_key="", warm_dates=[]),
+        max_workers=1,
+        max_pending=4,
+        request_timeout=60,
+        today=date(2026, 1, 5),
+        capa_limits={"조립1": 1500, "조립2": 1400, "조립3": 1300},
+    )
+    server = service.make_server(svc, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    svc.close()
+
+
+def post(url, payload):
+    req = urllib.request.Request(
+        url + "/v1/ask", data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        {"mode": "fastest"},
+        {"capa_limits": {"조립2": "많이"}},
+        {"capa_limits": {"조립2": 0}},
+        {"capa_limits": [1400]},
+    ],
+)
+def test_bad_input_returns_400(base_url, extra):
+    code, body = post(base_url, dict({"question": "1/20 조립2 70%"}, **extra))
+    assert code == 400
+    assert body["error"]
+
+
+def test_round_trip_through_pool(base_url):
+    code, body = post(base_url, {"question": "1/20 조립2 70%", "mode": "optimize", "capa_limits": {"조립2": "1400"}})
+    assert code == 200, body
+    assert body["engine"] == "hybrid"
+    assert body["worker"] != os.getpid()
+    assert body["question_date"] == "2026-01-20"
+    assert body["moves"]
+    assert body["timings"]["total_ms"] >= body["timings"]["worker_ms"]
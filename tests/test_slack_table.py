@@ -0,0 +1,42 @@
+# tests/test_slack_table.py
+# build_slack_table 회귀: qty_0차 > 0 행이 하나도 없으면 last_due가 전부 NaN → .str 접근에서 죽으면 안 됨
+from datetime import date
+
+import pandas as pd
+
+import hybrid
+
+
+def make_plan(qty0) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "plan_date": ["2026-01-05", "2026-01-06", "2026-01-05"],
+            "line": ["조립1", "조립1", "조립1"],
+            "product_name": ["A", "A", "B"],
+            "qty_0차": qty0,
+            "qty_1차": [100, 100, 50],
+            "plt": [100, 100, 50],
+            "is_workday": [True, True, True],
+        }
+    )
+
+
+def test_no_due_rows_marks_unknown():
+    table = hybrid.build_slack_table(hybrid.normalize_plan_df(make_plan([0, 0, 0])))
+
+    assert table is not None
+    assert set(table["last_due"]) == {"미확인"}
+    assert set(table["buffer_days"]) == {999}
+
+
+def test_partial_due_rows():
+    table = hybrid.build_slack_table(hybrid.normalize_plan_df(make_plan([0, 100, 0])))
+
+    assert table.loc[("A", "2026-01-05"), "last_due"] == "2026-01-06"
+    assert table.loc[("A", "2026-01-05"), "buffer_days"] == 1
+    assert table.loc[("B", "2026-01-05"), "last_due"] == "미확인"
+
+
+def test_scheduler_context_builds_without_due_rows():
+    ctx = hybrid.SchedulerContext.build(make_plan([0, 0, 0]), today=date(2026, 1, 1))
+    assert ctx.slack_table is not None
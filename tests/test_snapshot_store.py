@@ -0,0 +1,70 @@
+# tests/test_snapshot_store.py
+# SnapshotStore 증분 동기화: 날짜 워터마크 이전 구간의 원격 삭제/수정도 로컬에 반영되어야 함
+import pandas as pd
+
+from fake_supabase import FakeSupabase
+from snapshot_store import SnapshotStore
+
+TABLE = "production_plan_2026_01"
+
+
+def make_remote() -> FakeSupabase:
+    df = pd.DataFrame(
+        {
+            "plan_date": [f"2026-01-{d:02d}" for d in range(1, 11) for _ in range(3)],
+            "line": ["조립1", "조립2", "조립3"] * 10,
+            "qty_1차": [100] * 30,
+        }
+    )
+    return FakeSupabase(tables={TABLE: df})
+
+
+def remote_exec(remote: FakeSupabase, sql: str) -> None:
+    remote.store._conn.execute(sql)
+    remote.store._conn.commit()
+
+
+def test_remote_delete_before_watermark_propagates():
+    remote = make_remote()
+    store = SnapshotStore(":memory:", remote=remote, min_sync_interval=0)
+    store.sync(TABLE)
+
+    remote_exec(remote, f"DELETE FROM \"{TABLE}\" WHERE plan_date = '2026-01-02' AND line = '조립1'")
+    store.sync(TABLE)
+
+    local = store.read(TABLE)
+    assert len(local) == 29
+    assert not ((local["plan_date"] == "2026-01-02") & (local["line"] == "조립1")).any()
+
+
+def test_edit_before_watermark_propagates_on_full_sync_interval():
+    remote = make_remote()
+    store = SnapshotStore(":memory:", remote=remote, min_sync_interval=0, full_sync_interval=3600)
+    store.sync(TABLE)
+
+    remote_exec(remote, f"UPDATE \"{TABLE}\" SET \"qty_1차\" = 999 WHERE plan_date = '2026-01-03'")
+    store.sync(TABLE)
+    assert store.read(TABLE)["qty_1차"].max() == 100  # 행 수가 같은 과거 수정은 증분으로는 안 보임
+
+    store.full_sync_interval = 0
+    store.sync(TABLE)
+    assert store.read(TABLE)["qty_1차"].max() == 999
+
+
+def test_version_only_bumps_when_rows_change():
+    remote = make_remote()
+    store = SnapshotStore(":memory:", remote=remote, min_sync_interval=0)
+    store.sync(TABLE)
+    v0 = store.version(TABLE)
+
+    for _ in range(3):
+        store.sync(TABLE)  # 마지막 날짜 구간을 다시 받지만 내용은 같음
+    assert store.version(TABLE) == v0
+
+    store.full_sync_interval = 0
+    store.sync(TABLE)  # 같은 내용의 전체 교체
+    assert store.version(TABLE) == v0
+
+    remote_exec(remote, f"UPDATE \"{TABLE}\" SET \"qty_1차\" = 500 WHERE plan_date = '2026-01-10'")
+    store.sync(TABLE)
+    assert store.version(TABLE) == v0 + 1
@@ -0,0 +1,119 @@
+# tests/test_speculative.py
+# mode="hybrid": Gemini(가짜 step5) ∥ Python 계획, 지연 예산/늦은 AI 콜백/승인량 비교
+import threading
+import time
+from datetime import date
+
+import pytest
+
+import hybrid
+from plan_fixtures import invariant_violations, make_plan, question_date
+
+TODAY = date(2026, 1, 5)
+CAPA = {"조립1": 1500, "조립2": 1400, "조립3": 1300}
+QUESTION = "1/20 조립2 70%"
+
+
+def ask(plan, question=QUESTION, **kwargs):
+    return hybrid.ask_professional_scheduler(
+        question, plan, None, None, None, question_date(question), mode=kwargs.pop("mode", "hybrid"),
+        today=TODAY, capa_limits=CAPA, **kwargs,
+    )
+
+
+def moved(res) -> int:
+    return sum(int(m["qty"]) for m in res[4])
+
+
+def test_ai_error_falls_back_to_python_plan(monkeypatch):
+    monkeypatch.setattr(hybrid, "step5_ask_ai_strategy", lambda **_k: (None, "AI 오류: offline", "AI 실패"))
+    plan = make_plan(1)
+    res = ask(plan)
+    assert "AI 오류: offline" in res[0]
+    assert moved(res) == moved(ask(plan, mode="optimize"))
+
+
+def test_slow_ai_does_not_block_past_budget(monkeypatch):
+    release = threading.Event()
+    late = []
+    late_done = threading.Event()
+
+    def slow_ai(**_k):
+        release.wait(5)
+        return {"strategy": "늦은 AI", "explanation": "", "moves": []}, None, "AI 하이브리드 전략 (Gemini 2.0 Flash)"
+
+    def on_late_ai(strategy, error):
+        late.append((strategy, error))
+        late_done.set()
+
+    monkeypatch.setattr(hybrid, "step5_ask_ai_strategy", slow_ai)
+    t0 = time.perf_counter()
+    res = ask(make_plan(1), ai_latency_budget=0.2, on_late_ai=on_late_ai)
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 3
+    assert "AI 응답 지연" in res[0]
+    assert res[4]
+    release.set()
+    assert late_done.wait(5)
+    assert late[0][0]["strategy"] == "늦은 AI" and late[0][1] is None
+
+
+
+def test_budget_counts_from_submit(monkeypatch):
+    # Python 계획에 0.3초 → AI(0.6초)는 제출 후 0.4초 예산을 넘김. 예산을 계획 뒤부터 재면 AI가 채택됨
+    release = threading.Event()
+    orig_optimize = hybrid.optimize_moves
+
+    def slow_optimize(**kwargs):
+        time.sleep(0.3)
+        return orig_optimize(**kwargs)
+
+    def ai(**_k):
+        release.wait(0.6)
+        return {"strategy": "AI", "explanation": "", "moves": []}, None, "AI 하이브리드 전략 (Gemini 2.0 Flash)"
+
+    monkeypatch.setattr(hybrid, "optimize_moves", slow_optimize)
+    monkeypatch.setattr(hybrid, "step5_ask_ai_strategy", ai)
+    res = ask(make_plan(1), ai_latency_budget=0.4)
+    release.set()
+    assert "AI 응답 지연" in res[0]
+
+
+def test_failed_late_ai_skips_callback(monkeypatch, caplog):
+    release = threading.Event()
+    finished = threading.Event()
+    late = []
+
+    def failing_ai(**_k):
+        try:
+            release.wait(5)
+            raise RuntimeError("gemini down")
+        finally:
+            finished.set()
+
+    monkeypatch.setattr(hybrid, "step5_ask_ai_strategy", failing_ai)
+    res = ask(make_plan(1), ai_latency_budget=0.1, on_late_ai=lambda *a: late.append(a))
+    assert "AI 응답 지연" in res[0]
+
+    release.set()
+    assert finished.wait(5)
+    time.sleep(0.2)
+    assert late == []
+    assert not [r for r in caplog.records if "exception calling callback" in r.getMessage()]
+
+def test_python_plan_wins_when_ai_approves_less(monkeypatch):
+    empty = {"strategy": "빈 계획", "explanation": "", "moves": []}
+    monkeypatch.setattr(hybrid, "step5_ask_ai_strategy", lambda **_k: (empty, None, "AI 하이브리드 전략 (Gemini 2.0 Flash)"))
+    res = ask(make_plan(1))
+    assert "Python 계획 채택" in res[0]
+    assert res[4]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("question", ["1/20 조립2 70%", "1/21 조립2 50%", "1/20 조립3 70%", "1/14 조립1 95%", "1/15 조립3 샘플 300"])
+def test_hybrid_mode_keeps_invariants(monkeypatch, seed, question):
+    monkeypatch.setattr(hybrid, "step5_ask_ai_strategy", lambda **_k: (None, "AI 오류: offline", "AI 실패"))
+    plan = make_plan(seed)
+    res = ask(plan, question)
+    assert invariant_violations(plan, res[4], CAPA) == []
@@ -0,0 +1,74 @@
+# tests/test_sweep.py
+# sweep_capa_targets: 목표별 결과가 같은 목표의 단건 실행(mode="optimize")과 같아야 함
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+import hybrid
+from plan_fixtures import make_plan
+
+TODAY = date(2026, 1, 5)
+CAPA = {"조립1": 1500, "조립2": 1400, "조립3": 1300}
+TARGETS = (40, 55, 70, 85, 100)
+
+
+def single_run(plan, question_date: str, line: str, pct: int):
+    m, d = int(question_date[5:7]), int(question_date[8:10])
+    res = hybrid.ask_professional_scheduler(
+        f"{m}/{d} {line} {pct}%", plan, None, None, None, question_date, mode="optimize", today=TODAY, capa_limits=CAPA,
+    )
+    return res[4]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+@pytest.mark.parametrize(
+    "seed,question_date,line",
+    [(1, "2026-01-20", "조립2"), (2, "2026-01-14", "조립2"), (3, "2026-01-20", "조립1"), (3, "2026-01-14", "조립1")],
+)
+def test_sweep_matches_single_target_runs(max_workers, seed, question_date, line):
+    plan = make_plan(seed)
+    table, err = hybrid.sweep_capa_targets(
+        plan, question_date, line, targets=TARGETS, today=TODAY, capa_limits=CAPA, max_workers=max_workers,
+    )
+    assert err is None
+    assert list(table["target_pct"]) == list(TARGETS)
+
+    for row in table.to_dict("records"):
+        moves = single_run(plan, question_date, line, int(row["target_pct"]))
+        moved = sum(int(m["qty"]) for m in moves)
+        need = int(row["need_qty"])
+        assert int(row["moved_qty"]) == moved, row
+        assert int(row["moves"]) == len(moves), row
+        assert int(row["shortfall"]) == max(0, need - moved), row
+        assert row["achievement"] == (round(moved / need * 100, 1) if need else 100.0), row
+
+
+def test_sweep_reuses_process_pool():
+    plan = make_plan(2)
+    first, _ = hybrid.sweep_capa_targets(plan, "2026-01-14", "조립2", targets=TARGETS, today=TODAY, capa_limits=CAPA, max_workers=2)
+    pool = hybrid._SWEEP_POOLS[2]
+    second, _ = hybrid.sweep_capa_targets(plan, "2026-01-14", "조립2", targets=TARGETS, today=TODAY, capa_limits=CAPA, max_workers=2)
+    assert hybrid._SWEEP_POOLS[2] is pool
+    assert first.equals(second)
+
+
+def test_sweep_accepts_executor_and_raises_worker_errors(monkeypatch):
+    plan = make_plan(2)
+    sequential, _ = hybrid.sweep_capa_targets(plan, "2026-01-14", "조립2", targets=TARGETS, today=TODAY, capa_limits=CAPA, max_workers=1)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        table, err = hybrid.sweep_capa_targets(
+            plan, "2026-01-14", "조립2", targets=TARGETS, today=TODAY, capa_limits=CAPA, max_workers=2, executor=pool,
+        )
+        assert err is None
+        assert table.equals(sequential)
+
+        def broken(_facts, _ratio):
+            raise ValueError("풀이 오류")
+
+        # 워커 안의 오류는 순차 재실행으로 숨기지 않고 그대로 올라와야 함
+        monkeypatch.setattr(hybrid, "_sweep_solve", broken)
+        with pytest.raises(ValueError):
+            hybrid.sweep_capa_targets(
+                plan, "2026-01-14", "조립2", targets=TARGETS, today=TODAY, capa_limits=CAPA, max_workers=2, executor=pool,
+            )